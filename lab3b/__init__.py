@@ -0,0 +1,30 @@
+# Dictionary data structures for anagram queries: AVL, red-black, array-backed,
+# persistent, B-tree and trie backends, the anagram index and anagram classes,
+# the anagram and sub-anagram queries over them, and latency metrics for those
+# queries. Importing the package only defines these; run it with
+# python Lab3.B.py or python -m lab3b.
+
+from .keys import CASE_FOLD, normalize_key, sort_words, NodeReads
+from .stats import TreeStats, tree_shape, instrumentation_report
+from .metrics import LatencyHistogram, Metrics, enable_metrics, disable_metrics, serve_metrics
+from .joins import SetOperations
+from .avl import Node, AVLTree
+from .redblack import RBTNode, RedBlackTree
+from .arraytree import NIL, ArrayTree, ArrayAVLTree, ArrayRedBlackTree
+from .trie import TrieNode, Trie
+from .btree import BTREE_FANOUT, BTreeLeaf, BTreeInternal, BTree
+from .persistent import (PersistentAVLNode, PersistentRBTNode, TreeSnapshot, PersistentTree,
+                         PersistentAVLTree, PersistentRedBlackTree)
+from .ingest import INGEST_BLOCK_SIZE, IngestStats, read_lines, ingest_words
+from .dictionary import (anagram_signature, AnagramIndex, PersistentAnagramIndex, read_words, build_anagram_index,
+                         save_snapshot, load_snapshot, load_dictionary, reload_dictionary,
+                         merge_word_list)
+from .creators import (build_structure, avl_tree_creator, red_black_tree_creator, array_avl_tree_creator,
+                       array_red_black_tree_creator, trie_creator, btree_creator,
+                       persistent_avl_tree_creator, persistent_red_black_tree_creator)
+from .anagrams import (AnagramCache, count_anagrams, list_anagrams, search_anagrams, TopAnagrams,
+                       top_anagrams, most_anagrams, top_anagrams_parallel, most_anagrams_parallel,
+                       anagram_counter)
+from .subanagrams import HAVE_NUMPY, LetterCounts, build_letter_counts, current_letter_counts, spellable_words
+from .classes import (AnagramClasses, build_anagram_classes, anagram_classes_from_index, rebuild_anagram_classes,
+                      current_anagram_classes)
@@ -0,0 +1,7 @@
+# Runs the program with python -m lab3b
+
+import sys
+
+from .cli import run
+
+sys.exit(run(sys.argv[1:]))
@@ -0,0 +1,345 @@
+# Anagram queries against any of the data structures
+
+import os
+import time
+import threading
+import multiprocessing
+import heapq
+import collections
+
+from .trie import Trie
+from .dictionary import anagram_signature
+from .classes import current_anagram_classes
+from . import metrics
+
+
+# This returns the number of anagrams a word has. When the tree carries an anagram
+# index this is a single lookup, a trie walks its prefixes, and otherwise it falls
+# back to the permutation search. Its latency is recorded when metrics are on.
+def count_anagrams(tree, key):
+    start = time.perf_counter_ns()
+    count = len(list_anagrams(tree, key))
+    metrics.record_since("count_anagrams", start)
+    return count
+
+
+# AnagramCache class - a bounded LRU cache of anagram lists keyed by letter
+# signature, so repeated queries and queries that are anagrams of each other are
+# answered without searching again. Each entry records the tree version it was
+# computed for, and the whole cache is dropped once the tree has changed. A
+# lookup or store for an older version than the cache holds, from a reader
+# still on a previous version of a persistent tree, is passed over. The cache
+# takes a lock, so readers on several threads can share it.
+class AnagramCache:
+    def __init__(self, maxsize=4096):
+        self.maxsize = maxsize
+        self.entries = collections.OrderedDict()
+        self.version = None
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    # Moves the cache on to version, dropping every entry, when it is newer
+    # than the one held. Returns False if version is older. Called with the
+    # lock held.
+    def advance(self, version):
+        if version != self.version:
+            if self.version is not None and version < self.version:
+                return False
+            self.entries.clear()
+            self.version = version
+        return True
+
+    # Returns the cached anagrams for signature, or None on a miss
+    def get(self, signature, version):
+        with self.lock:
+            anagrams = self.entries.get(signature) if self.advance(version) else None
+            if anagrams is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(signature)
+            self.hits += 1
+            return anagrams
+
+    # Stores the anagrams for signature, evicting the least recently used entry
+    # when the cache is full
+    def put(self, signature, anagrams, version):
+        with self.lock:
+            if not self.advance(version):
+                return
+            self.entries[signature] = tuple(anagrams)
+            self.entries.move_to_end(signature)
+            if len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    # Returns the cache counters
+    def stats(self):
+        with self.lock:
+            return {"size": len(self.entries), "maxsize": self.maxsize, "hits": self.hits,
+                    "misses": self.misses, "evictions": self.evictions}
+
+
+# Returns a function from a word to its number of anagrams. It is a lookup into
+# the tree's anagram classes while they are current, and count_anagrams otherwise.
+def anagram_counter(tree):
+    classes = current_anagram_classes(tree)
+    if classes is not None:
+        return classes.count
+    return lambda word: count_anagrams(tree, word)
+
+
+# Returns what one query reads: the current snapshot of a persistent tree, so
+# the words, anagram index and version it sees all belong to one version, and
+# any other tree as it is
+def query_view(tree):
+    snapshot = getattr(tree, "snapshot", None)
+    return tree if snapshot is None else snapshot()
+
+
+# This returns the dictionary words that are anagrams of key. Results go through
+# the tree's anagram cache when it has one. The version is read once, before
+# the search, so a result is never stored under a newer version than it saw.
+def list_anagrams(tree, key):
+    tree = query_view(tree)
+    key = key.strip()
+    cache = tree.anagram_cache
+    if cache is None:
+        return search_anagrams(tree, key)
+    signature = anagram_signature(tree.make_key(key))
+    version = tree.version
+    anagrams = cache.get(signature, version)
+    if anagrams is None:
+        anagrams = search_anagrams(tree, key)
+        cache.put(signature, anagrams, version)
+    return list(anagrams)
+
+
+# This finds the anagrams of key in the tree without the cache
+def search_anagrams(tree, key):
+    if tree.anagram_index is not None:
+        return tree.anagram_index.lookup(key)
+    if isinstance(tree, Trie):
+        return tree.anagrams(key)
+    return find_anagrams_tree(tree, tree.make_key(key))
+
+
+# This returns the number of anagrams a word has by breaking the word apart
+# and finding different anagrams through the tree. It is kept to compare against
+# the anagram index.
+def count_anagrams_tree(tree, key):
+    return len(find_anagrams_tree(tree, tree.make_key(key.strip())))
+
+
+# Number of permutations looked up in the tree with one batched search
+ANAGRAM_BATCH_SIZE = 4096
+
+
+# This generates every distinct permutation of key, appended to prefix. When the
+# letters of key are sorted the permutations come out in sorted order.
+def permutations(key, prefix=""):
+    # Base case
+    if len(key) <= 1:
+        yield prefix + key
+        return
+
+    # Implementation of print_anagrams method provided
+    for i in range(len(key)):
+        cur = key[i: i + 1]
+        before = key[0: i]  # letters before cur
+        after = key[i + 1:]  # letters after cur
+        if cur not in before:  # Check if permutations of cur have not been generated.
+            yield from permutations(before + after, prefix + cur)
+
+
+# This generates every distinct permutation of key and collects the ones that
+# are words in the tree. key is already normalized with the tree's policy. The
+# permutations are generated in sorted order and looked up in batches, so each
+# batch is answered by one finger search instead of a descent per permutation.
+def find_anagrams_tree(tree, key):
+    found = []
+    batch = []
+    for string in permutations("".join(sorted(key))):
+        batch.append(string)
+        if len(batch) == ANAGRAM_BATCH_SIZE:
+            found.extend(word for word in tree.words_for_keys(batch) if word is not None)
+            batch = []
+    found.extend(word for word in tree.words_for_keys(batch) if word is not None)
+    return found
+
+
+# Yields (position, word) for each candidate in lines, where position counts
+# lines from start. Each line is stripped once here and blank lines are skipped.
+def iter_candidates(lines, start=0):
+    position = start
+    for line in lines:
+        word = line.strip()
+        if word:
+            yield position, word
+        position += 1
+
+
+# Opens a candidate file and lazily yields its (position, word) candidates
+def read_candidates(file):
+    file_ = open(file)
+    try:
+        yield from iter_candidates(file_)
+    finally:
+        file_.close()
+
+
+# TopAnagrams class - keeps the k words with the most anagrams seen so far in a
+# bounded min-heap, so memory does not depend on how many words are added.
+# Entries are (count, -position, word): a higher count ranks first, and on a tie
+# the word that came first in the file does. Words without anagrams and repeats
+# of a word already kept are ignored.
+class TopAnagrams:
+    def __init__(self, k):
+        self.k = k
+        self.heap = []
+        self.words = set()
+
+    def add(self, count, position, word):
+        if count == 0 or word in self.words:
+            return
+        entry = (count, -position, word)
+        if len(self.heap) < self.k:
+            heapq.heappush(self.heap, entry)
+            self.words.add(word)
+        elif self.heap and entry > self.heap[0]:
+            removed = heapq.heapreplace(self.heap, entry)
+            self.words.discard(removed[2])
+            self.words.add(word)
+
+    # Returns the kept (count, position, word) entries, best first
+    def entries(self):
+        return [(count, -position, word) for count, position, word in sorted(self.heap, reverse=True)]
+
+    # Returns the kept words as (word, count) pairs, best first
+    def ranked(self):
+        return [(word, count) for count, position, word in self.entries()]
+
+
+# Returns the k words in a file with the most anagrams as (word, count) pairs,
+# best first. Candidates are streamed from the file, so any file size runs in
+# constant memory, and each word is scored by a lookup when the tree has its
+# anagram classes. With workers other than 1 the file is scored by
+# top_anagrams_parallel.
+def top_anagrams(file, tree, k=10, workers=1):
+    start = time.perf_counter_ns()
+    if workers != 1:
+        ranked = top_anagrams_parallel(file, tree, k, workers)
+    else:
+        count = anagram_counter(tree)
+        top = TopAnagrams(k)
+        for position, word in read_candidates(file):
+            top.add(count(word), position, word)
+        ranked = top.ranked()
+    metrics.record_since("top_anagrams", start)
+    return ranked
+
+
+# Function that returns the word in a file that contains the most anagrams
+# The function's parameters are the file with the words to compare and the tree with all the english words
+# It returns "" when no word in the file has an anagram in the dictionary.
+def most_anagrams(file, tree, workers=1):
+    start = time.perf_counter_ns()
+    ranked = top_anagrams(file, tree, 1, workers)
+    metrics.record_since("most_anagrams", start)
+    if not ranked:
+        return ""
+    return ranked[0][0]
+
+
+# Number of candidate lines sent to a worker process at a time
+MOST_ANAGRAMS_CHUNK_SIZE = 10000
+
+# The tree the worker processes of top_anagrams_parallel score against. With
+# the fork start method it is inherited from the parent, otherwise each worker
+# loads it once through the loader given to top_anagrams_parallel.
+pool_tree = None
+
+
+# Runs once in each worker process
+def init_pool_worker(loader):
+    global pool_tree
+    if loader is not None:
+        pool_tree = loader()
+
+
+# Scores one (start, lines, k) chunk in a worker process and returns the
+# chunk's top k entries
+def score_chunk(chunk):
+    start, lines, k = chunk
+    count = anagram_counter(pool_tree)
+    top = TopAnagrams(k)
+    for position, word in iter_candidates(lines, start):
+        top.add(count(word), position, word)
+    return top.entries()
+
+
+# Yields the lines of an open file as (start, lines) chunks of chunk_size lines
+def read_chunks(file_, chunk_size):
+    start = 0
+    lines = []
+    for line in file_:
+        lines.append(line)
+        if len(lines) == chunk_size:
+            yield start, lines
+            start += len(lines)
+            lines = []
+    if lines:
+        yield start, lines
+
+
+# Returns the top k words in a file like top_anagrams, but scores the file in
+# chunks across a pool of worker processes (os.cpu_count() of them if workers is
+# None). Only a few chunks per worker are in flight at once, so memory stays
+# bounded, and the chunk results are merged in file order, so the result is the
+# same as the serial run. The dictionary is shared by forking; on platforms
+# without fork, loader must be a picklable function that returns the tree, such
+# as functools.partial(avl_tree_creator, "words.txt") which loads the snapshot.
+def top_anagrams_parallel(file, tree, k=10, workers=None, chunk_size=MOST_ANAGRAMS_CHUNK_SIZE, loader=None):
+    global pool_tree
+    if "fork" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("fork")
+        pool_tree = tree
+        loader = None
+    elif loader is None:
+        raise ValueError("top_anagrams_parallel needs a loader when processes cannot be forked")
+    else:
+        context = multiprocessing.get_context("spawn")
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    file_ = open(file)
+    try:
+        top = TopAnagrams(k)
+        with context.Pool(workers, init_pool_worker, (loader,)) as pool:
+            window = 2 * workers
+            pending = collections.deque()
+            for start, lines in read_chunks(file_, chunk_size):
+                pending.append(pool.apply_async(score_chunk, ((start, lines, k),)))
+                if len(pending) >= window:
+                    for count, position, word in pending.popleft().get():
+                        top.add(count, position, word)
+            while pending:
+                for count, position, word in pending.popleft().get():
+                    top.add(count, position, word)
+        return top.ranked()
+    finally:
+        file_.close()
+        pool_tree = None
+
+
+# Returns the word in a file with the most anagrams, scored in parallel by
+# top_anagrams_parallel
+def most_anagrams_parallel(file, tree, workers=None, chunk_size=MOST_ANAGRAMS_CHUNK_SIZE, loader=None):
+    ranked = top_anagrams_parallel(file, tree, 1, workers, chunk_size, loader)
+    if not ranked:
+        return ""
+    return ranked[0][0]
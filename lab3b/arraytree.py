@@ -0,0 +1,347 @@
+# AVL and red-black trees stored in parallel arrays instead of node objects
+
+from array import array
+
+from .keys import normalize_key, sort_words
+
+
+# Handle used by the array-backed trees for a missing child or parent
+NIL = -1
+
+
+# ArrayTree class - base class for the array-backed trees. Instead of one Python
+# object per node, keys and links are kept in parallel arrays and a node is an
+# integer handle into them. Subclasses add the balancing data they need.
+class ArrayTree:
+    # Constructor to create an empty tree with room for capacity nodes
+    # before the arrays have to grow. keys holds the normalized comparison keys
+    # and words the original spellings.
+    def __init__(self, capacity=16, normalize=None):
+        capacity = max(capacity, 1)
+        self.root = NIL
+        self.size = 0
+        self.normalize = normalize
+        self.keys = [None] * capacity
+        self.words = [None] * capacity
+        self.left = array("i", [NIL]) * capacity
+        self.right = array("i", [NIL]) * capacity
+        self.parent = array("i", [NIL]) * capacity
+        self.version = 0
+        self.anagram_index = None
+        self.letter_counts = None
+        self.anagram_classes = None
+        self.anagram_cache = None
+
+    def __len__(self):
+        return self.size
+
+    def __contains__(self, word):
+        return self.search_key(self.make_key(word)) != NIL
+
+    # Iterating yields the words in sorted order, lazily. The tree must not be
+    # changed while an iterator over it is in use.
+    def __iter__(self):
+        left, right, words = self.left, self.right, self.words
+        stack = []
+        node = self.root
+        while stack or node != NIL:
+            while node != NIL:
+                stack.append(node)
+                node = left[node]
+            node = stack.pop()
+            yield words[node]
+            node = right[node]
+
+    # Returns the comparison key the tree uses for word
+    def make_key(self, word):
+        return normalize_key(self.normalize, word)
+
+    # Builds a balanced tree from an iterable of words in O(n), preallocating
+    # exactly one slot per word. Unsorted input is sorted first.
+    @classmethod
+    def from_sorted(cls, words, normalize=None):
+        keys, words = sort_words(words, normalize)
+        tree = cls(len(keys), normalize)
+        tree.root = tree.build_sorted(keys, words, 0, len(keys) - 1, NIL, 0)
+        return tree
+
+    # Builds the subtree holding keys[low..high] around the middle key and returns
+    # its handle. Subclasses fill in their balancing data in built().
+    def build_sorted(self, keys, words, low, high, parent, depth):
+        if low > high:
+            return NIL
+        mid = (low + high) // 2
+        node = self.new_node(keys[mid], words[mid])
+        self.parent[node] = parent
+        self.left[node] = self.build_sorted(keys, words, low, mid - 1, node, depth + 1)
+        self.right[node] = self.build_sorted(keys, words, mid + 1, high, node, depth + 1)
+        self.built(node, depth, len(keys))
+        return node
+
+    # Makes sure the arrays have room for at least capacity nodes
+    def reserve(self, capacity):
+        extra = capacity - len(self.keys)
+        if extra > 0:
+            self.keys.extend([None] * extra)
+            self.words.extend([None] * extra)
+            self.left.extend(array("i", [NIL]) * extra)
+            self.right.extend(array("i", [NIL]) * extra)
+            self.parent.extend(array("i", [NIL]) * extra)
+        return extra
+
+    # Allocates the next free handle for key, doubling the arrays when full
+    def new_node(self, key, word):
+        if self.size == len(self.keys):
+            self.reserve(2 * len(self.keys))
+        node = self.size
+        self.keys[node] = key
+        self.words[node] = word
+        self.size += 1
+        return node
+
+    # Returns the stored spelling of word, or None if it is not in the tree
+    def search(self, word):
+        node = self.search_key(self.make_key(word))
+        return None if node == NIL else self.words[node]
+
+    # Returns the handle of the node holding word, or NIL if not found
+    def search_handle(self, word):
+        return self.search_key(self.make_key(word))
+
+    # Returns the handle of the node with the given normalized key, or NIL
+    def search_key(self, key):
+        keys, left, right = self.keys, self.left, self.right
+        node = self.root
+        while node != NIL:
+            node_key = keys[node]
+            if key == node_key:
+                return node
+            elif key < node_key:
+                node = left[node]
+            else:
+                node = right[node]
+        return NIL
+
+    # Returns the stored word for each of the words, or None for missing words,
+    # using one batched finger search for all of them
+    def search_many(self, words):
+        return self.words_for_keys([self.make_key(word) for word in words])
+
+    # Returns a list of booleans telling which of the words are in the tree
+    def contains_many(self, words):
+        return [node != NIL for node in self.search_many_keys([self.make_key(word) for word in words])]
+
+    # Returns the stored word for each of the already normalized keys, or None
+    def words_for_keys(self, keys):
+        words = self.words
+        return [None if node == NIL else words[node] for node in self.search_many_keys(keys)]
+
+    # Finger search over handles for many normalized keys, the same way
+    # finger_search works for the node-based trees
+    def search_many_keys(self, keys):
+        tree_keys, left, right, parent = self.keys, self.left, self.right, self.parent
+        results = [NIL] * len(keys)
+        finger = self.root
+        for i in sorted(range(len(keys)), key=keys.__getitem__):
+            key = keys[i]
+            node = finger
+            while node != NIL and parent[node] != NIL and (
+                    node == right[parent[node]] or not key < tree_keys[parent[node]]):
+                node = parent[node]
+            while node != NIL:
+                finger = node
+                node_key = tree_keys[node]
+                if key == node_key:
+                    results[i] = node
+                    break
+                elif key < node_key:
+                    node = left[node]
+                else:
+                    node = right[node]
+        return results
+
+    # Does a regular binary search tree insert of key and returns its new handle.
+    # An attached anagram index gets the word too.
+    def insert_leaf(self, key, word):
+        self.version += 1
+        if self.anagram_index is not None:
+            self.anagram_index.add(word)
+        node = self.new_node(key, word)
+        keys, left, right = self.keys, self.left, self.right
+        if self.root == NIL:
+            self.root = node
+            return node
+        current = self.root
+        while True:
+            if key < keys[current]:
+                if left[current] == NIL:
+                    left[current] = node
+                    break
+                current = left[current]
+            else:
+                if right[current] == NIL:
+                    right[current] = node
+                    break
+                current = right[current]
+        self.parent[node] = current
+        return node
+
+    # Moves child into the place of node under node's parent
+    def replace_in_parent(self, node, child):
+        up = self.parent[node]
+        self.parent[child] = up
+        if up == NIL:
+            self.root = child
+        elif self.left[up] == node:
+            self.left[up] = child
+        else:
+            self.right[up] = child
+
+    # Performs a left rotation at the given node. Returns the new subtree root.
+    def rotate_left(self, node):
+        pivot = self.right[node]
+        right_left_child = self.left[pivot]
+        self.replace_in_parent(node, pivot)
+        self.left[pivot] = node
+        self.parent[node] = pivot
+        self.right[node] = right_left_child
+        if right_left_child != NIL:
+            self.parent[right_left_child] = node
+        self.rotated(node, pivot)
+        return pivot
+
+    # Performs a right rotation at the given node. Returns the new subtree root.
+    def rotate_right(self, node):
+        pivot = self.left[node]
+        left_right_child = self.right[pivot]
+        self.replace_in_parent(node, pivot)
+        self.right[pivot] = node
+        self.parent[node] = pivot
+        self.left[node] = left_right_child
+        if left_right_child != NIL:
+            self.parent[left_right_child] = node
+        self.rotated(node, pivot)
+        return pivot
+
+    # Hooks for subclasses, called after a node is bulk-built or a rotation
+    # moved node below pivot
+    def built(self, node, depth, count):
+        pass
+
+    def rotated(self, node, pivot):
+        pass
+
+
+# ArrayAVLTree class - an AVL tree whose node heights live in a signed byte array
+class ArrayAVLTree(ArrayTree):
+    def __init__(self, capacity=16, normalize=None):
+        ArrayTree.__init__(self, capacity, normalize)
+        self.heights = array("b", [0]) * len(self.keys)
+
+    def reserve(self, capacity):
+        extra = ArrayTree.reserve(self, capacity)
+        if extra > 0:
+            self.heights.extend(array("b", [0]) * extra)
+        return extra
+
+    # Returns the height of the subtree at node, or -1 for NIL
+    def height(self, node):
+        if node == NIL:
+            return -1
+        return self.heights[node]
+
+    def update_height(self, node):
+        self.heights[node] = max(self.height(self.left[node]), self.height(self.right[node])) + 1
+
+    def get_balance(self, node):
+        return self.height(self.left[node]) - self.height(self.right[node])
+
+    def built(self, node, depth, count):
+        self.update_height(node)
+
+    def rotated(self, node, pivot):
+        self.update_height(node)
+        self.update_height(pivot)
+
+    # Updates the node's height and rotates if its balance factor is -2 or +2.
+    # Returns the subtree's new root.
+    def rebalance(self, node):
+        self.update_height(node)
+        balance = self.get_balance(node)
+        if balance == -2:
+            if self.get_balance(self.right[node]) == 1:
+                self.rotate_right(self.right[node])
+            return self.rotate_left(node)
+        elif balance == 2:
+            if self.get_balance(self.left[node]) == -1:
+                self.rotate_left(self.left[node])
+            return self.rotate_right(node)
+        return node
+
+    def insert(self, word):
+        node = self.parent[self.insert_leaf(self.make_key(word), word)]
+        while node != NIL:
+            self.rebalance(node)
+            node = self.parent[node]
+
+
+# ArrayRedBlackTree class - a red-black tree whose colors live in a byte array,
+# 1 for red and 0 for black
+class ArrayRedBlackTree(ArrayTree):
+    def __init__(self, capacity=16, normalize=None):
+        ArrayTree.__init__(self, capacity, normalize)
+        self.colors = array("b", [0]) * len(self.keys)
+
+    def reserve(self, capacity):
+        extra = ArrayTree.reserve(self, capacity)
+        if extra > 0:
+            self.colors.extend(array("b", [0]) * extra)
+        return extra
+
+    # The deepest level of a bulk-built tree is colored red, as in
+    # RedBlackTree.from_sorted
+    def built(self, node, depth, count):
+        self.colors[node] = depth == count.bit_length() - 1 and depth > 0
+
+    def insert(self, word):
+        node = self.insert_leaf(self.make_key(word), word)
+        self.colors[node] = 1
+        self.insertion_balance(node)
+
+    # Same cases as RedBlackTree.insertion_balance, with the recursion on the
+    # grandparent turned into a loop
+    def insertion_balance(self, node):
+        colors, left, right = self.colors, self.left, self.right
+        while True:
+            parent = self.parent[node]
+            if parent == NIL:
+                colors[node] = 0
+                return
+            if not colors[parent]:
+                return
+            grandparent = self.parent[parent]
+            if left[grandparent] == parent:
+                uncle = right[grandparent]
+            else:
+                uncle = left[grandparent]
+            if uncle == NIL or not colors[uncle]:
+                break
+            colors[parent] = colors[uncle] = 0
+            colors[grandparent] = 1
+            node = grandparent
+
+        if node == right[parent] and parent == left[grandparent]:
+            self.rotate_left(parent)
+            node = parent
+            parent = self.parent[node]
+        elif node == left[parent] and parent == right[grandparent]:
+            self.rotate_right(parent)
+            node = parent
+            parent = self.parent[node]
+
+        colors[parent] = 0
+        colors[grandparent] = 1
+        if node == left[parent]:
+            self.rotate_right(grandparent)
+        else:
+            self.rotate_left(grandparent)
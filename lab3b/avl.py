@@ -0,0 +1,424 @@
+# AVL tree of dictionary words
+
+from .keys import NodeReads, search_node, sort_words, subtree_size, descent_length, node_depth
+from .stats import TreeStats
+from .joins import SetOperations
+
+
+class Node:
+    # Nodes use __slots__ instead of a per-instance __dict__, which makes them
+    # smaller and their attribute access faster.
+    __slots__ = ("key", "word", "parent", "left", "right", "height", "size")
+
+    # Constructor with a key parameter creates the Node object. key is the
+    # normalized comparison key and word the original spelling, which defaults
+    # to the key. size is the number of nodes in the subtree rooted here.
+    def __init__(self, key, word=None):
+        self.key = key
+        self.word = key if word is None else word
+        self.parent = None
+        self.left = None
+        self.right = None
+        self.height = 0
+        self.size = 1
+
+    # Calculate the current nodes' balance factor,
+    # defined as height(left subtree) - height(right subtree)
+    def get_balance(self):
+        # Get current height of left subtree, or -1 if None
+        left_height = -1
+        if self.left is not None:
+            left_height = self.left.height
+
+        # Get current height of right subtree, or -1 if None
+        right_height = -1
+        if self.right is not None:
+            right_height = self.right.height
+
+        # Calculate the balance factor.
+        return left_height - right_height
+
+    # Recalculate the current height of the subtree rooted at
+    # the node, usually called after a subtree has been
+    # modified.
+    def update_height(self):
+        # Get current height of left subtree, or -1 if None
+        left_height = -1
+        if self.left is not None:
+            left_height = self.left.height
+
+        # Get current height of right subtree, or -1 if None
+        right_height = -1
+        if self.right is not None:
+            right_height = self.right.height
+
+        # Assign self.height with calculated node height.
+        self.height = max(left_height, right_height) + 1
+
+    # Recalculate the number of nodes in the subtree rooted at the node
+    def update_size(self):
+        self.size = subtree_size(self.left) + subtree_size(self.right) + 1
+
+    # Assign either the left or right data member with a new
+    # child. The parameter which_child is expected to be the
+    # string "left" or the string "right". Returns True if
+    # the new child is successfully assigned to this node, False
+    # otherwise.
+    def set_child(self, which_child, child):
+        # Ensure which_child is properly assigned.
+        if which_child != "left" and which_child != "right":
+            return False
+
+        # Assign the left or right data member.
+        if which_child == "left":
+            self.left = child
+        else:
+            self.right = child
+
+        # Assign the parent data member of the new child,
+        # if the child is not None.
+        if child is not None:
+            child.parent = self
+
+        # Update the node's height and size, since the subtree's structure
+        # may have changed.
+        self.update_height()
+        self.update_size()
+        return True
+
+    # Replace a current child with a new child. Determines if
+    # the current child is on the left or right, and calls
+    # set_child() with the new node appropriately.
+    # Returns True if the new child is assigned, False otherwise.
+    def replace_child(self, current_child, new_child):
+        if self.left is current_child:
+            return self.set_child("left", new_child)
+        elif self.right is current_child:
+            return self.set_child("right", new_child)
+
+        # If neither of the above cases applied, then the new child
+        # could not be attached to this node.
+        return False
+
+
+class AVLTree(NodeReads, SetOperations):
+    # Constructor to create an empty AVLTree. There is only
+    # one data member, the tree's root Node, and it starts
+    # out as None. normalize is the policy that turns words into keys, and the
+    # anagram index and cache are attached by avl_tree_creator. version counts
+    # the changes made to the tree so cached results can tell they are stale.
+    def __init__(self, normalize=None):
+        self.root = None
+        self.normalize = normalize
+        self.version = 0
+        self.stats = None
+        self.anagram_index = None
+        self.letter_counts = None
+        self.anagram_classes = None
+        self.anagram_cache = None
+
+    # Starts counting the tree's work in a new TreeStats and returns it
+    def enable_stats(self):
+        self.stats = TreeStats()
+        return self.stats
+
+    # Stops counting
+    def disable_stats(self):
+        self.stats = None
+
+    # Builds a balanced AVLTree from an iterable of words in O(n) without any
+    # rotations. Input that is unsorted under the normalize policy is sorted first.
+    @classmethod
+    def from_sorted(cls, words, normalize=None):
+        keys, words = sort_words(words, normalize)
+        tree = cls(normalize)
+        tree.root = tree.build_sorted(keys, words, 0, len(keys) - 1, None)
+        return tree
+
+    # Builds the subtree holding keys[low..high] by making the middle key the
+    # root, so both halves differ in size by at most one. Returns the subtree root.
+    def build_sorted(self, keys, words, low, high, parent):
+        if low > high:
+            return None
+        mid = (low + high) // 2
+        node = Node(keys[mid], words[mid])
+        node.parent = parent
+        node.left = self.build_sorted(keys, words, low, mid - 1, node)
+        node.right = self.build_sorted(keys, words, mid + 1, high, node)
+        node.update_height()
+        node.update_size()
+        return node
+
+    # Joins the detached subtrees left and right around the detached node middle,
+    # where left's keys sort before middle's and right's after it, and returns
+    # the root of the result, which becomes this tree's root. The shorter
+    # subtree is hung from the spine of the taller one where the heights meet
+    # and the path above it is rebalanced like after an insert, so this takes
+    # O(|height(left) - height(right)| + 1).
+    def join_nodes(self, left, middle, right):
+        left_height = -1 if left is None else left.height
+        right_height = -1 if right is None else right.height
+        if abs(left_height - right_height) <= 1:
+            middle.set_child("left", left)
+            middle.set_child("right", right)
+            self.root = middle
+            return middle
+
+        # Find the node on the taller subtree's inner spine whose child is no
+        # more than one level taller than the shorter subtree
+        if left_height > right_height:
+            self.root = parent = left
+            while parent.right is not None and parent.right.height > right_height + 1:
+                parent = parent.right
+            middle.set_child("left", parent.right)
+            middle.set_child("right", right)
+            parent.set_child("right", middle)
+        else:
+            self.root = parent = right
+            while parent.left is not None and parent.left.height > left_height + 1:
+                parent = parent.left
+            middle.set_child("right", parent.left)
+            middle.set_child("left", left)
+            parent.set_child("left", middle)
+
+        node = parent
+        while node is not None:
+            self.rebalance(node)
+            node = node.parent
+        return self.root
+
+    # Performs a left rotation at the given node. Returns the
+    # new root of the subtree.
+    def rotate_left(self, node):
+        if self.stats is not None:
+            self.stats.rotations += 1
+
+        # Define a convenience pointer to the right child of the
+        # left child.
+        right_left_child = node.right.left
+        size = node.size
+
+        # Step 1 - the right child moves up to the node's position.
+        # This detaches node from the tree, but it will be reattached
+        # later.
+        if node.parent is not None:
+            node.parent.replace_child(node, node.right)
+        else:  # node is root
+            self.root = node.right
+            self.root.parent = None
+
+        # Step 2 - the node becomes the left child of what used
+        # to be its right child, but is now its parent. This will
+        # detach right_left_child from the tree.
+        node.right.set_child('left', node)
+
+        # Step 3 - reattach right_left_child as the right child of node.
+        node.set_child('right', right_left_child)
+
+        # Step 4 - the new subtree root takes over the old root's size, and the
+        # parent's size is recomputed from its now correct children.
+        self.fix_rotated_sizes(node, size)
+
+        return node.parent
+
+    # Performs a right rotation at the given node. Returns the
+    # subtree's new root.
+    def rotate_right(self, node):
+        if self.stats is not None:
+            self.stats.rotations += 1
+
+        # Define a convenience pointer to the left child of the
+        # right child.
+        left_right_child = node.left.right
+        size = node.size
+
+        # Step 1 - the left child moves up to the node's position.
+        # This detaches node from the tree, but it will be reattached
+        # later.
+        if node.parent is not None:
+            node.parent.replace_child(node, node.left)
+        else:  # node is root
+            self.root = node.left
+            self.root.parent = None
+
+        # Step 2 - the node becomes the right child of what used
+        # to be its left child, but is now its parent. This will
+        # detach left_right_child from the tree.
+        node.left.set_child('right', node)
+
+        # Step 3 - reattach left_right_child as the left child of node.
+        node.set_child('left', left_right_child)
+
+        # Step 4 - fix the sizes of the new subtree root and its parent.
+        self.fix_rotated_sizes(node, size)
+
+        return node.parent
+
+    # After a rotation moved node below its old child, gives the new subtree root
+    # the subtree size node had before the rotation and recomputes the parent's
+    # size, which set_child computed while the rotation was half done.
+    def fix_rotated_sizes(self, node, size):
+        node.parent.size = size
+        if node.parent.parent is not None:
+            node.parent.parent.update_size()
+
+    # Updates the given node's height and rebalances the subtree if
+    # the balancing factor is now -2 or +2. Rebalancing is done by
+    # performing a rotation. Returns the subtree's new root if
+    # a rotation occurred, or the node if no rebalancing was required.
+    # With stats enabled, a step that changes the height or rotates counts
+    # toward the operation's rebalance path.
+    def rebalance(self, node):
+        stats = self.stats
+        if stats is not None:
+            height = node.height
+
+        # First update the height and size of this node.
+        node.update_height()
+        node.update_size()
+
+        # Check for an imbalance.
+        balance = node.get_balance()
+        if stats is not None and (balance == -2 or balance == 2 or node.height != height):
+            stats.path += 1
+        if balance == -2:
+
+            # The subtree is too big to the right.
+            if node.right.get_balance() == 1:
+                # Double rotation case. First do a right rotation
+                # on the right child.
+                if stats is not None:
+                    stats.double_rotations += 1
+                self.rotate_right(node.right)
+
+            # A left rotation will now make the subtree balanced.
+            return self.rotate_left(node)
+
+        elif balance == 2:
+
+            # The subtree is too big to the left
+            if node.left.get_balance() == -1:
+                # Double rotation case. First do a left rotation
+                # on the left child.
+                if stats is not None:
+                    stats.double_rotations += 1
+                self.rotate_left(node.left)
+
+            # A right rotation will now make the subtree balanced.
+            return self.rotate_right(node)
+
+        # No imbalance, so just return the original node.
+        return node
+
+    # Inserts a Node, or a word which is wrapped in a Node keyed by the
+    # tree's normalization policy. An attached anagram index gets the word too.
+    def insert(self, node):
+        if not isinstance(node, Node):
+            node = Node(self.make_key(node), node)
+        word = node.word
+        self.version += 1
+        stats = self.stats
+        if stats is not None:
+            stats.start("insert")
+
+        # Special case: if the tree is empty, just set the root to
+        # the new node.
+        if self.root is None:
+            self.root = node
+            node.parent = None
+
+        else:
+            # Step 1 - do a regular binary search tree insert.
+            current_node = self.root
+            while current_node is not None:
+                # Choose to go left or right
+                if node.key < current_node.key:
+                    # Go left. If left child is None, insert the new
+                    # node here.
+                    if current_node.left is None:
+                        current_node.left = node
+                        node.parent = current_node
+                        current_node = None
+                    else:
+                        # Go left and do the loop again.
+                        current_node = current_node.left
+                else:
+                    # Go right. If the right child is None, insert the
+                    # new node here.
+                    if current_node.right is None:
+                        current_node.right = node
+                        node.parent = current_node
+                        current_node = None
+                    else:
+                        # Go right and do the loop again.
+                        current_node = current_node.right
+
+            if stats is not None:
+                stats.comparisons += node_depth(node)
+
+            # Step 2 - Rebalance along a path from the new node's parent up
+            # to the root.
+            node = node.parent
+            while node is not None:
+                self.rebalance(node)
+                node = node.parent
+
+        if self.anagram_index is not None:
+            self.anagram_index.add(word)
+        if stats is not None:
+            stats.finish()
+
+    # Removes one occurrence of word from the tree and from an attached anagram
+    # index. Returns True if it was found and removed, False otherwise.
+    def remove(self, word):
+        key = self.make_key(word)
+        node = search_node(self.root, key)
+        if node is None:
+            return False
+        stats = self.stats
+        if stats is not None:
+            stats.start("remove")
+            stats.comparisons += descent_length(self.root, key)
+        self.remove_node(node)
+        if self.anagram_index is not None:
+            remaining = search_node(self.root, key)
+            self.anagram_index.removed(word, None if remaining is None else remaining.word)
+        if stats is not None:
+            stats.finish()
+        return True
+
+    def remove_node(self, node):
+        self.version += 1
+
+        # Case 1: Internal node with 2 children. The successor's key and word
+        # are copied into node and the successor is removed instead.
+        if node.left is not None and node.right is not None:
+            successor = node.right
+            while successor.left is not None:
+                successor = successor.left
+            node.key = successor.key
+            node.word = successor.word
+            self.remove_node(successor)
+            return
+
+        # The child that takes node's place, if any
+        child = node.left
+        if child is None:
+            child = node.right
+
+        # Case 2: Root node with 1 or 0 children
+        if node is self.root:
+            self.root = child
+            if child is not None:
+                child.parent = None
+            return
+
+        # Case 3: Internal node with 1 or 0 children. The parent adopts the
+        # child, then the tree is rebalanced along the path from the parent up
+        # to the root, which also fixes the heights and sizes on that path.
+        parent = node.parent
+        parent.replace_child(node, child)
+        node = parent
+        while node is not None:
+            self.rebalance(node)
+            node = node.parent
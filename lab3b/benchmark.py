@@ -0,0 +1,282 @@
+# Repeatable benchmark suite, run with python Lab3.B.py benchmark
+
+import time
+import os
+import argparse
+import json
+import math
+import platform
+import random
+import shutil
+import tempfile
+
+from .keys import CASE_FOLD
+from .avl import AVLTree
+from .redblack import RedBlackTree
+from .arraytree import ArrayAVLTree, ArrayRedBlackTree
+from .trie import Trie
+from .btree import BTree
+from .persistent import PersistentAVLTree, PersistentRedBlackTree
+from .dictionary import build_anagram_index
+from .anagrams import AnagramCache, count_anagrams, search_anagrams, most_anagrams
+from .classes import anagram_classes_from_index
+
+
+# The backends compared by the benchmark suite, by the name used in its results
+BENCHMARK_BACKENDS = [
+    ("avl", AVLTree),
+    ("red-black", RedBlackTree),
+    ("array-avl", ArrayAVLTree),
+    ("array-red-black", ArrayRedBlackTree),
+    ("trie", Trie),
+    ("btree", BTree),
+    ("persistent-avl", PersistentAVLTree),
+    ("persistent-red-black", PersistentRedBlackTree),
+]
+
+# The synthetic corpus shapes and workloads the benchmark suite knows
+BENCHMARK_CORPORA = ["sorted", "shuffled", "zipfian"]
+BENCHMARK_WORKLOADS = ["build", "insert", "lookup", "count_anagrams", "anagram_search", "most_anagrams",
+                       "count_anagrams_search", "most_anagrams_search"]
+
+# The workloads ending in _search run on a tree built without the anagram index
+# and classes, so they time each backend's own search instead of a dictionary
+# lookup. That search is factorial in word length on the trees, so they only
+# use this many probes of at most this many letters.
+BENCHMARK_SEARCH_PROBES = 200
+BENCHMARK_SEARCH_LENGTH = 7
+
+# Letters of the synthetic words, weighted roughly like English text
+BENCHMARK_LETTERS = "eeeeeeeeeeeettttttttaaaaaaaaoooooooiiiiiiinnnnnnnsssssshhhhhhrrrrrrddddllllcccuuummwwffggyyppbbvkjxqz"
+
+
+# Returns count distinct random words of 3 to 10 letters, in random order
+def random_words(count, rng):
+    words = set()
+    while len(words) < count:
+        length = rng.randint(3, 10)
+        words.add("".join(rng.choice(BENCHMARK_LETTERS) for _ in range(length)))
+    words = list(words)
+    rng.shuffle(words)
+    return words
+
+
+# Returns count words drawn from vocabulary with Zipf-distributed frequencies, so
+# a few words repeat very often and most are rare, like words in real text
+def zipfian_sample(vocabulary, count, rng, exponent=1.1):
+    weights = [1.0 / (rank + 1) ** exponent for rank in range(len(vocabulary))]
+    return rng.choices(vocabulary, weights=weights, k=count)
+
+
+# Returns a synthetic corpus of size words. "sorted" and "shuffled" hold distinct
+# words in sorted or random order, "zipfian" holds Zipf-distributed repeats.
+def make_corpus(kind, size, seed=0):
+    rng = random.Random(seed)
+    if kind == "zipfian":
+        return zipfian_sample(random_words(max(size // 4, 1), rng), size, rng)
+    words = random_words(size, rng)
+    if kind == "sorted":
+        words.sort()
+    return words
+
+
+# Returns the value at percentile (0 to 100) of a sorted list, by nearest rank
+def percentile(sorted_values, percent):
+    if not sorted_values:
+        return 0.0
+    rank = int(math.ceil(percent / 100.0 * len(sorted_values))) - 1
+    return sorted_values[min(max(rank, 0), len(sorted_values) - 1)]
+
+
+# Returns min, mean and the 50th, 95th and 99th percentiles of samples
+def summarize(samples):
+    samples = sorted(samples)
+    return {"min": samples[0], "mean": sum(samples) / len(samples), "p50": percentile(samples, 50),
+            "p95": percentile(samples, 95), "p99": percentile(samples, 99), "max": samples[-1]}
+
+
+# Times run() warmup times without recording, then repeat times with
+# perf_counter, and returns the summary of the recorded seconds
+def time_runs(run, repeat, warmup):
+    for i in range(warmup):
+        run()
+    samples = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        run()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+# Returns a tree of the given class built from words, with the anagram index,
+# cache and classes attached the same way the creators attach them. The index
+# is left out when attach_index is False and the classes when attach_classes is.
+def benchmark_tree(tree_class, words, attach_index=True, attach_classes=True):
+    tree = tree_class.from_sorted(words, CASE_FOLD)
+    index = build_anagram_index(words, CASE_FOLD) if attach_index or attach_classes else None
+    if attach_index and tree_class is not Trie:
+        tree.anagram_index = index
+    tree.anagram_cache = AnagramCache()
+    if attach_classes:
+        tree.anagram_classes = anagram_classes_from_index(index, tree.version)
+    return tree
+
+
+# Returns the probes the _search workloads use
+def search_probes(probes):
+    return [probe for probe in probes if len(probe) <= BENCHMARK_SEARCH_LENGTH][:BENCHMARK_SEARCH_PROBES]
+
+
+# Runs one workload on one backend and corpus. Returns the result record: the
+# summary of whole-run seconds, and for lookups also per-operation nanoseconds.
+# most_anagrams reads candidates_file and most_anagrams_search
+# search_candidates_file, which holds the search_probes.
+def run_workload(workload, tree_class, words, probes, candidates_file, repeat, warmup,
+                 search_candidates_file=None):
+    record = {"ops": len(words)}
+    if workload == "build":
+        record["seconds"] = time_runs(lambda: benchmark_tree(tree_class, words), repeat, warmup)
+        return record
+    if workload == "insert":
+        def insert_all():
+            tree = tree_class(normalize=CASE_FOLD)
+            for word in words:
+                tree.insert(word)
+        record["seconds"] = time_runs(insert_all, repeat, warmup)
+        return record
+
+    searching = workload.endswith("_search")
+    tree = benchmark_tree(tree_class, words, attach_index=not searching, attach_classes=not searching)
+    if searching:
+        probes = search_probes(probes)
+    if workload == "lookup":
+        latencies = []
+
+        def lookup_all():
+            del latencies[:]
+            for probe in probes:
+                start = time.perf_counter_ns()
+                probe in tree
+                latencies.append(time.perf_counter_ns() - start)
+        record["ops"] = len(probes)
+        record["seconds"] = time_runs(lookup_all, repeat, warmup)
+        record["per_op_ns"] = summarize(latencies)
+    elif workload in ("count_anagrams", "count_anagrams_search"):
+        # The cache is cleared each run so every run measures the search
+        def count_all():
+            tree.anagram_cache = AnagramCache()
+            for probe in probes:
+                count_anagrams(tree, probe)
+        record["ops"] = len(probes)
+        record["seconds"] = time_runs(count_all, repeat, warmup)
+    elif workload == "anagram_search":
+        # Without the index the trees search permutations and the trie walks prefixes
+        def search_all():
+            for probe in probes:
+                search_anagrams(tree, probe)
+        record["ops"] = len(probes)
+        record["seconds"] = time_runs(search_all, repeat, warmup)
+    elif workload in ("most_anagrams", "most_anagrams_search"):
+        file = search_candidates_file if searching else candidates_file
+
+        def most_all():
+            tree.anagram_cache = AnagramCache()
+            most_anagrams(file, tree)
+        record["ops"] = len(probes)
+        record["seconds"] = time_runs(most_all, repeat, warmup)
+    return record
+
+
+# Runs every workload for every backend, corpus kind and size and returns the
+# results as a JSON-ready dictionary
+def run_benchmarks(sizes, corpora=None, backends=None, workloads=None, probe_count=10000,
+                   repeat=5, warmup=1, seed=0, log=print):
+    corpora = corpora or BENCHMARK_CORPORA
+    workloads = workloads or BENCHMARK_WORKLOADS
+    backends = [(name, tree_class) for name, tree_class in BENCHMARK_BACKENDS
+                if backends is None or name in backends]
+    results = []
+    temp_dir = tempfile.mkdtemp(prefix="lab3b-bench-")
+    try:
+        for size in sizes:
+            for corpus in corpora:
+                words = make_corpus(corpus, size, seed)
+                rng = random.Random(seed + 1)
+                probes = zipfian_sample(words, probe_count, rng) if corpus == "zipfian" else \
+                    [rng.choice(words) for _ in range(probe_count)]
+                candidates_file = os.path.join(temp_dir, "candidates-%s-%d.txt" % (corpus, size))
+                with open(candidates_file, "w") as file_:
+                    file_.write("\n".join(probes) + "\n")
+                search_candidates_file = os.path.join(temp_dir, "search-candidates-%s-%d.txt" % (corpus, size))
+                with open(search_candidates_file, "w") as file_:
+                    file_.write("\n".join(search_probes(probes)) + "\n")
+                for name, tree_class in backends:
+                    for workload in workloads:
+                        record = run_workload(workload, tree_class, words, probes, candidates_file,
+                                              repeat, warmup, search_candidates_file)
+                        record.update({"backend": name, "corpus": corpus, "size": size, "workload": workload})
+                        results.append(record)
+                        log("%-20s %-9s %9d %-21s p50 %.6fs" % (name, corpus, size, workload,
+                                                               record["seconds"]["p50"]))
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    return {"meta": {"python": platform.python_version(), "platform": platform.platform(),
+                     "time": time.strftime("%Y-%m-%dT%H:%M:%S"), "repeat": repeat, "warmup": warmup,
+                     "seed": seed, "probes": probe_count},
+            "results": results}
+
+
+# Compares two benchmark result dictionaries. Returns a list of
+# (backend, corpus, size, workload, old p50, new p50, ratio) for every run whose
+# median time grew by more than threshold (0.10 is 10%).
+def compare_benchmarks(old, new, threshold=0.10):
+    old_runs = {}
+    for record in old["results"]:
+        old_runs[(record["backend"], record["corpus"], record["size"], record["workload"])] = record
+    regressions = []
+    for record in new["results"]:
+        key = (record["backend"], record["corpus"], record["size"], record["workload"])
+        if key in old_runs:
+            before = old_runs[key]["seconds"]["p50"]
+            after = record["seconds"]["p50"]
+            if before > 0 and after / before > 1 + threshold:
+                regressions.append(key + (before, after, after / before))
+    return regressions
+
+
+# Command line entry point of the benchmark suite, run as
+# python Lab3.B.py benchmark [options]. Returns the process exit status, which
+# is 1 when --compare found regressions.
+def benchmark_main(argv):
+    parser = argparse.ArgumentParser(prog="Lab3.B.py benchmark",
+                                     description="Benchmark the dictionary backends on synthetic corpora.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10 ** 4, 10 ** 5],
+                        help="corpus sizes in words, e.g. 10000 100000 1000000 10000000")
+    parser.add_argument("--corpora", nargs="+", choices=BENCHMARK_CORPORA, default=None)
+    parser.add_argument("--backends", nargs="+", choices=[name for name, tree_class in BENCHMARK_BACKENDS],
+                        default=None)
+    parser.add_argument("--workloads", nargs="+", choices=BENCHMARK_WORKLOADS, default=None)
+    parser.add_argument("--probes", type=int, default=10000, help="lookups and anagram queries per run")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", help="JSON results of an earlier run to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="slowdown of the median that counts as a regression (default 0.10)")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.sizes, args.corpora, args.backends, args.workloads, args.probes,
+                             args.repeat, args.warmup, args.seed)
+    if args.output:
+        with open(args.output, "w") as file_:
+            json.dump(results, file_, indent=2)
+    if args.compare:
+        with open(args.compare) as file_:
+            regressions = compare_benchmarks(json.load(file_), results, args.threshold)
+        for backend, corpus, size, workload, before, after, ratio in regressions:
+            print("REGRESSION %s %s %d %s: %.6fs -> %.6fs (%.2fx)" % (backend, corpus, size, workload,
+                                                                     before, after, ratio))
+        if regressions:
+            return 1
+    return 0
@@ -0,0 +1,350 @@
+# B+ tree of dictionary words with a configurable fanout
+
+from bisect import bisect_left, bisect_right
+
+from .keys import normalize_key, sort_words
+
+
+# Default number of keys in a leaf and children of an internal node. A lookup
+# in a tree of n words follows about log(n) / log(BTREE_FANOUT) node links
+# and does a binary search with bisect inside each node.
+BTREE_FANOUT = 64
+
+
+# BTreeLeaf class - a leaf of a BTree. keys are the sorted normalized keys and
+# words their spellings, and next is the leaf that follows this one in key
+# order, or None for the last leaf.
+class BTreeLeaf:
+    __slots__ = ("keys", "words", "next")
+
+    def __init__(self, keys=None, words=None):
+        self.keys = [] if keys is None else keys
+        self.words = [] if words is None else words
+        self.next = None
+
+
+# BTreeInternal class - an internal node of a BTree. children[i] holds the keys
+# from keys[i - 1] up to but not including keys[i], so there is one key fewer
+# than there are children.
+class BTreeInternal:
+    __slots__ = ("keys", "children")
+
+    def __init__(self, keys, children):
+        self.keys = keys
+        self.children = children
+
+
+# BTree class - a B+ tree. Every word is stored in a leaf, internal nodes only
+# route searches, and the leaves are linked in key order so scans walk along
+# them without going back up the tree. Each key is stored once: inserting a
+# word whose key is already present keeps the first spelling, like the trie.
+class BTree:
+    # fanout is the largest number of keys in a leaf and of children of an
+    # internal node. Every node but the root is kept at least half full.
+    def __init__(self, normalize=None, fanout=BTREE_FANOUT):
+        if fanout < 3:
+            raise ValueError("B-tree fanout must be at least 3")
+        self.fanout = fanout
+        self.root = BTreeLeaf()
+        self.size = 0
+        self.normalize = normalize
+        self.version = 0
+        self.anagram_index = None
+        self.letter_counts = None
+        self.anagram_classes = None
+        self.anagram_cache = None
+
+    def __len__(self):
+        return self.size
+
+    # Returns the comparison key the tree uses for word
+    def make_key(self, word):
+        return normalize_key(self.normalize, word)
+
+    # Builds a B-tree from an iterable of words in O(n), bottom-up, with the
+    # keys spread evenly over as few full nodes as possible. Unsorted input is
+    # sorted first, and repeated keys keep their first spelling.
+    @classmethod
+    def from_sorted(cls, words, normalize=None, fanout=BTREE_FANOUT):
+        keys, words = sort_words(words, normalize)
+        tree = cls(normalize, fanout)
+        unique_keys = []
+        unique_words = []
+        for i in range(len(keys)):
+            if not unique_keys or keys[i] != unique_keys[-1]:
+                unique_keys.append(keys[i])
+                unique_words.append(words[i])
+        tree.size = len(unique_keys)
+        if not unique_keys:
+            return tree
+
+        # Cut the keys into leaves and link them
+        nodes = []
+        lows = []
+        for start, end in even_groups(len(unique_keys), fanout):
+            leaf = BTreeLeaf(unique_keys[start:end], unique_words[start:end])
+            if nodes:
+                nodes[-1].next = leaf
+            nodes.append(leaf)
+            lows.append(unique_keys[start])
+
+        # Then group each level under a new one until a single root is left.
+        # lows holds the smallest key under each node of the current level.
+        while len(nodes) > 1:
+            parents = []
+            parent_lows = []
+            for start, end in even_groups(len(nodes), fanout):
+                parents.append(BTreeInternal(lows[start + 1:end], nodes[start:end]))
+                parent_lows.append(lows[start])
+            nodes = parents
+            lows = parent_lows
+        tree.root = nodes[0]
+        return tree
+
+    # Returns the leaf whose key range holds key
+    def find_leaf(self, key):
+        node = self.root
+        while type(node) is BTreeInternal:
+            node = node.children[bisect_right(node.keys, key)]
+        return node
+
+    # Returns the stored spelling of word, or None if it is not in the tree
+    def search(self, word):
+        key = self.make_key(word)
+        leaf = self.find_leaf(key)
+        i = bisect_left(leaf.keys, key)
+        if i < len(leaf.keys) and leaf.keys[i] == key:
+            return leaf.words[i]
+        return None
+
+    def __contains__(self, word):
+        return self.search(word) is not None
+
+    # Returns the stored word for each of the words, or None for missing words
+    def search_many(self, words):
+        return self.words_for_keys([self.make_key(word) for word in words])
+
+    # Returns a list of booleans telling which of the words are in the tree
+    def contains_many(self, words):
+        return [word is not None for word in self.search_many(words)]
+
+    # Returns the stored word for each of the already normalized keys, or None.
+    # The keys are visited in sorted order, and a key inside the range of the
+    # leaf the previous key was found in is searched there without a descent.
+    def words_for_keys(self, keys):
+        results = [None] * len(keys)
+        leaf = None
+        for i in sorted(range(len(keys)), key=keys.__getitem__):
+            key = keys[i]
+            if leaf is None or not leaf.keys or not leaf.keys[0] <= key <= leaf.keys[-1]:
+                leaf = self.find_leaf(key)
+            j = bisect_left(leaf.keys, key)
+            if j < len(leaf.keys) and leaf.keys[j] == key:
+                results[i] = leaf.words[j]
+        return results
+
+    # Iterating yields the words in sorted order, lazily. The tree must not be
+    # changed while an iterator over it is in use.
+    def __iter__(self):
+        return self.iter_from()
+
+    # Yields the words in sorted order starting at the first one that does not
+    # sort before word, or at the smallest word for None. After one descent the
+    # scan follows the leaf links.
+    def iter_from(self, word=None):
+        if word is None:
+            leaf = self.root
+            while type(leaf) is BTreeInternal:
+                leaf = leaf.children[0]
+            i = 0
+        else:
+            key = self.make_key(word)
+            leaf = self.find_leaf(key)
+            i = bisect_left(leaf.keys, key)
+        while leaf is not None:
+            yield from leaf.words[i:]
+            leaf = leaf.next
+            i = 0
+
+    # Yields the (key, word) pairs from the first key that does not sort before
+    # key, or from the smallest key for None
+    def iter_items_from(self, key):
+        if key is None:
+            leaf = self.root
+            while type(leaf) is BTreeInternal:
+                leaf = leaf.children[0]
+            i = 0
+        else:
+            leaf = self.find_leaf(key)
+            i = bisect_left(leaf.keys, key)
+        while leaf is not None:
+            yield from zip(leaf.keys[i:], leaf.words[i:])
+            leaf = leaf.next
+            i = 0
+
+    # Yields the words from lo up to but not including hi in sorted order.
+    # Either bound may be None to leave that end open.
+    def range(self, lo=None, hi=None):
+        high = None if hi is None else self.make_key(hi)
+        for key, word in self.iter_items_from(None if lo is None else self.make_key(lo)):
+            if high is not None and not key < high:
+                return
+            yield word
+
+    # Yields the words that start with prefix in sorted order
+    def prefix(self, prefix):
+        start = self.make_key(prefix)
+        for key, word in self.iter_items_from(start):
+            if not key.startswith(start):
+                return
+            yield word
+
+    # Inserts a word, keyed by the tree's normalization policy, and adds it to
+    # an attached anagram index. A full node is split in two and the split is
+    # passed up to its parent, and a full root gets a new root above it.
+    def insert(self, word):
+        key = self.make_key(word)
+        path = []
+        node = self.root
+        while type(node) is BTreeInternal:
+            i = bisect_right(node.keys, key)
+            path.append((node, i))
+            node = node.children[i]
+        i = bisect_left(node.keys, key)
+        if i < len(node.keys) and node.keys[i] == key:
+            return
+        node.keys.insert(i, key)
+        node.words.insert(i, word)
+        self.size += 1
+        self.version += 1
+        if self.anagram_index is not None:
+            self.anagram_index.add(word)
+
+        if len(node.keys) <= self.fanout:
+            return
+        # Split the leaf, then every ancestor that overflows in turn
+        middle = len(node.keys) // 2
+        right = BTreeLeaf(node.keys[middle:], node.words[middle:])
+        del node.keys[middle:]
+        del node.words[middle:]
+        right.next = node.next
+        node.next = right
+        separator = right.keys[0]
+        while path:
+            parent, i = path.pop()
+            parent.keys.insert(i, separator)
+            parent.children.insert(i + 1, right)
+            if len(parent.children) <= self.fanout:
+                return
+            middle = len(parent.children) // 2
+            separator = parent.keys[middle - 1]
+            right = BTreeInternal(parent.keys[middle:], parent.children[middle:])
+            del parent.keys[middle - 1:]
+            del parent.children[middle:]
+        self.root = BTreeInternal([separator], [self.root, right])
+
+    # Removes word from the tree and from an attached anagram index. A node
+    # left less than half full borrows from a sibling, or is merged with one
+    # when neither can spare anything, and a root left with one child is
+    # replaced by it. Returns True if it was found and removed, False otherwise.
+    def remove(self, word):
+        key = self.make_key(word)
+        path = []
+        node = self.root
+        while type(node) is BTreeInternal:
+            i = bisect_right(node.keys, key)
+            path.append((node, i))
+            node = node.children[i]
+        i = bisect_left(node.keys, key)
+        if i == len(node.keys) or node.keys[i] != key:
+            return False
+        del node.keys[i]
+        del node.words[i]
+        self.size -= 1
+        self.version += 1
+        if self.anagram_index is not None:
+            self.anagram_index.remove(word)
+
+        while path and self.underflows(node):
+            parent, i = path.pop()
+            if type(node) is BTreeLeaf:
+                self.rebalance_leaf(parent, i)
+            else:
+                self.rebalance_internal(parent, i)
+            node = parent
+        if type(self.root) is BTreeInternal and len(self.root.children) == 1:
+            self.root = self.root.children[0]
+        return True
+
+    # Returns True if node is less than half full
+    def underflows(self, node):
+        if type(node) is BTreeLeaf:
+            return len(node.keys) < self.fanout // 2
+        return len(node.children) < (self.fanout + 1) // 2
+
+    # Refills the leaf parent.children[i] from a sibling, or merges them
+    def rebalance_leaf(self, parent, i):
+        leaf = parent.children[i]
+        left = parent.children[i - 1] if i > 0 else None
+        right = parent.children[i + 1] if i + 1 < len(parent.children) else None
+        if left is not None and len(left.keys) > self.fanout // 2:
+            leaf.keys.insert(0, left.keys.pop())
+            leaf.words.insert(0, left.words.pop())
+            parent.keys[i - 1] = leaf.keys[0]
+        elif right is not None and len(right.keys) > self.fanout // 2:
+            leaf.keys.append(right.keys.pop(0))
+            leaf.words.append(right.words.pop(0))
+            parent.keys[i] = right.keys[0]
+        elif left is not None:
+            left.keys.extend(leaf.keys)
+            left.words.extend(leaf.words)
+            left.next = leaf.next
+            del parent.keys[i - 1]
+            del parent.children[i]
+        else:
+            leaf.keys.extend(right.keys)
+            leaf.words.extend(right.words)
+            leaf.next = right.next
+            del parent.keys[i]
+            del parent.children[i + 1]
+
+    # Refills the internal node parent.children[i] from a sibling through the
+    # separator between them, or merges them around that separator
+    def rebalance_internal(self, parent, i):
+        node = parent.children[i]
+        left = parent.children[i - 1] if i > 0 else None
+        right = parent.children[i + 1] if i + 1 < len(parent.children) else None
+        minimum = (self.fanout + 1) // 2
+        if left is not None and len(left.children) > minimum:
+            node.children.insert(0, left.children.pop())
+            node.keys.insert(0, parent.keys[i - 1])
+            parent.keys[i - 1] = left.keys.pop()
+        elif right is not None and len(right.children) > minimum:
+            node.children.append(right.children.pop(0))
+            node.keys.append(parent.keys[i])
+            parent.keys[i] = right.keys.pop(0)
+        elif left is not None:
+            left.keys.append(parent.keys[i - 1])
+            left.keys.extend(node.keys)
+            left.children.extend(node.children)
+            del parent.keys[i - 1]
+            del parent.children[i]
+        else:
+            node.keys.append(parent.keys[i])
+            node.keys.extend(right.keys)
+            node.children.extend(right.children)
+            del parent.keys[i]
+            del parent.children[i + 1]
+
+
+# Returns (start, end) ranges that split count items into as few groups of at
+# most size items as possible, with the group sizes differing by at most one
+def even_groups(count, size):
+    groups = -(-count // size)
+    ranges = []
+    start = 0
+    for g in range(groups):
+        end = start + count // groups + (1 if g < count % groups else 0)
+        ranges.append((start, end))
+        start = end
+    return ranges
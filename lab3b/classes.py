@@ -0,0 +1,124 @@
+# Anagram classes of the whole dictionary: every set of words that are anagrams
+# of each other and its size, computed in one pass instead of one search per
+# word. NumPy is optional. Without it the classes are grouped in plain Python.
+
+import collections
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from .keys import normalize_key
+from .dictionary import anagram_signature
+
+
+# AnagramClasses class - the size of every anagram class of a dictionary, keyed
+# by letter signature. The size of a class is the number of distinct keys in it,
+# which is what count_anagrams returns for any word of the class, so counting
+# the anagrams of a word is one dictionary lookup. version is the version of the
+# tree the classes were computed for.
+class AnagramClasses:
+    def __init__(self, sizes, normalize=None, version=0):
+        self.sizes = sizes
+        self.normalize = normalize
+        self.version = version
+
+    # Returns the number of anagram classes
+    def __len__(self):
+        return len(self.sizes)
+
+    # Returns the number of dictionary words that are anagrams of word
+    def count(self, word):
+        key = normalize_key(self.normalize, word.strip())
+        return self.sizes.get(anagram_signature(key), 0)
+
+    # Updates the sizes for the normalized keys added to and removed from the
+    # dictionary the classes were computed for, and makes them the classes of
+    # version. Each added key must be new and each removed key one that was in
+    # the dictionary.
+    def update(self, added, removed, version):
+        sizes = self.sizes
+        for key in removed:
+            signature = anagram_signature(key)
+            size = sizes.get(signature, 0) - 1
+            if size > 0:
+                sizes[signature] = size
+            else:
+                sizes.pop(signature, None)
+        for key in added:
+            signature = anagram_signature(key)
+            sizes[signature] = sizes.get(signature, 0) + 1
+        self.version = version
+
+    # Returns the number of classes of each size, smallest size first
+    def histogram(self):
+        return dict(sorted(collections.Counter(self.sizes.values()).items()))
+
+    # Returns the k largest classes as (signature, size) pairs, largest first.
+    # Classes of the same size are ordered by signature.
+    def largest(self, k=10):
+        return sorted(self.sizes.items(), key=lambda item: (-item[1], item[0]))[:k]
+
+    # Returns a summary of the classes: how many there are, how many words they
+    # hold, how many words have at least one other anagram, and the histogram
+    def report(self):
+        histogram = self.histogram()
+        return {
+            "classes": len(self.sizes),
+            "words": sum(size * count for size, count in histogram.items()),
+            "words_with_anagrams": sum(size * count for size, count in histogram.items() if size > 1),
+            "largest": max(histogram) if histogram else 0,
+            "sizes": histogram,
+        }
+
+
+# Returns the anagram classes of words. Words with the same normalized key count
+# once and blank words are ignored. With NumPy the keys are grouped by length,
+# each group becomes a matrix of code points whose rows are sorted at once, so
+# each row reads back as the key's signature, and one numpy.unique call per
+# length groups the signatures and counts each class.
+def build_anagram_classes(words, normalize=None, version=0):
+    keys = words if normalize is None else map(normalize, words)
+    keys = [key for key in dict.fromkeys(keys) if key]
+    if numpy is None:
+        return AnagramClasses(dict(collections.Counter(map(anagram_signature, keys))), normalize, version)
+
+    sizes = {}
+    lengths = numpy.fromiter(map(len, keys), dtype=numpy.int64, count=len(keys))
+    order = numpy.argsort(lengths, kind="stable")
+    lengths = lengths[order]
+    starts = numpy.flatnonzero(numpy.diff(lengths, prepend=-1)).tolist() + [len(keys)]
+    for start, end in zip(starts, starts[1:]):
+        group = numpy.array([keys[i] for i in order[start:end].tolist()])
+        length = int(lengths[start])
+        letters = numpy.sort(group.view(numpy.uint32).reshape(end - start, length), axis=1)
+        signatures, counts = numpy.unique(letters.view(group.dtype).ravel(), return_counts=True)
+        sizes.update(zip(signatures.tolist(), counts.tolist()))
+    return AnagramClasses(sizes, normalize, version)
+
+
+# Returns the anagram classes of the words in an anagram index. Its groups are
+# the classes already, so each size is the length of a group and the words are
+# not read again.
+def anagram_classes_from_index(index, version=0):
+    groups = index.groups
+    return AnagramClasses(dict(zip(groups, map(len, groups.values()))), index.normalize, version)
+
+
+# Returns anagram classes for the current version of tree: from its anagram
+# index when it has one, and otherwise from words, or from every word in the
+# tree when words is None
+def rebuild_anagram_classes(tree, words=None):
+    if tree.anagram_index is not None:
+        return anagram_classes_from_index(tree.anagram_index, tree.version)
+    return build_anagram_classes(list(tree) if words is None else words, tree.normalize, tree.version)
+
+
+# Returns the tree's anagram classes when they are current, or None when it has
+# none or has changed since they were computed
+def current_anagram_classes(tree):
+    classes = getattr(tree, "anagram_classes", None)
+    if classes is None or classes.version != tree.version:
+        return None
+    return classes
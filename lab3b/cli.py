@@ -0,0 +1,226 @@
+# Interactive menu and the batch query command line
+
+import time
+import sys
+import argparse
+import contextlib
+import json
+
+from .creators import avl_tree_creator, red_black_tree_creator, array_avl_tree_creator, \
+    array_red_black_tree_creator, trie_creator, btree_creator, persistent_avl_tree_creator, \
+    persistent_red_black_tree_creator
+from .anagrams import count_anagrams, top_anagrams
+from .keys import CASE_FOLD
+from .dictionary import load_dictionary
+from .classes import build_anagram_classes
+from .protocol import BATCH_STRUCTURES, answer_query
+from .benchmark import benchmark_main
+from .server import serve_main, load_test_main
+from .metrics import enable_metrics
+
+
+# The data structures the user can choose from, in menu order
+DATA_STRUCTURES = [
+    ("AVL Tree", avl_tree_creator),
+    ("Red-Black Tree", red_black_tree_creator),
+    ("Array-backed AVL Tree", array_avl_tree_creator),
+    ("Array-backed Red-Black Tree", array_red_black_tree_creator),
+    ("Trie", trie_creator),
+    ("B-Tree", btree_creator),
+    ("Persistent AVL Tree", persistent_avl_tree_creator),
+    ("Persistent Red-Black Tree", persistent_red_black_tree_creator),
+]
+
+
+# This will allow the user to choose which tree they want to use.
+def user_option_data_structure():
+    print("Hello, which data structure do you wish to use? (Enter corresponding digit)")
+    for i in range(len(DATA_STRUCTURES)):
+        print("%d.) %s" % (i + 1, DATA_STRUCTURES[i][0]))
+    print("%d.) Exit" % (len(DATA_STRUCTURES) + 1))
+
+
+# This will allow the user to choose what they want to do with the chosen data structure
+def user_option_action():
+    print()
+    print("What would you like to do with this data structure? (Enter corresponding digit)")
+    print("1.) Find the number of anagrams for a word")
+    print("2.) Find the word with the most anagrams in the file")
+    print("3.) Exit")
+
+
+# Reads a menu choice from the user and keeps asking until it is one of the
+# digits 1 to choices
+def read_choice(choices):
+    user_response = input()
+
+    # Checks for erroneous user input
+    while user_response.isdigit() is False or not 1 <= int(user_response) <= choices:
+        if not user_response.isdigit():
+            user_response = input("Sorry, please enter the single digit that corresponds to desired answer. \n")
+        else:
+            user_response = input("Sorry, that is not one of the available choices. \n")
+    return int(user_response)
+
+
+# Runs the action menu on the chosen data structure until the user exits
+def run_actions(tree):
+    user_option_action()
+    user_response = read_choice(3)
+
+    # Keeps repeating until exit
+    while user_response != 3:
+        # Search for number of anagrams of a word
+        if user_response == 1:
+            print("Enter the word you want to use")
+            word_answer = input()
+
+            while word_answer.isdigit():
+                word_answer = input("Oops. Check your input and try again.")
+
+            start_time = time.perf_counter()
+            anagrams = count_anagrams(tree, word_answer)
+            print(word_answer + " has " + str(anagrams) + " anagrams")
+            print("Running time for this: %s milliseconds " % ((time.perf_counter() - start_time) * 1000))
+        # If user picks 2, ask for the name of the file
+        elif user_response == 2:
+            print("Enter the name of the file you want to use.(Make sure to add '.txt' at the end)")
+            word_answer = input()
+
+            try:
+                ranked = top_anagrams(word_answer, tree)
+                if ranked:
+                    print("The word with the most anagrams is: " + ranked[0][0])
+                    for i in range(len(ranked)):
+                        print("%d.) %s (%d anagrams)" % (i + 1, ranked[i][0], ranked[i][1]))
+                else:
+                    print("None of the words in the file have anagrams")
+            except FileNotFoundError:
+                print("Sorry, the file could not be found")
+                sys.exit("The program will now exit.")
+
+        user_option_action()
+        user_response = read_choice(3)
+    sys.exit("Program will now exit.")
+
+
+def main():
+    user_option_data_structure()
+    user_response = read_choice(len(DATA_STRUCTURES) + 1)
+
+    # The last choice exits the program
+    if user_response == len(DATA_STRUCTURES) + 1:
+        sys.exit("Thank you, program will now exit.")
+
+    # Otherwise create the chosen data structure from the words file
+    tree = DATA_STRUCTURES[user_response - 1][1]("words.txt")
+    run_actions(tree)
+
+
+# Answers every query in lines and writes the results to output as JSON lines,
+# in input order. Returns the number of queries answered. flush sends each
+# result as soon as it is ready, for interactive use.
+def run_batch(tree, lines, output, flush=False):
+    answered = 0
+    for line in lines:
+        result = answer_query(tree, line)
+        if result is None:
+            continue
+        output.write(json.dumps(result) + "\n")
+        if flush:
+            output.flush()
+        answered += 1
+    return answered
+
+
+# Entry point of python Lab3.B.py query. The dictionary is built once, with its
+# progress messages sent to stderr so stdout holds only results, and then every
+# query is answered from the same data structure.
+def batch_main(argv):
+    parser = argparse.ArgumentParser(prog="Lab3.B.py query",
+                                     description="Answer dictionary queries read from a file or stdin as JSON lines")
+    parser.add_argument("queries", nargs="?", default="-", help="query file, - for stdin (default)")
+    parser.add_argument("--structure", choices=list(BATCH_STRUCTURES), default="avl")
+    parser.add_argument("--words", default="words.txt", help="dictionary words file")
+    parser.add_argument("--output", default="-", help="results file, - for stdout (default)")
+    parser.add_argument("--no-snapshot", action="store_true", help="always build from the words file")
+    parser.add_argument("--metrics", metavar="PATH",
+                        help="write latency metrics to PATH, as JSON for a .json path and Prometheus text otherwise")
+    args = parser.parse_args(argv)
+
+    recorder = enable_metrics() if args.metrics is not None else None
+    with contextlib.redirect_stdout(sys.stderr):
+        tree = BATCH_STRUCTURES[args.structure](args.words, use_snapshot=not args.no_snapshot)
+
+    queries = sys.stdin if args.queries == "-" else open(args.queries)
+    output = sys.stdout if args.output == "-" else open(args.output, "w")
+    try:
+        start_time = time.perf_counter()
+        answered = run_batch(tree, queries, output, flush=queries.isatty())
+        elapsed = time.perf_counter() - start_time
+    finally:
+        if queries is not sys.stdin:
+            queries.close()
+        if output is not sys.stdout:
+            output.close()
+        else:
+            output.flush()
+    print("Answered %d queries in %s seconds" % (answered, elapsed), file=sys.stderr)
+    if recorder is not None:
+        recorder.dump(args.metrics)
+    return 0
+
+
+# Entry point of python Lab3.B.py classes. Computes every anagram class of the
+# dictionary in one pass and prints the largest classes with their words and a
+# histogram of class sizes, or writes them to --output as JSON.
+def classes_main(argv):
+    parser = argparse.ArgumentParser(prog="Lab3.B.py classes",
+                                     description="Report the anagram classes of the whole dictionary")
+    parser.add_argument("--words", default="words.txt", help="dictionary words file")
+    parser.add_argument("--top", type=int, default=10, help="number of largest classes to list")
+    parser.add_argument("--output", help="write the report to this JSON file")
+    parser.add_argument("--no-snapshot", action="store_true", help="always build from the words file")
+    args = parser.parse_args(argv)
+
+    words, index = load_dictionary(args.words, CASE_FOLD, not args.no_snapshot)
+    start_time = time.perf_counter()
+    classes = build_anagram_classes(words, CASE_FOLD)
+    elapsed = time.perf_counter() - start_time
+    report = classes.report()
+    report["largest_classes"] = [{"signature": signature, "size": size, "words": index.lookup(signature)}
+                                 for signature, size in classes.largest(args.top)]
+    report["seconds"] = elapsed
+    if args.output:
+        with open(args.output, "w") as file_:
+            json.dump(report, file_, indent=2)
+        return 0
+
+    print("%d words in %d anagram classes, computed in %s seconds"
+          % (report["words"], report["classes"], elapsed))
+    print("%d words have at least one other anagram" % report["words_with_anagrams"])
+    for i in range(len(report["largest_classes"])):
+        largest = report["largest_classes"][i]
+        print("%d.) %s (%d words)" % (i + 1, " ".join(largest["words"]), largest["size"]))
+    print("Class size histogram:")
+    for size, count in report["sizes"].items():
+        print("%6d %d" % (size, count))
+    return 0
+
+
+# Runs the program with the command line arguments argv: the benchmark suite,
+# the batch query command line, the anagram class report, the query server and
+# its load test, or the interactive menu when there are none.
+def run(argv):
+    if argv and argv[0] == "benchmark":
+        return benchmark_main(argv[1:])
+    if argv and argv[0] == "query":
+        return batch_main(argv[1:])
+    if argv and argv[0] == "classes":
+        return classes_main(argv[1:])
+    if argv and argv[0] == "serve":
+        return serve_main(argv[1:])
+    if argv and argv[0] == "loadtest":
+        return load_test_main(argv[1:])
+    main()
+    return 0
@@ -0,0 +1,83 @@
+# Builds each data structure from a words file
+
+import time
+
+from .keys import CASE_FOLD
+from .avl import AVLTree
+from .redblack import RedBlackTree
+from .arraytree import ArrayAVLTree, ArrayRedBlackTree
+from .trie import Trie
+from .btree import BTREE_FANOUT, BTree
+from .persistent import PersistentAVLTree, PersistentRedBlackTree
+from .ingest import collection_paused
+from .dictionary import load_dictionary
+from .anagrams import AnagramCache
+from .classes import anagram_classes_from_index
+from . import metrics
+
+
+# Builds a cls from the words in a file and attaches what the queries use: the
+# anagram index (unless attach_index is False), an anagram cache shared by every
+# query on the tree and the anagram classes that answer most_anagrams, which
+# are counted from the index's groups whether or not it is attached. The letter
+# counts are built by the first sub-anagram query, not here, so a start
+# from the snapshot does not pay for them. Keys are normalized with the normalize
+# policy, and the words are loaded from the file's snapshot when use_snapshot is
+# True and it is current. label names the structure in the progress messages
+# and metric_name in the "build" metric. Extra keyword arguments go to
+# cls.from_sorted.
+def build_structure(cls, label, metric_name, file, normalize, use_snapshot, attach_index=True, **kwargs):
+    print("Please wait. %s is being created." % label)
+    start_time = time.perf_counter_ns()
+    with collection_paused():
+        words, index = load_dictionary(file, normalize, use_snapshot)
+        tree = cls.from_sorted(words, normalize, **kwargs)  # Builds the structure in one pass
+    if attach_index:
+        tree.anagram_index = index
+    tree.anagram_cache = AnagramCache()
+    tree.anagram_classes = anagram_classes_from_index(index, tree.version)
+    metrics.record_since("build " + metric_name, start_time)
+    print("%s was created in %s seconds" % (label, (time.perf_counter_ns() - start_time) / 1e9))
+    return tree
+
+
+# The creators below build each structure with build_structure. Keys are
+# case-insensitive by default.
+
+def avl_tree_creator(file, normalize=CASE_FOLD, use_snapshot=True):
+    return build_structure(AVLTree, "AVL Tree", "avl", file, normalize, use_snapshot)
+
+
+def red_black_tree_creator(file, normalize=CASE_FOLD, use_snapshot=True):
+    return build_structure(RedBlackTree, "Red-Black Tree", "red-black", file, normalize, use_snapshot)
+
+
+# The array-backed trees preallocate their arrays to the number of words
+def array_avl_tree_creator(file, normalize=CASE_FOLD, use_snapshot=True):
+    return build_structure(ArrayAVLTree, "Array-backed AVL Tree", "array-avl", file, normalize, use_snapshot)
+
+
+def array_red_black_tree_creator(file, normalize=CASE_FOLD, use_snapshot=True):
+    return build_structure(ArrayRedBlackTree, "Array-backed Red-Black Tree", "array-red-black", file, normalize,
+                           use_snapshot)
+
+
+# The trie enumerates anagrams itself, so the anagram index is not attached to it
+def trie_creator(file, normalize=CASE_FOLD, use_snapshot=True):
+    return build_structure(Trie, "Trie", "trie", file, normalize, use_snapshot, attach_index=False)
+
+
+# The B-tree's nodes hold up to fanout keys or children
+def btree_creator(file, normalize=CASE_FOLD, use_snapshot=True, fanout=BTREE_FANOUT):
+    return build_structure(BTree, "B-Tree", "btree", file, normalize, use_snapshot, fanout=fanout)
+
+
+# The persistent trees can be read from threads without locking while they are updated
+def persistent_avl_tree_creator(file, normalize=CASE_FOLD, use_snapshot=True):
+    return build_structure(PersistentAVLTree, "Persistent AVL Tree", "persistent-avl", file, normalize,
+                           use_snapshot)
+
+
+def persistent_red_black_tree_creator(file, normalize=CASE_FOLD, use_snapshot=True):
+    return build_structure(PersistentRedBlackTree, "Persistent Red-Black Tree", "persistent-red-black", file,
+                           normalize, use_snapshot)
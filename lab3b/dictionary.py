@@ -0,0 +1,378 @@
+# The anagram index and loading the dictionary from a words file or its snapshot
+
+import sys
+import os
+import contextlib
+import mmap
+import struct
+import hashlib
+import zlib
+from array import array
+
+from .keys import CASE_FOLD, normalize_key, sort_words
+from .ingest import read_lines, ingest_words, collection_paused
+
+
+# Returns the canonical letter signature of a normalized key. Two words are
+# anagrams of each other exactly when their signatures are equal.
+def anagram_signature(key):
+    return "".join(sorted(key))
+
+
+# AnagramIndex class - groups dictionary words by their letter signature so the
+# anagrams of a word can be found with one dictionary lookup. normalize is the
+# same policy the trees use, so the index agrees with the tree search.
+class AnagramIndex:
+    def __init__(self, normalize=CASE_FOLD):
+        self.groups = {}
+        self.normalize = normalize
+
+    # Returns the number of distinct signatures in the index
+    def __len__(self):
+        return len(self.groups)
+
+    # Returns the group of words for signature, empty when there is none. A
+    # group is never changed in place.
+    def group(self, signature):
+        return self.groups.get(signature, [])
+
+    # Makes group the group for signature, dropping the signature when the
+    # group is empty
+    def replace_group(self, signature, group):
+        if group:
+            self.groups[signature] = group
+        else:
+            self.groups.pop(signature, None)
+
+    # Adds a word to the group for its signature. Words with the same normalized
+    # key are stored once, the same way the tree search treats them as one word.
+    # A changed group is replaced by a new list instead of being changed in
+    # place, so a lookup on another thread sees the group before or after the
+    # change and never part of it.
+    def add(self, word):
+        key = normalize_key(self.normalize, word)
+        signature = anagram_signature(key)
+        group = self.group(signature)
+        for other in group:
+            if normalize_key(self.normalize, other) == key:
+                return False
+        self.replace_group(signature, group + [word])
+        return True
+
+    # Removes the word with the same normalized key as word from its group.
+    # Returns True if one was removed.
+    def remove(self, word):
+        key = normalize_key(self.normalize, word)
+        signature = anagram_signature(key)
+        group = self.group(signature)
+        for i in range(len(group)):
+            if normalize_key(self.normalize, group[i]) == key:
+                self.replace_group(signature, group[:i] + group[i + 1:])
+                return True
+        return False
+
+    # Updates the index after a tree removed one occurrence of word. remaining
+    # is the word the tree still holds under the same key, or None.
+    def removed(self, word, remaining=None):
+        self.remove(word)
+        if remaining is not None:
+            self.add(remaining)
+
+    # Returns the list of dictionary words that are anagrams of word
+    def lookup(self, word):
+        key = normalize_key(self.normalize, word)
+        return list(self.group(anagram_signature(key)))
+
+
+# Changed groups a PersistentAnagramIndex keeps apart from its base before
+# folding them into a new one
+PERSISTENT_INDEX_CHANGES = 1024
+
+
+# PersistentAnagramIndex class - an anagram index whose versions can be kept,
+# for the persistent trees. The groups are a base dict that is never changed,
+# shared by every copy, and a small dict of the groups changed since, where an
+# empty group marks a removed signature. copy() copies only the changes, so a
+# tree can give each version its own index, and once the changes grow past
+# PERSISTENT_INDEX_CHANGES they are folded into a new base.
+class PersistentAnagramIndex(AnagramIndex):
+    def __init__(self, normalize=CASE_FOLD, base=None, changes=None):
+        self.normalize = normalize
+        self.base = {} if base is None else base
+        self.changes = {} if changes is None else changes
+
+    # Returns a PersistentAnagramIndex holding a copy of index's groups
+    @classmethod
+    def from_index(cls, index):
+        return cls(index.normalize, dict(index.groups))
+
+    # Every group, as one dict. Without changes this is the base itself, which
+    # must not be changed.
+    @property
+    def groups(self):
+        if not self.changes:
+            return self.base
+        groups = dict(self.base)
+        for signature, group in self.changes.items():
+            if group:
+                groups[signature] = group
+            else:
+                groups.pop(signature, None)
+        return groups
+
+    def __len__(self):
+        return len(self.groups)
+
+    def group(self, signature):
+        group = self.changes.get(signature)
+        if group is None:
+            return self.base.get(signature, [])
+        return group
+
+    def replace_group(self, signature, group):
+        self.changes[signature] = group
+        if len(self.changes) > PERSISTENT_INDEX_CHANGES:
+            self.base = self.groups
+            self.changes = {}
+
+    # Returns an index with the same groups that can be changed without
+    # changing this one
+    def copy(self):
+        return PersistentAnagramIndex(self.normalize, self.base, dict(self.changes))
+
+
+# Reads the words of a file, plain or compressed, one per line. Each line is
+# stripped of spaces before and after the word, and blank lines are kept.
+def read_words(file):
+    return read_lines(file)
+
+
+# Builds the anagram index for a list of words
+def build_anagram_index(words, normalize=CASE_FOLD):
+    index = AnagramIndex(normalize)
+    for word in words:
+        index.add(word)
+    return index
+
+
+# Snapshot file layout. A snapshot holds the words of a built dictionary in
+# sorted key order and the groups of its anagram index, so a restart can bulk
+# load them instead of re-reading and sorting words.txt. All numbers are little
+# endian. The header is followed by the anagram group members and group starts,
+# then the UTF-8 words and the group signatures, each joined by newlines. The
+# header ends with the CRC-32 of everything after it.
+SNAPSHOT_MAGIC = b"LAB3SNAP"
+SNAPSHOT_VERSION = 3
+SNAPSHOT_HEADER = struct.Struct("<8sII32sQQQQI")
+
+# Normalization policies a snapshot can record, by their stored number
+SNAPSHOT_POLICIES = {None: 0, CASE_FOLD: 1}
+
+
+# Returns the snapshot path used for a words file
+def snapshot_path(file):
+    return file + ".snap"
+
+
+# Returns the SHA-256 digest of a file, read in large blocks
+def file_checksum(file):
+    digest = hashlib.sha256()
+    with open(file, "rb") as file_:
+        block = file_.read(1 << 20)
+        while block:
+            digest.update(block)
+            block = file_.read(1 << 20)
+    return digest.digest()
+
+
+# Returns the array as little-endian bytes
+def little_endian_bytes(values):
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+# Returns buffer[start:end] read as a little-endian array of the given typecode
+def little_endian_array(buffer, start, end, typecode):
+    values = array(typecode)
+    values.frombytes(buffer[start:end])
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+# Writes a snapshot of words (already in sorted key order) and their anagram
+# index. checksum is the digest of the words file they came from. Returns False
+# if the normalization policy cannot be recorded in a snapshot or the file
+# cannot be written, as in a read-only directory; the dictionary works the
+# same without one.
+def save_snapshot(path, checksum, words, index, normalize):
+    if normalize not in SNAPSHOT_POLICIES:
+        return False
+
+    # Each anagram group is stored as the positions of its words
+    position = {}
+    for i in range(len(words)):
+        position.setdefault(words[i], i)
+    members = array("I")
+    group_starts = array("I", [0])
+    for group in index.groups.values():
+        for word in group:
+            members.append(position[word])
+        group_starts.append(len(members))
+
+    words_blob = "\n".join(words).encode("utf-8")
+    signatures_blob = "\n".join(index.groups).encode("utf-8")
+    sections = [little_endian_bytes(members), little_endian_bytes(group_starts), words_blob, signatures_blob]
+    payload_checksum = 0
+    for section in sections:
+        payload_checksum = zlib.crc32(section, payload_checksum)
+    header = SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, SNAPSHOT_POLICIES[normalize], checksum,
+                                  len(words), len(index.groups), len(members), len(words_blob), payload_checksum)
+    temp_path = path + ".tmp"
+    try:
+        with open(temp_path, "wb") as file_:
+            file_.write(header)
+            for section in sections:
+                file_.write(section)
+        os.replace(temp_path, path)
+    except OSError:
+        with contextlib.suppress(OSError):
+            os.remove(temp_path)
+        return False
+    return True
+
+
+# Splits a newline-joined blob back into count strings
+def split_blob(blob, count):
+    if count == 0:
+        return []
+    return blob.decode("utf-8").split("\n")
+
+
+# Loads a snapshot written by save_snapshot. Returns the sorted words and their
+# anagram index, or None if the file is missing, has another version or policy,
+# was not built from a words file with the given checksum, or is truncated or
+# corrupt. Any of these makes the caller rebuild the dictionary and write a
+# new snapshot over the bad one.
+def load_snapshot(path, checksum, normalize):
+    if normalize not in SNAPSHOT_POLICIES or not os.path.exists(path):
+        return None
+    with open(path, "rb") as file_:
+        if os.fstat(file_.fileno()).st_size < SNAPSHOT_HEADER.size:
+            return None
+        snapshot = mmap.mmap(file_.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        magic, version, policy, source, word_count, group_count, member_count, words_size, payload_checksum = \
+            SNAPSHOT_HEADER.unpack_from(snapshot, 0)
+        if (magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION
+                or policy != SNAPSHOT_POLICIES[normalize] or source != checksum):
+            return None
+
+        # Find each section from the counts in the header, and check that they
+        # fit in the file and that the payload is what was written
+        members_start = SNAPSHOT_HEADER.size
+        starts_start = members_start + 4 * member_count
+        words_start = starts_start + 4 * (group_count + 1)
+        signatures_start = words_start + words_size
+        if signatures_start > len(snapshot) or zlib.crc32(snapshot[members_start:]) != payload_checksum:
+            return None
+
+        # Words and signatures are split in one pass over each blob, and the
+        # groups are sliced out of one list of member words
+        try:
+            words = split_blob(snapshot[words_start:signatures_start], word_count)
+            signatures = split_blob(snapshot[signatures_start:], group_count)
+        except UnicodeDecodeError:
+            return None
+        members = little_endian_array(snapshot, members_start, starts_start, "I")
+        group_starts = little_endian_array(snapshot, starts_start, words_start, "I").tolist()
+        if (len(words) != word_count or len(signatures) != group_count
+                or group_starts[0] != 0 or group_starts[-1] != member_count
+                or group_starts != sorted(group_starts)
+                or (members and max(members) >= word_count)):
+            return None
+        member_words = list(map(words.__getitem__, members))
+        index = AnagramIndex(normalize)
+        index.groups = dict(zip(signatures, map(member_words.__getitem__, map(slice, group_starts, group_starts[1:]))))
+        return words, index
+    finally:
+        snapshot.close()
+
+
+# Returns the words of a file in sorted key order together with their anagram
+# index. Blank lines and repeated keys are dropped while the file is read. When
+# use_snapshot is True they are loaded from the file's snapshot if it was made
+# from the current words file, and otherwise built and saved to it.
+def load_dictionary(file, normalize=CASE_FOLD, use_snapshot=True):
+    checksum = None
+    if use_snapshot:
+        checksum = file_checksum(file)
+        loaded = load_snapshot(snapshot_path(file), checksum, normalize)
+        if loaded is not None:
+            print("Loaded the dictionary from snapshot " + snapshot_path(file))
+            return loaded
+
+    words, keys, stats = ingest_words(file, normalize)
+    print("Read %d words from %s at %.1f MB/s, dropping %d blank lines and %d duplicates"
+          % (len(words), file, stats.throughput(), stats.blank, stats.duplicates))
+    keys, words = sort_words(words, normalize, keys)
+    index = build_anagram_index(words, normalize)
+    if use_snapshot:
+        save_snapshot(snapshot_path(file), checksum, words, index, normalize)
+    return words, index
+
+
+# Updates a built tree from old_file to new_file by applying only the words
+# that were removed or added, instead of rebuilding. Both files are read with
+# ingest_words, so blank lines and repeated keys never reach the tree, and they
+# are compared by normalized key: a key whose first spelling changed is removed
+# and inserted again, which leaves the tree as a fresh build of new_file would.
+# The tree must support remove(), which the array-backed trees do not, and keeps
+# its anagram index up to date itself. Current anagram classes get their sizes
+# changed for just the removed and added keys, and the letter counts are rebuilt
+# by the next sub-anagram query. Returns the number of words added and removed.
+def reload_dictionary(tree, old_file, new_file):
+    # Imported here because the classes module imports anagram_signature from this one
+    from .classes import current_anagram_classes, rebuild_anagram_classes
+
+    if not hasattr(tree, "remove"):
+        raise TypeError("%s does not support removing words" % type(tree).__name__)
+    with collection_paused():
+        old_words = set(ingest_words(old_file, tree.normalize)[0])
+        new_words = ingest_words(new_file, tree.normalize)[0]
+        # A key is determined by its word, so the words only one file has are
+        # the keys removed or added plus both spellings of a changed key, and
+        # only they are normalized
+        changed = old_words.symmetric_difference(new_words)
+    removed = sorted((normalize_key(tree.normalize, word), word) for word in changed if word in old_words)
+    added = sorted((normalize_key(tree.normalize, word), word) for word in changed if word not in old_words)
+    classes = current_anagram_classes(tree)
+    for key, word in removed:
+        tree.remove(word)
+    for key, word in added:
+        tree.insert(word)
+    if classes is not None:
+        classes.update([key for key, word in added], [key for key, word in removed], tree.version)
+    elif getattr(tree, "anagram_classes", None) is not None:
+        tree.anagram_classes = rebuild_anagram_classes(tree, new_words)
+    return len(added), len(removed)
+
+
+# Merges the words of another words file into a built AVLTree or RedBlackTree
+# with one union instead of an insert per word, keeping its anagram index up to
+# date. The file is read with ingest_words, so its blank lines and repeated keys
+# are dropped before the union. Anagram classes are rebuilt when the tree had
+# them, from its anagram index when it has one, and letter counts by the next
+# sub-anagram query. Returns the number of words added.
+def merge_word_list(tree, file):
+    if not hasattr(tree, "union"):
+        raise TypeError("%s does not support merging word lists" % type(tree).__name__)
+    size = len(tree)
+    words, keys, stats = ingest_words(file, tree.normalize)
+    tree.union(type(tree).from_sorted(words, tree.normalize))
+    if tree.anagram_classes is not None:
+        from .classes import rebuild_anagram_classes
+        tree.anagram_classes = rebuild_anagram_classes(tree)
+    return len(tree) - size
@@ -0,0 +1,157 @@
+# Reading words files in bulk. A plain file is memory-mapped and a gzip, xz or
+# bzip2 file is decompressed as a stream, and either way the bytes are split
+# into lines a large block at a time instead of line by line.
+
+import os
+import mmap
+import time
+import gzip
+import lzma
+import bz2
+import gc
+import contextlib
+
+
+# Bytes decoded and split at a time
+INGEST_BLOCK_SIZE = 1 << 22
+
+# Compressed formats recognized by their leading magic bytes, with the function
+# that opens them as a binary stream
+COMPRESSED_FORMATS = [
+    (b"\x1f\x8b", gzip.open),
+    (b"\xfd7zXZ\x00", lzma.open),
+    (b"BZh", bz2.open),
+]
+
+
+# Returns the function that opens file as a decompressed binary stream, or None
+# when the file is not compressed
+def compressed_opener(file):
+    with open(file, "rb") as file_:
+        magic = file_.read(8)
+    for prefix, opener in COMPRESSED_FORMATS:
+        if magic.startswith(prefix):
+            return opener
+    return None
+
+
+# Yields the bytes of a plain file in blocks of about block_size that each end
+# after a newline (except perhaps the last), read through a memory map
+def mapped_blocks(file_, block_size):
+    size = os.fstat(file_.fileno()).st_size
+    if size == 0:
+        return
+    with mmap.mmap(file_.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        start = 0
+        while start < size:
+            end = min(start + block_size, size)
+            if end < size:
+                newline = data.rfind(b"\n", start, end)
+                if newline < 0:
+                    # A line longer than a block is read whole
+                    newline = data.find(b"\n", end)
+                end = size if newline < 0 else newline + 1
+            yield data[start:end]
+            start = end
+
+
+# Yields the bytes of a binary stream in blocks that each end after a newline
+# (except perhaps the last), carrying a partial line over to the next block
+def stream_blocks(stream, block_size):
+    carry = b""
+    while True:
+        block = stream.read(block_size)
+        if not block:
+            break
+        newline = block.rfind(b"\n")
+        if newline < 0:
+            carry += block
+            continue
+        yield carry + block[:newline + 1]
+        carry = block[newline + 1:]
+    if carry:
+        yield carry
+
+
+# IngestStats class - what reading a words file found and how fast it went.
+# bytes is the decompressed size and file_bytes the size on disk.
+class IngestStats:
+    def __init__(self, file):
+        self.file = file
+        self.file_bytes = os.path.getsize(file)
+        self.bytes = 0
+        self.lines = 0
+        self.blank = 0
+        self.duplicates = 0
+        self.seconds = 0.0
+
+    # Returns the decompressed megabytes read per second
+    def throughput(self):
+        if self.seconds <= 0:
+            return 0.0
+        return self.bytes / 1e6 / self.seconds
+
+    # Returns the counters as a dictionary
+    def report(self):
+        return {"file": self.file, "file_bytes": self.file_bytes, "bytes": self.bytes, "lines": self.lines,
+                "blank": self.blank, "duplicates": self.duplicates, "seconds": self.seconds,
+                "mb_per_second": self.throughput()}
+
+
+# Reads the lines of a words file, plain or compressed, and returns them
+# stripped, blank lines included. stats, an IngestStats, is updated with the
+# bytes and lines read when given.
+def read_lines(file, encoding="utf-8", block_size=INGEST_BLOCK_SIZE, stats=None):
+    opener = compressed_opener(file)
+    lines = []
+    with (open(file, "rb") if opener is None else opener(file, "rb")) as file_:
+        blocks = mapped_blocks(file_, block_size) if opener is None else stream_blocks(file_, block_size)
+        for block in blocks:
+            text = block.decode(encoding)
+            if text.endswith("\n"):
+                text = text[:-1]
+            lines.extend(map(str.strip, text.split("\n")))
+            if stats is not None:
+                stats.bytes += len(block)
+    if stats is not None:
+        stats.lines += len(lines)
+    return lines
+
+
+# Reads a words file like read_lines, then drops blank lines and words whose
+# normalized key was already seen, keeping the first spelling, before they can
+# reach a tree. Returns the words in file order, their normalized keys, which
+# callers use instead of normalizing every word again, and an IngestStats.
+def ingest_words(file, normalize=None, encoding="utf-8", block_size=INGEST_BLOCK_SIZE):
+    stats = IngestStats(file)
+    start_time = time.perf_counter()
+    lines = read_lines(file, encoding, block_size, stats)
+    words = [line for line in lines if line]
+    stats.blank = len(lines) - len(words)
+    keys = words if normalize is None else list(map(normalize, words))
+    if len(set(keys)) != len(keys):
+        # setdefault keeps the first spelling of each key. No repeated keys,
+        # the usual case, is found without a loop in Python.
+        first = {}
+        for key, word in zip(keys, words):
+            first.setdefault(key, word)
+        keys = list(first)
+        stats.duplicates = len(words) - len(keys)
+        words = list(first.values())
+    stats.seconds = time.perf_counter() - start_time
+    return words, keys, stats
+
+
+# Pauses the cyclic garbage collector while words files are read and a dictionary
+# is built or reloaded. Reading a file allocates hundreds of thousands of objects
+# that all stay alive, so the collections they would trigger scan them, and every
+# node of a tree already built, over and over and free nothing.
+@contextlib.contextmanager
+def collection_paused():
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
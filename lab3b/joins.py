@@ -0,0 +1,204 @@
+# Join, split and set operations shared by the node-based trees. Everything is
+# built on the tree's join_nodes, which joins two subtrees around a middle node
+# in time proportional to the difference of their heights, so two dictionaries
+# of m <= n words are merged in O(m log(n/m + 1)) rotations instead of m inserts.
+
+from .dictionary import build_anagram_index
+
+
+# Detaches node's children from it and from each other and returns them as
+# (left, right). node is left on its own, ready to be used as a join's middle.
+def detach(node):
+    left = node.left
+    right = node.right
+    node.left = node.right = node.parent = None
+    if left is not None:
+        left.parent = None
+    if right is not None:
+        right.parent = None
+    return left, right
+
+
+# Returns the node with the smallest key in the subtree at node
+def leftmost(node):
+    while node.left is not None:
+        node = node.left
+    return node
+
+
+# Returns the node with the largest key in the subtree at node
+def rightmost(node):
+    while node.right is not None:
+        node = node.right
+    return node
+
+
+# SetOperations class - join, split, union, intersection and difference for a
+# tree class that provides join_nodes. The operations move nodes between trees
+# instead of copying them: the tree they are called on gets the result and the
+# other tree is left empty. Words are compared by key, and a key found in both
+# trees keeps the spelling it has in the tree the operation is called on.
+class SetOperations:
+    # Returns an empty tree of the same class to run joins in. The joins only
+    # use its root as scratch space, and its stats are this tree's.
+    def scratch(self):
+        tree = type(self)(self.normalize)
+        tree.stats = self.stats
+        return tree
+
+    # Raises an error unless other is a tree of the same class and policy
+    def check_compatible(self, other):
+        if type(other) is not type(self):
+            raise TypeError("cannot combine %s with %s" % (type(self).__name__, type(other).__name__))
+        if other.normalize is not self.normalize:
+            raise ValueError("cannot combine trees with different normalization policies")
+
+    # Makes root this tree's root. The letter counts are dropped, to be rebuilt
+    # by the next sub-anagram query, and the anagram classes and cache see the
+    # new version and stop being used.
+    def replace_root(self, root):
+        if root is not None:
+            root.parent = None
+        self.root = root
+        self.version += 1
+        self.letter_counts = None
+
+    # Leaves other empty after its nodes were moved into this tree
+    def emptied(self, other):
+        other.replace_root(None)
+        other.anagram_index = None
+
+    # Moves every word of other, which must all sort at or after the words of
+    # this tree, to the end of this tree in O(log n), and leaves other empty
+    def join(self, other):
+        self.check_compatible(other)
+        if self.root is not None and other.root is not None and \
+                leftmost(other.root).key < rightmost(self.root).key:
+            raise ValueError("the joined tree's words must sort after this tree's words")
+        added = list(other) if self.anagram_index is not None else ()
+        self.replace_root(self.scratch().join_pair(self.root, other.root))
+        self.emptied(other)
+        for word in added:
+            self.anagram_index.add(word)
+
+    # Splits the tree into two new trees, one with the words that sort before
+    # word and one with the rest, in O(log n), and leaves this tree empty. The
+    # new trees have no anagram index, cache or counts attached.
+    def split(self, word):
+        left, right = self.scratch().split_nodes(self.root, self.make_key(word), False)
+        trees = []
+        for root in (left, right):
+            tree = type(self)(self.normalize)
+            tree.replace_root(root)
+            tree.stats = self.stats
+            trees.append(tree)
+        self.emptied(self)
+        return trees[0], trees[1]
+
+    # Adds the words of other that are not in this tree and leaves other empty
+    def union(self, other):
+        self.check_compatible(other)
+        added = list(other) if self.anagram_index is not None else ()
+        self.replace_root(self.scratch().union_nodes(self.root, other.root))
+        self.emptied(other)
+        for word in added:
+            self.anagram_index.add(word)
+
+    # Keeps only the words that are also in other and leaves other empty. The
+    # anagram index is rebuilt from the words that are left.
+    def intersection(self, other):
+        self.check_compatible(other)
+        self.replace_root(self.scratch().intersection_nodes(self.root, other.root))
+        self.emptied(other)
+        if self.anagram_index is not None:
+            self.anagram_index = build_anagram_index(list(self), self.normalize)
+
+    # Removes the words that are in other and leaves other empty
+    def difference(self, other):
+        self.check_compatible(other)
+        removed = list(other) if self.anagram_index is not None else ()
+        self.replace_root(self.scratch().difference_nodes(self.root, other.root))
+        self.emptied(other)
+        for word in removed:
+            self.anagram_index.remove(word)
+
+    # Returns the subtree at node split into (keys before key, the rest), or
+    # with inclusive (keys up to key, the rest)
+    def split_nodes(self, node, key, inclusive):
+        if node is None:
+            return None, None
+        left, right = detach(node)
+        if node.key < key or (inclusive and node.key == key):
+            below, above = self.split_nodes(right, key, inclusive)
+            return self.join_nodes(left, node, below), above
+        below, above = self.split_nodes(left, key, inclusive)
+        return below, self.join_nodes(above, node, right)
+
+    # Returns the subtree at node split into (keys before key, the node with key
+    # or None, keys after key) in one descent. In a tree with repeated keys the
+    # other nodes with key stay on either side.
+    def split_three(self, node, key):
+        if node is None:
+            return None, None, None
+        left, right = detach(node)
+        if node.key < key:
+            below, equal, above = self.split_three(right, key)
+            return self.join_nodes(left, node, below), equal, above
+        if key < node.key:
+            below, equal, above = self.split_three(left, key)
+            return below, equal, self.join_nodes(above, node, right)
+        return left, node, right
+
+    # Returns the subtree at node without its last node, and that node
+    def pop_last(self, node):
+        left, right = detach(node)
+        if right is None:
+            return left, node
+        rest, last = self.pop_last(right)
+        return self.join_nodes(left, node, rest), last
+
+    # Joins two subtrees without a middle node, where every key of left sorts
+    # before every key of right
+    def join_pair(self, left, right):
+        if left is None:
+            return right
+        if right is None:
+            return left
+        rest, last = self.pop_last(left)
+        return self.join_nodes(rest, last, right)
+
+    # The recursions below split the first subtree around the root of the
+    # second and combine the halves, so their cost depends on the smaller tree.
+
+    # Returns the union of the subtrees at a and b
+    def union_nodes(self, a, b):
+        if a is None:
+            return b
+        if b is None:
+            return a
+        b_left, b_right = detach(b)
+        below, equal, above = self.split_three(a, b.key)
+        if equal is not None:
+            b.word = equal.word
+        return self.join_nodes(self.union_nodes(below, b_left), b, self.union_nodes(above, b_right))
+
+    # Returns the intersection of the subtrees at a and b
+    def intersection_nodes(self, a, b):
+        if a is None or b is None:
+            return None
+        b_left, b_right = detach(b)
+        below, equal, above = self.split_three(a, b.key)
+        left = self.intersection_nodes(below, b_left)
+        right = self.intersection_nodes(above, b_right)
+        if equal is None:
+            return self.join_pair(left, right)
+        b.word = equal.word
+        return self.join_nodes(left, b, right)
+
+    # Returns the subtree at a without the keys in the subtree at b
+    def difference_nodes(self, a, b):
+        if a is None or b is None:
+            return a
+        b_left, b_right = detach(b)
+        below, equal, above = self.split_three(a, b.key)
+        return self.join_pair(self.difference_nodes(below, b_left), self.difference_nodes(above, b_right))
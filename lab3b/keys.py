@@ -0,0 +1,269 @@
+# Key normalization, and the search helpers and read-only queries shared by the
+# node-based trees
+
+
+# Normalization policy that makes the trees order and compare words
+# case-insensitively. A policy is any function from a word to its comparison key,
+# and None compares the words exactly as written.
+CASE_FOLD = str.casefold
+
+
+# Returns the comparison key of word under the normalize policy
+def normalize_key(normalize, word):
+    if normalize is None:
+        return word
+    return normalize(word)
+
+
+# Returns two lists, the comparison keys of the words under the normalize policy
+# in ascending order and the words in the same order. Input that is already
+# sorted, like words.txt, is detected with one pass and is not sorted again.
+# keys may give the words' keys when the caller already has them.
+def sort_words(words, normalize=None, keys=None):
+    words = list(words)
+    if keys is None:
+        keys = words
+        if normalize is not None:
+            keys = [normalize(word) for word in words]
+    for i in range(1, len(keys)):
+        if keys[i] < keys[i - 1]:
+            order = sorted(range(len(keys)), key=keys.__getitem__)
+            keys = [keys[j] for j in order]
+            words = [words[j] for j in order]
+            break
+    return keys, words
+
+
+# Returns the number of nodes in the subtree rooted at node, or 0 for None
+def subtree_size(node):
+    if node is None:
+        return 0
+    return node.size
+
+
+# Returns the node with the given normalized key in the subtree at root, or None
+def search_node(root, key):
+    node = root
+    while node is not None:
+        if key == node.key:
+            return node
+        elif key < node.key:
+            node = node.left
+        else:
+            node = node.right
+    return None
+
+
+# Returns the first node in the subtree at root whose key does not sort before
+# key, or None when every key does. A key of None returns the smallest node.
+def lower_bound_node(root, key):
+    bound = None
+    node = root
+    while node is not None:
+        if key is not None and node.key < key:
+            node = node.right
+        else:
+            bound = node
+            node = node.left
+    return bound
+
+
+# Returns the node that follows node in sorted order, or None after the last one
+def successor_node(node):
+    if node.right is not None:
+        node = node.right
+        while node.left is not None:
+            node = node.left
+        return node
+    while node.parent is not None and node is node.parent.right:
+        node = node.parent
+    return node.parent
+
+
+# Yields node and then every node after it in sorted order. The walk follows
+# parent pointers instead of keeping a stack or recursing, so it needs O(1)
+# memory and each step is O(1) amortized.
+def iter_nodes_from(node):
+    while node is not None:
+        yield node
+        node = successor_node(node)
+
+
+# Looks up many normalized keys at once and returns the matching nodes (or None)
+# in the order of keys. The keys are visited in sorted order, and each search
+# starts from the last node visited instead of the root: it climbs only until
+# the key is inside the current subtree and then descends from there. Probes
+# that are close together in the tree therefore cost far less than a full
+# root-to-leaf descent each.
+def finger_search(root, keys):
+    results = [None] * len(keys)
+    finger = root
+    for i in sorted(range(len(keys)), key=keys.__getitem__):
+        key = keys[i]
+
+        # Climb while the key can be past the upper bound of node's subtree. A left
+        # child's subtree is bounded by its parent's key, a right child's subtree by
+        # the same bound as its parent's subtree.
+        node = finger
+        while node is not None and node.parent is not None and (
+                node is node.parent.right or not key < node.parent.key):
+            node = node.parent
+
+        # Then do a regular descent from there
+        while node is not None:
+            finger = node
+            if key == node.key:
+                results[i] = node
+                break
+            elif key < node.key:
+                node = node.left
+            else:
+                node = node.right
+    return results
+
+
+# Returns the number of nodes a search for key compares against
+def descent_length(root, key):
+    length = 0
+    node = root
+    while node is not None:
+        length += 1
+        if key == node.key:
+            break
+        elif key < node.key:
+            node = node.left
+        else:
+            node = node.right
+    return length
+
+
+# Returns the number of ancestors of node, which is the number of key
+# comparisons it took to insert it
+def node_depth(node):
+    depth = 0
+    while node.parent is not None:
+        node = node.parent
+        depth += 1
+    return depth
+
+
+# NodeReads class - the read-only queries shared by the node-based trees, the
+# persistent ones included. Each query reads self.root once, so on a persistent
+# tree it answers from one version from start to finish. Searches are counted
+# while self.stats holds a TreeStats. The walks in nodes_from and
+# nodes_for_keys follow parent pointers, and the persistent trees, whose nodes
+# have none, override them.
+class NodeReads:
+    stats = None
+
+    # Returns the comparison key the tree uses for word
+    def make_key(self, word):
+        return normalize_key(self.normalize, word)
+
+    # Yields the nodes of the subtree at root in sorted order, starting at the
+    # first one whose key does not sort before key, or at the smallest for None.
+    # Seeking is O(log n) and each node after that O(1) amortized.
+    def nodes_from(self, root, key):
+        return iter_nodes_from(lower_bound_node(root, key))
+
+    # Returns the node (or None) for each of the normalized keys in the subtree
+    # at root, using one batched finger search for all of them
+    def nodes_for_keys(self, root, keys):
+        return finger_search(root, keys)
+
+    # Returns the stored spelling of word, or None if it is not in the tree.
+    # Every backend's search returns the word this way.
+    def search(self, word):
+        node = self.search_handle(word)
+        return None if node is None else node.word
+
+    # Returns the node holding word, or None if it is not in the tree
+    def search_handle(self, word):
+        key = self.make_key(word)
+        root = self.root
+        if self.stats is not None:
+            self.stats.searched(descent_length(root, key))
+        return search_node(root, key)
+
+    def __contains__(self, word):
+        return self.search_handle(word) is not None
+
+    # Returns the stored word for each of the words, or None for missing words
+    def search_many(self, words):
+        return self.words_for_keys([self.make_key(word) for word in words])
+
+    # Returns a list of booleans telling which of the words are in the tree
+    def contains_many(self, words):
+        return [node is not None for node in self.nodes_for_keys(self.root, [self.make_key(word) for word in words])]
+
+    # Returns the stored word for each of the already normalized keys, or None
+    def words_for_keys(self, keys):
+        return [None if node is None else node.word for node in self.nodes_for_keys(self.root, keys)]
+
+    # The number of keys is kept in the root's size, so this is O(1)
+    def __len__(self):
+        return subtree_size(self.root)
+
+    # Returns the number of words in the tree that sort before word, in O(log n)
+    def rank(self, word):
+        key = self.make_key(word)
+        rank = 0
+        node = self.root
+        while node is not None:
+            if node.key < key:
+                rank += subtree_size(node.left) + 1
+                node = node.right
+            else:
+                node = node.left
+        return rank
+
+    # Returns the word at position index in sorted order, in O(log n). Negative
+    # indexes count from the end like they do for lists.
+    def select(self, index):
+        node = self.root
+        size = subtree_size(node)
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError("tree index out of range")
+        while True:
+            left_size = subtree_size(node.left)
+            if index < left_size:
+                node = node.left
+            elif index == left_size:
+                return node.word
+            else:
+                index -= left_size + 1
+                node = node.right
+
+    # Iterating yields the words in sorted order, lazily. A tree with parent
+    # pointers must not be changed while an iterator over it is in use, and a
+    # persistent tree's iterator keeps walking the version it started on.
+    def __iter__(self):
+        return self.iter_from()
+
+    # Yields the words in sorted order starting at the first one that does not
+    # sort before word (a lower-bound seek), or at the smallest word for None
+    def iter_from(self, word=None):
+        key = None if word is None else self.make_key(word)
+        for node in self.nodes_from(self.root, key):
+            yield node.word
+
+    # Yields the words from lo up to but not including hi in sorted order, in
+    # O(log n + k) for k words. Either bound may be None to leave that end open.
+    def range(self, lo=None, hi=None):
+        high = None if hi is None else self.make_key(hi)
+        for node in self.nodes_from(self.root, None if lo is None else self.make_key(lo)):
+            if high is not None and not node.key < high:
+                return
+            yield node.word
+
+    # Yields the words that start with prefix in sorted order, in O(log n + k).
+    # The prefix is normalized like a word, so it matches case-insensitively
+    # when the keys are case folded.
+    def prefix(self, prefix):
+        key = self.make_key(prefix)
+        for node in self.nodes_from(self.root, key):
+            if not node.key.startswith(key):
+                return
+            yield node.word
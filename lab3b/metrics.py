@@ -0,0 +1,216 @@
+# Opt-in latency metrics for the query path: fixed-memory histograms of how
+# long each operation took, exportable as JSON or Prometheus text to a file or
+# over HTTP
+
+import os
+import json
+import time
+import threading
+from array import array
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# Latencies are kept with HISTOGRAM_PRECISION significant bits, so a recorded
+# value is off by at most 1 / 2 ** (HISTOGRAM_PRECISION - 1) of itself (under
+# 1%), and values up to 2 ** HISTOGRAM_MAX_BITS nanoseconds (about 4.9 hours)
+# get their own buckets. Anything longer is counted in the last bucket.
+HISTOGRAM_PRECISION = 8
+HISTOGRAM_MAX_BITS = 44
+
+# The quantiles each histogram reports
+METRICS_QUANTILES = (0.5, 0.95, 0.99, 0.999)
+
+# Name of the Prometheus metric family the histograms are exported as
+PROMETHEUS_METRIC = "lab3b_operation_latency_seconds"
+
+# The Metrics the instrumented operations record into, or None while metrics
+# are off, when an operation costs only a clock read and an attribute check more
+active = None
+
+
+# LatencyHistogram class - counts of latencies in nanoseconds in log-linear
+# buckets, like an HDR histogram. Values below 2 ** HISTOGRAM_PRECISION have a
+# bucket each, and every power of two above that is split into
+# 2 ** (HISTOGRAM_PRECISION - 1) equal buckets, so memory is fixed no matter
+# how many values are recorded and quantiles keep a bounded relative error.
+class LatencyHistogram:
+    def __init__(self):
+        half = 1 << (HISTOGRAM_PRECISION - 1)
+        self.counts = array("Q", [0]) * ((1 << HISTOGRAM_PRECISION) + (HISTOGRAM_MAX_BITS - HISTOGRAM_PRECISION) * half)
+        self.last = len(self.counts) - 1
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    # Returns the bucket of a value in nanoseconds
+    @staticmethod
+    def bucket(value):
+        if value < 1 << HISTOGRAM_PRECISION:
+            return value
+        shift = value.bit_length() - HISTOGRAM_PRECISION
+        half = 1 << (HISTOGRAM_PRECISION - 1)
+        return (1 << HISTOGRAM_PRECISION) + (shift - 1) * half + (value >> shift) - half
+
+    # Returns the largest value in nanoseconds that falls in bucket
+    @staticmethod
+    def bucket_limit(bucket):
+        if bucket < 1 << HISTOGRAM_PRECISION:
+            return bucket
+        half = 1 << (HISTOGRAM_PRECISION - 1)
+        shift, top = divmod(bucket - (1 << HISTOGRAM_PRECISION), half)
+        shift += 1
+        return ((top + half + 1) << shift) - 1
+
+    # Records one latency in nanoseconds
+    def record(self, value):
+        bucket = self.bucket(value)
+        self.counts[bucket if bucket < self.last else self.last] += 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    # Returns the latency in nanoseconds that fraction (0 to 1) of the recorded
+    # values are at or below, to within the histogram's precision
+    def quantile(self, fraction):
+        if self.count == 0:
+            return 0
+        rank = max(1, int(fraction * self.count + 0.5))
+        seen = 0
+        for bucket in range(len(self.counts)):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                # The last bucket also holds every larger value, so its limit is the max
+                return self.max if bucket == self.last else min(self.bucket_limit(bucket), self.max)
+        return self.max
+
+    # Adds the values recorded in other to this histogram
+    def merge(self, other):
+        for bucket in range(len(other.counts)):
+            self.counts[bucket] += other.counts[bucket]
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        self.max = max(self.max, other.max)
+
+    # Returns the count, sum, min, mean, max and quantiles, all in seconds
+    def summary(self):
+        summary = {"count": self.count, "sum": self.total / 1e9,
+                   "min": (self.min or 0) / 1e9, "max": self.max / 1e9,
+                   "mean": self.total / self.count / 1e9 if self.count else 0.0}
+        for fraction in METRICS_QUANTILES:
+            summary["p%s" % ("%g" % (fraction * 100)).replace(".", "")] = self.quantile(fraction) / 1e9
+        return summary
+
+
+# Metrics class - one LatencyHistogram per operation name. Recording takes a
+# lock, so operations on several threads can record into the same Metrics.
+class Metrics:
+    def __init__(self):
+        self.histograms = {}
+        self.lock = threading.Lock()
+        self.started = time.time()
+
+    # Records that operation took nanoseconds
+    def record(self, operation, nanoseconds):
+        with self.lock:
+            histogram = self.histograms.get(operation)
+            if histogram is None:
+                histogram = self.histograms[operation] = LatencyHistogram()
+            histogram.record(nanoseconds)
+
+    # Returns the summary of every operation, by name
+    def summaries(self):
+        with self.lock:
+            return {operation: histogram.summary() for operation, histogram in sorted(self.histograms.items())}
+
+    # Returns the metrics as a JSON document
+    def to_json(self):
+        return json.dumps({"started": self.started, "time": time.time(), "operations": self.summaries()},
+                          indent=2)
+
+    # Returns the metrics in the Prometheus text exposition format, as one
+    # summary metric labeled by operation
+    def to_prometheus(self):
+        lines = ["# HELP %s Latency of lab3b operations." % PROMETHEUS_METRIC,
+                 "# TYPE %s summary" % PROMETHEUS_METRIC]
+        with self.lock:
+            histograms = sorted(self.histograms.items())
+            for operation, histogram in histograms:
+                label = 'operation="%s"' % operation.replace("\\", "\\\\").replace('"', '\\"')
+                for fraction in METRICS_QUANTILES:
+                    lines.append('%s{%s,quantile="%g"} %.9f'
+                                 % (PROMETHEUS_METRIC, label, fraction, histogram.quantile(fraction) / 1e9))
+                lines.append("%s_sum{%s} %.9f" % (PROMETHEUS_METRIC, label, histogram.total / 1e9))
+                lines.append("%s_count{%s} %d" % (PROMETHEUS_METRIC, label, histogram.count))
+        return "\n".join(lines) + "\n"
+
+    # Writes the metrics to path, as JSON when the path ends in .json and as
+    # Prometheus text otherwise, replacing the file in one step so a reader
+    # never sees a partial dump
+    def dump(self, path):
+        text = self.to_json() if path.endswith(".json") else self.to_prometheus()
+        temp_path = path + ".tmp"
+        with open(temp_path, "w") as file_:
+            file_.write(text)
+        os.replace(temp_path, path)
+
+
+# Turns metrics on with a new Metrics, or with the given one, and returns it
+def enable_metrics(metrics=None):
+    global active
+    active = Metrics() if metrics is None else metrics
+    return active
+
+
+# Turns metrics off
+def disable_metrics():
+    global active
+    active = None
+
+
+# Records that operation took the nanoseconds since start, a
+# time.perf_counter_ns() reading, when metrics are on
+def record_since(operation, start):
+    metrics = active
+    if metrics is not None:
+        metrics.record(operation, time.perf_counter_ns() - start)
+
+
+# MetricsHandler class - answers GET /metrics with Prometheus text and
+# GET /metrics.json with JSON for the server's metrics
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        metrics = self.server.metrics
+        if self.path == "/metrics":
+            body = metrics.to_prometheus().encode()
+            content_type = "text/plain; version=0.0.4"
+        elif self.path == "/metrics.json":
+            body = metrics.to_json().encode()
+            content_type = "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    # Scrapes are not logged
+    def log_message(self, format, *args):
+        pass
+
+
+# Serves metrics over HTTP on host and port from a background thread and
+# returns the HTTP server, which shutdown() stops
+def serve_metrics(metrics, host="127.0.0.1", port=9100):
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.metrics = metrics
+    thread = threading.Thread(target=server.serve_forever, name="metrics", daemon=True)
+    thread.start()
+    return server
@@ -0,0 +1,428 @@
+# Persistent (copy-on-write) AVL and red-black trees of dictionary words. Nodes
+# are never changed once built: an insert or remove copies only the nodes on the
+# path it changes and publishes the new root, so any number of threads can read
+# the tree while one thread updates it.
+
+import threading
+
+from .keys import NodeReads, search_node, sort_words, subtree_size
+from .dictionary import PersistentAnagramIndex
+
+
+# PersistentAVLNode class - an immutable node of a PersistentAVLTree. The height
+# and size are computed from the children when the node is built.
+class PersistentAVLNode:
+    __slots__ = ("key", "word", "left", "right", "height", "size")
+
+    def __init__(self, key, word, left, right):
+        self.key = key
+        self.word = word
+        self.left = left
+        self.right = right
+        self.height = max(avl_height(left), avl_height(right)) + 1
+        self.size = subtree_size(left) + subtree_size(right) + 1
+
+
+# PersistentRBTNode class - an immutable node of a PersistentRedBlackTree
+class PersistentRBTNode:
+    __slots__ = ("key", "word", "left", "right", "red", "size")
+
+    def __init__(self, key, word, left, right, red):
+        self.key = key
+        self.word = word
+        self.left = left
+        self.right = right
+        self.red = red
+        self.size = subtree_size(left) + subtree_size(right) + 1
+
+
+# Returns the height of an AVL subtree, or -1 for None
+def avl_height(node):
+    if node is None:
+        return -1
+    return node.height
+
+
+# Yields the nodes of the subtree at root in sorted order, starting at the first
+# one whose key does not sort before key, or at the smallest for None. The nodes
+# have no parent pointers, so the walk keeps the path it still has to visit on a
+# stack of O(log n) nodes.
+def iter_persistent_nodes(root, key=None):
+    stack = []
+    node = root
+    while node is not None:
+        if key is not None and node.key < key:
+            node = node.right
+        else:
+            stack.append(node)
+            node = node.left
+    while stack:
+        node = stack.pop()
+        yield node
+        node = node.right
+        while node is not None:
+            stack.append(node)
+            node = node.left
+
+
+# PersistentReads class - the read-only queries shared by the persistent trees
+# and their snapshots. They are NodeReads queries, which read self.root once,
+# so each sees one version of the tree from start to finish even while newer
+# versions are published. The nodes have no parent pointers, so a walk keeps a
+# stack and a batch of keys is searched from the root one key at a time.
+class PersistentReads(NodeReads):
+    def nodes_from(self, root, key):
+        return iter_persistent_nodes(root, key)
+
+    def nodes_for_keys(self, root, keys):
+        return [search_node(root, key) for key in keys]
+
+
+# TreeSnapshot class - one published version of a persistent tree, with the
+# anagram index of that version and the tree's anagram cache, so the anagram
+# queries work on it like on a tree. It is never changed, so it can be read
+# from any thread without locking, and it stays valid after the tree moves on.
+# The only exception is letter_counts, which the first sub-anagram query on the
+# snapshot fills in. A version's nodes are freed as soon as no snapshot,
+# iterator or newer version refers to them.
+class TreeSnapshot(PersistentReads):
+    __slots__ = ("root", "normalize", "version", "anagram_index", "anagram_cache", "letter_counts")
+
+    def __init__(self, root, normalize, version, anagram_index=None, anagram_cache=None):
+        self.root = root
+        self.normalize = normalize
+        self.version = version
+        self.anagram_index = anagram_index
+        self.anagram_cache = anagram_cache
+        self.letter_counts = None
+
+
+# PersistentTree class - base class of the persistent trees. The current version
+# is one TreeSnapshot, which a writer replaces with a single assignment, so a
+# reader always sees a whole version and never needs the lock. Writers take the
+# lock, so updates from several threads are applied one after another.
+# Subclasses build the nodes in build_sorted, insert_node and remove_node.
+class PersistentTree(PersistentReads):
+    def __init__(self, normalize=None):
+        self.normalize = normalize
+        self.current = TreeSnapshot(None, normalize, 0)
+        self.lock = threading.Lock()
+        self.letter_counts = None
+        self.anagram_classes = None
+
+    # The anagram index of the current version. An index that is set is copied
+    # into a PersistentAnagramIndex, which each change copies again, so every
+    # snapshot keeps the index of its own version.
+    @property
+    def anagram_index(self):
+        return self.current.anagram_index
+
+    @anagram_index.setter
+    def anagram_index(self, index):
+        if index is not None and not isinstance(index, PersistentAnagramIndex):
+            index = PersistentAnagramIndex.from_index(index)
+        with self.lock:
+            current = self.current
+            self.current = TreeSnapshot(current.root, self.normalize, current.version, index,
+                                        current.anagram_cache)
+
+    # The anagram cache, shared by every version. Entries record the version
+    # they were computed for.
+    @property
+    def anagram_cache(self):
+        return self.current.anagram_cache
+
+    @anagram_cache.setter
+    def anagram_cache(self, cache):
+        with self.lock:
+            current = self.current
+            self.current = TreeSnapshot(current.root, self.normalize, current.version, current.anagram_index,
+                                        cache)
+
+    # The root of the current version
+    @property
+    def root(self):
+        return self.current.root
+
+    # Counts the versions published so far, so cached results can tell they
+    # are stale
+    @property
+    def version(self):
+        return self.current.version
+
+    # Returns the current version. Queries on it keep answering from that
+    # version however the tree changes afterwards.
+    def snapshot(self):
+        return self.current
+
+    # Makes root, with the anagram index index, the current version. Called
+    # with the lock held.
+    def publish(self, root, index):
+        current = self.current
+        self.current = TreeSnapshot(root, self.normalize, current.version + 1, index, current.anagram_cache)
+
+    # Builds a balanced tree from an iterable of words in O(n). Input that is
+    # unsorted under the normalize policy is sorted first.
+    @classmethod
+    def from_sorted(cls, words, normalize=None):
+        keys, words = sort_words(words, normalize)
+        tree = cls(normalize)
+        tree.current = TreeSnapshot(tree.build_sorted(keys, words), normalize, 0)
+        return tree
+
+    # Inserts a word, keyed by the tree's normalization policy. Like the other
+    # trees, a word whose key is already present is added again. An attached
+    # anagram index is kept up to date, here and in remove, by changing a copy
+    # that is published with the new version, so a snapshot's index always
+    # matches its words and a cached result is never older than the version it
+    # is stored under.
+    def insert(self, word):
+        key = self.make_key(word)
+        with self.lock:
+            current = self.current
+            root = self.insert_node(current.root, key, word)
+            index = current.anagram_index
+            if index is not None:
+                index = index.copy()
+                index.add(word)
+            self.publish(root, index)
+
+    # Removes one occurrence of word from the tree. Returns True if it was
+    # found and removed, False otherwise.
+    def remove(self, word):
+        key = self.make_key(word)
+        with self.lock:
+            current = self.current
+            if search_node(current.root, key) is None:
+                return False
+            root = self.remove_node(current.root, key)
+            index = current.anagram_index
+            if index is not None:
+                index = index.copy()
+                remaining = search_node(root, key)
+                index.removed(word, None if remaining is None else remaining.word)
+            self.publish(root, index)
+        return True
+
+
+# Returns a new AVL node for key and word over left and right, with one single
+# or double rotation when their heights differ by two
+def balanced_avl_node(key, word, left, right):
+    if avl_height(left) > avl_height(right) + 1:
+        if avl_height(left.left) >= avl_height(left.right):
+            return PersistentAVLNode(left.key, left.word, left.left,
+                                     PersistentAVLNode(key, word, left.right, right))
+        middle = left.right
+        return PersistentAVLNode(middle.key, middle.word,
+                                 PersistentAVLNode(left.key, left.word, left.left, middle.left),
+                                 PersistentAVLNode(key, word, middle.right, right))
+    if avl_height(right) > avl_height(left) + 1:
+        if avl_height(right.right) >= avl_height(right.left):
+            return PersistentAVLNode(right.key, right.word,
+                                     PersistentAVLNode(key, word, left, right.left), right.right)
+        middle = right.left
+        return PersistentAVLNode(middle.key, middle.word,
+                                 PersistentAVLNode(key, word, left, middle.left),
+                                 PersistentAVLNode(right.key, right.word, middle.right, right.right))
+    return PersistentAVLNode(key, word, left, right)
+
+
+# PersistentAVLTree class - a copy-on-write AVL tree. An insert or remove copies
+# the O(log n) nodes on its path and rebalances the copies on the way back up.
+class PersistentAVLTree(PersistentTree):
+    # Builds the subtree holding keys[low..high] around the middle key
+    def build_sorted(self, keys, words, low=0, high=None):
+        if high is None:
+            high = len(keys) - 1
+        if low > high:
+            return None
+        mid = (low + high) // 2
+        return PersistentAVLNode(keys[mid], words[mid], self.build_sorted(keys, words, low, mid - 1),
+                                 self.build_sorted(keys, words, mid + 1, high))
+
+    # Returns the root of a copy of the subtree at node with key added
+    def insert_node(self, node, key, word):
+        if node is None:
+            return PersistentAVLNode(key, word, None, None)
+        if key < node.key:
+            return balanced_avl_node(node.key, node.word, self.insert_node(node.left, key, word), node.right)
+        return balanced_avl_node(node.key, node.word, node.left, self.insert_node(node.right, key, word))
+
+    # Returns the root of a copy of the subtree at node without one node with
+    # key, which must be in it
+    def remove_node(self, node, key):
+        if key < node.key:
+            return balanced_avl_node(node.key, node.word, self.remove_node(node.left, key), node.right)
+        if node.key < key:
+            return balanced_avl_node(node.key, node.word, node.left, self.remove_node(node.right, key))
+        if node.left is None:
+            return node.right
+        if node.right is None:
+            return node.left
+        # The successor takes the removed node's place
+        successor = node.right
+        while successor.left is not None:
+            successor = successor.left
+        return balanced_avl_node(successor.key, successor.word, node.left, self.remove_smallest(node.right))
+
+    # Returns the root of a copy of the subtree at node without its smallest node
+    def remove_smallest(self, node):
+        if node.left is None:
+            return node.right
+        return balanced_avl_node(node.key, node.word, self.remove_smallest(node.left), node.right)
+
+
+# Returns True if node is a red node
+def is_red(node):
+    return node is not None and node.red
+
+
+# Returns a copy of node with the given color
+def recolored(node, red):
+    return PersistentRBTNode(node.key, node.word, node.left, node.right, red)
+
+
+# Returns a node for key and word over left and right that fixes a red node with
+# a red child below it: the three nodes involved become a red node with two
+# black children. Without such a pair the node is black.
+def balanced_rbt_node(key, word, left, right):
+    if is_red(left) and is_red(right):
+        return PersistentRBTNode(key, word, recolored(left, False), recolored(right, False), True)
+    if is_red(left):
+        if is_red(left.left):
+            return PersistentRBTNode(left.key, left.word, recolored(left.left, False),
+                                     PersistentRBTNode(key, word, left.right, right, False), True)
+        if is_red(left.right):
+            middle = left.right
+            return PersistentRBTNode(middle.key, middle.word,
+                                     PersistentRBTNode(left.key, left.word, left.left, middle.left, False),
+                                     PersistentRBTNode(key, word, middle.right, right, False), True)
+    if is_red(right):
+        if is_red(right.right):
+            return PersistentRBTNode(right.key, right.word, PersistentRBTNode(key, word, left, right.left, False),
+                                     recolored(right.right, False), True)
+        if is_red(right.left):
+            middle = right.left
+            return PersistentRBTNode(middle.key, middle.word,
+                                     PersistentRBTNode(key, word, left, middle.left, False),
+                                     PersistentRBTNode(right.key, right.word, middle.right, right.right, False),
+                                     True)
+    return PersistentRBTNode(key, word, left, right, False)
+
+
+# Rebuilds a node whose left subtree lost one black node
+def rebalance_left(key, word, left, right):
+    if is_red(left):
+        return PersistentRBTNode(key, word, recolored(left, False), right, True)
+    if not is_red(right):
+        return balanced_rbt_node(key, word, left, recolored(right, True))
+    middle = right.left
+    return PersistentRBTNode(middle.key, middle.word,
+                             PersistentRBTNode(key, word, left, middle.left, False),
+                             balanced_rbt_node(right.key, right.word, middle.right, recolored(right.right, True)),
+                             True)
+
+
+# Rebuilds a node whose right subtree lost one black node
+def rebalance_right(key, word, left, right):
+    if is_red(right):
+        return PersistentRBTNode(key, word, left, recolored(right, False), True)
+    if not is_red(left):
+        return balanced_rbt_node(key, word, recolored(left, True), right)
+    middle = left.right
+    return PersistentRBTNode(middle.key, middle.word,
+                             balanced_rbt_node(left.key, left.word, recolored(left.left, True), middle.left),
+                             PersistentRBTNode(key, word, middle.right, right, False), True)
+
+
+# Joins two subtrees of equal black height, where every key of left sorts before
+# every key of right, into one. This is what is left when a node is removed.
+def fuse_rbt(left, right):
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.red and right.red:
+        middle = fuse_rbt(left.right, right.left)
+        if is_red(middle):
+            return PersistentRBTNode(middle.key, middle.word,
+                                     PersistentRBTNode(left.key, left.word, left.left, middle.left, True),
+                                     PersistentRBTNode(right.key, right.word, middle.right, right.right, True),
+                                     True)
+        return PersistentRBTNode(left.key, left.word, left.left,
+                                 PersistentRBTNode(right.key, right.word, middle, right.right, True), True)
+    if not left.red and not right.red:
+        middle = fuse_rbt(left.right, right.left)
+        if is_red(middle):
+            return PersistentRBTNode(middle.key, middle.word,
+                                     PersistentRBTNode(left.key, left.word, left.left, middle.left, False),
+                                     PersistentRBTNode(right.key, right.word, middle.right, right.right, False),
+                                     True)
+        return rebalance_left(left.key, left.word, left.left,
+                              PersistentRBTNode(right.key, right.word, middle, right.right, False))
+    if right.red:
+        return PersistentRBTNode(right.key, right.word, fuse_rbt(left, right.left), right.right, True)
+    return PersistentRBTNode(left.key, left.word, left.left, fuse_rbt(left.right, right), True)
+
+
+# PersistentRedBlackTree class - a copy-on-write red-black tree. Inserts and
+# removes rebuild the path they change bottom-up, fixing colors with local
+# rebuilds instead of rotations through parent pointers, and the root is always
+# black.
+class PersistentRedBlackTree(PersistentTree):
+    # Builds a valid red-black tree from sorted keys. Like RedBlackTree, the
+    # deepest level of the split-in-the-middle tree is colored red.
+    def build_sorted(self, keys, words, low=0, high=None, depth=0, red_depth=None):
+        if high is None:
+            high = len(keys) - 1
+            red_depth = len(keys).bit_length() - 1
+        if low > high:
+            return None
+        mid = (low + high) // 2
+        return PersistentRBTNode(keys[mid], words[mid],
+                                 self.build_sorted(keys, words, low, mid - 1, depth + 1, red_depth),
+                                 self.build_sorted(keys, words, mid + 1, high, depth + 1, red_depth),
+                                 depth == red_depth and depth > 0)
+
+    # Returns the root of a copy of the tree at root with key added
+    def insert_node(self, root, key, word):
+        return recolored(self.insert_below(root, key, word), False)
+
+    # Returns the subtree at node with key added. Its root may be red with a red
+    # child, which the caller fixes.
+    def insert_below(self, node, key, word):
+        if node is None:
+            return PersistentRBTNode(key, word, None, None, True)
+        if key < node.key:
+            left = self.insert_below(node.left, key, word)
+            if node.red:
+                return PersistentRBTNode(node.key, node.word, left, node.right, True)
+            return balanced_rbt_node(node.key, node.word, left, node.right)
+        right = self.insert_below(node.right, key, word)
+        if node.red:
+            return PersistentRBTNode(node.key, node.word, node.left, right, True)
+        return balanced_rbt_node(node.key, node.word, node.left, right)
+
+    # Returns the root of a copy of the tree at root without one node with key,
+    # which must be in it
+    def remove_node(self, root, key):
+        root = self.remove_below(root, key)
+        if root is None or not root.red:
+            return root
+        return recolored(root, False)
+
+    # Returns the subtree at node without one node with key. When the removed
+    # node was below a black child the subtree has one black node fewer, which
+    # rebalance_left and rebalance_right make up for.
+    def remove_below(self, node, key):
+        if key < node.key:
+            left = self.remove_below(node.left, key)
+            if node.left.red:
+                return PersistentRBTNode(node.key, node.word, left, node.right, True)
+            return rebalance_left(node.key, node.word, left, node.right)
+        if node.key < key:
+            right = self.remove_below(node.right, key)
+            if node.right.red:
+                return PersistentRBTNode(node.key, node.word, node.left, right, True)
+            return rebalance_right(node.key, node.word, node.left, right)
+        return fuse_rbt(node.left, node.right)
@@ -0,0 +1,82 @@
+# The line protocol shared by the batch command line and the query server: one
+# query per line in, one JSON object per line out
+
+import json
+import time
+
+from .creators import avl_tree_creator, red_black_tree_creator, array_avl_tree_creator, \
+    array_red_black_tree_creator, trie_creator, btree_creator, persistent_avl_tree_creator, \
+    persistent_red_black_tree_creator
+from .anagrams import count_anagrams, list_anagrams
+from .subanagrams import spellable_words
+from . import metrics
+
+
+# The data structures of the batch command line, by the name given to --structure
+BATCH_STRUCTURES = {
+    "avl": avl_tree_creator,
+    "red-black": red_black_tree_creator,
+    "array-avl": array_avl_tree_creator,
+    "array-red-black": array_red_black_tree_creator,
+    "trie": trie_creator,
+    "btree": btree_creator,
+    "persistent-avl": persistent_avl_tree_creator,
+    "persistent-red-black": persistent_red_black_tree_creator,
+}
+
+
+# The queries the batch command line answers, by name. Each is called with the
+# data structure and the query's word.
+BATCH_QUERIES = {
+    "contains": lambda tree, word: word in tree,
+    "count": count_anagrams,
+    "anagrams": list_anagrams,
+    "spellable": spellable_words,
+}
+
+
+# Parses one line of batch input into an operation and a word. A line is either
+# a JSON object with "op" and "word" (and an optional "id" that is echoed back),
+# "op word", or a bare word, which asks for its anagram count. Returns None for
+# a blank line.
+def parse_query(line):
+    line = line.strip()
+    if not line:
+        return None
+    if line.startswith("{"):
+        query = json.loads(line)
+        if not isinstance(query, dict) or not isinstance(query.get("word"), str):
+            raise ValueError("query has no word")
+        if not isinstance(query.setdefault("op", "count"), str):
+            raise ValueError("query op is not a string")
+        return query
+    parts = line.split(None, 1)
+    if len(parts) == 1:
+        return {"op": "count", "word": parts[0]}
+    return {"op": parts[0], "word": parts[1].strip()}
+
+
+# Answers one line of batch input and returns its result object, or None for a
+# blank line. Bad queries produce an error result instead of stopping the batch.
+# The latency of each known op is recorded as "query <op>" when metrics are on.
+def answer_query(tree, line):
+    try:
+        query = parse_query(line)
+    except ValueError as error:
+        return {"error": str(error), "line": line.rstrip("\n")}
+    if query is None:
+        return None
+    op = query["op"]
+    result = {"op": op, "word": query["word"]}
+    if "id" in query:
+        result["id"] = query["id"]
+    if op not in BATCH_QUERIES:
+        result["error"] = "unknown op %r" % op
+    else:
+        start = time.perf_counter_ns()
+        try:
+            result["result"] = BATCH_QUERIES[op](tree, query["word"])
+        except ValueError as error:
+            result["error"] = str(error)
+        metrics.record_since("query " + op, start)
+    return result
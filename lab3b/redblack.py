@@ -0,0 +1,532 @@
+# Red-black tree of dictionary words
+
+from .keys import NodeReads, search_node, sort_words, subtree_size, descent_length, node_depth
+from .stats import TreeStats
+from .joins import SetOperations
+
+
+# RBTNode class - represents a node in a red-black tree. The color is stored as
+# the boolean red instead of a string, and the node uses __slots__.
+class RBTNode:
+    __slots__ = ("key", "word", "left", "right", "parent", "red", "size")
+
+    # key is the normalized comparison key and word the original spelling, which
+    # defaults to the key. size is the number of nodes in the subtree rooted here.
+    def __init__(self, key, parent, is_red=False, left=None, right=None, word=None):
+        self.key = key
+        self.word = key if word is None else word
+        self.left = left
+        self.right = right
+        self.parent = parent
+        self.red = is_red
+        self.size = subtree_size(left) + subtree_size(right) + 1
+
+    # The color as the string "red" or "black"
+    @property
+    def color(self):
+        if self.red:
+            return "red"
+        return "black"
+
+    @color.setter
+    def color(self, color):
+        self.red = color == "red"
+
+    # Returns true if both child nodes are black. A child set to None is considered
+    # to be black.
+    def are_both_children_black(self):
+        if self.left is not None and self.left.red:
+            return False
+        if self.right is not None and self.right.red:
+            return False
+        return True
+
+    # Returns the number of nodes in this subtree, which the size field keeps
+    def count(self):
+        return self.size
+
+    # Recalculate the number of nodes in the subtree rooted at the node
+    def update_size(self):
+        self.size = subtree_size(self.left) + subtree_size(self.right) + 1
+
+    # Returns the grandparent of this node
+    def get_grandparent(self):
+        if self.parent is None:
+            return None
+        return self.parent.parent
+
+    # Gets this node's predecessor from the left child subtree
+    # Precondition: This node's left child is not None
+    def get_predecessor(self):
+        node = self.left
+        while node.right is not None:
+            node = node.right
+        return node
+
+    # Returns this node's sibling, or None if this node does not have a sibling
+    def get_sibling(self):
+        if self.parent is not None:
+            if self is self.parent.left:
+                return self.parent.right
+            return self.parent.left
+        return None
+
+    # Returns the uncle of this node
+    def get_uncle(self):
+        grandparent = self.get_grandparent()
+        if grandparent is None:
+            return None
+        if grandparent.left is self.parent:
+            return grandparent.right
+        return grandparent.left
+
+    # Returns True if this node is black, False otherwise
+    def is_black(self):
+        return not self.red
+
+    # Returns True if this node is red, False otherwise
+    def is_red(self):
+        return self.red
+
+    # Replaces one of this node's children with a new child
+    def replace_child(self, current_child, new_child):
+        if self.left is current_child:
+            return self.set_child("left", new_child)
+        elif self.right is current_child:
+            return self.set_child("right", new_child)
+        return False
+
+    # Sets either the left or right child of this node
+    def set_child(self, which_child, child):
+        if which_child != "left" and which_child != "right":
+            return False
+
+        if which_child == "left":
+            self.left = child
+        else:
+            self.right = child
+
+        if child is not None:
+            child.parent = self
+
+        return True
+
+
+# Returns the number of black nodes on each path from node down to a leaf
+def black_height(node):
+    height = 0
+    while node is not None:
+        if not node.red:
+            height += 1
+        node = node.left
+    return height
+
+
+class RedBlackTree(NodeReads, SetOperations):
+    # normalize is the policy that turns words into keys, and the anagram index
+    # and cache are attached by red_black_tree_creator. version counts the
+    # changes made to the tree so cached results can tell they are stale.
+    def __init__(self, normalize=None):
+        self.root = None
+        self.normalize = normalize
+        self.version = 0
+        self.stats = None
+        self.anagram_index = None
+        self.letter_counts = None
+        self.anagram_classes = None
+        self.anagram_cache = None
+
+    # Starts counting the tree's work in a new TreeStats and returns it
+    def enable_stats(self):
+        self.stats = TreeStats()
+        return self.stats
+
+    # Stops counting
+    def disable_stats(self):
+        self.stats = None
+
+    # Builds a valid RedBlackTree from an iterable of words in O(n) without any
+    # rotations. Input that is unsorted under the normalize policy is sorted first.
+    @classmethod
+    def from_sorted(cls, words, normalize=None):
+        keys, words = sort_words(words, normalize)
+        tree = cls(normalize)
+        # Every leaf of the split-in-the-middle tree is on the deepest level or the
+        # one above it, so coloring the deepest level red keeps black heights equal.
+        red_depth = len(keys).bit_length() - 1
+        tree.root = tree.build_sorted(keys, words, 0, len(keys) - 1, None, 0, red_depth)
+        return tree
+
+    # Builds the subtree holding keys[low..high] around the middle key and returns
+    # its root. Nodes at red_depth are colored red, all others black.
+    def build_sorted(self, keys, words, low, high, parent, depth, red_depth):
+        if low > high:
+            return None
+        mid = (low + high) // 2
+        node = RBTNode(keys[mid], parent, depth == red_depth and depth > 0, word=words[mid])
+        node.left = self.build_sorted(keys, words, low, mid - 1, node, depth + 1, red_depth)
+        node.right = self.build_sorted(keys, words, mid + 1, high, node, depth + 1, red_depth)
+        node.update_size()
+        return node
+
+    # Joins the detached subtrees left and right around the detached node middle,
+    # where left's keys sort before middle's and right's after it, and returns
+    # the root of the result, which becomes this tree's root. With equal black
+    # heights middle becomes a black root over both. Otherwise middle is
+    # colored red and hung from the taller subtree's inner spine at the black
+    # node of the shorter subtree's black height, and a red parent is fixed up
+    # like after an insert. Black heights are not stored, so finding them makes
+    # this O(log n) instead of O(|difference| + 1).
+    def join_nodes(self, left, middle, right):
+        for root in (left, right):
+            if root is not None and root.red:
+                root.red = False
+                self.recolored(1)
+        left_height = black_height(left)
+        right_height = black_height(right)
+        if left_height == right_height:
+            middle.red = False
+            middle.set_child("left", left)
+            middle.set_child("right", right)
+            middle.update_size()
+            self.root = middle
+            return middle
+
+        middle.red = True
+        parent = None
+        if left_height > right_height:
+            self.root = node = left
+            height = left_height
+            while node is not None and (node.red or height > right_height):
+                if not node.red:
+                    height -= 1
+                parent = node
+                node = node.right
+            middle.set_child("left", node)
+            middle.set_child("right", right)
+            middle.update_size()
+            parent.set_child("right", middle)
+        else:
+            self.root = node = right
+            height = right_height
+            while node is not None and (node.red or height > left_height):
+                if not node.red:
+                    height -= 1
+                parent = node
+                node = node.left
+            middle.set_child("right", node)
+            middle.set_child("left", left)
+            middle.update_size()
+            parent.set_child("left", middle)
+
+        ancestor = parent
+        while ancestor is not None:
+            ancestor.update_size()
+            ancestor = ancestor.parent
+        self.insertion_balance(middle)
+        return self.root
+
+    # Inserts a word, keyed by the tree's normalization policy. An attached
+    # anagram index gets the word too.
+    def insert(self, word):
+        new_node = RBTNode(self.make_key(word), None, True, None, None, word)
+        self.insert_node(new_node)
+        if self.anagram_index is not None:
+            self.anagram_index.add(word)
+
+    def insert_node(self, node):
+        self.version += 1
+        stats = self.stats
+        if stats is not None:
+            stats.start("insert")
+
+        # Begin with normal BST insertion
+        if self.root is None:
+            # Special case for root
+            self.root = node
+        else:
+            current_node = self.root
+            while current_node is not None:
+                # Every node on the path gains the new node in its subtree
+                current_node.size += 1
+                if node.key < current_node.key:
+                    if current_node.left is None:
+                        current_node.set_child("left", node)
+                        break
+                    else:
+                        current_node = current_node.left
+                else:
+                    if current_node.right is None:
+                        current_node.set_child("right", node)
+                        break
+                    else:
+                        current_node = current_node.right
+
+        # Color the node red
+        node.red = True
+        if stats is not None:
+            stats.comparisons += node_depth(node)
+
+        # Balance
+        self.insertion_balance(node)
+        if stats is not None:
+            stats.finish()
+
+    # Removes one occurrence of word from the tree and from an attached anagram
+    # index. Returns True if it was found and removed, False otherwise.
+    def remove(self, word):
+        key = self.make_key(word)
+        node = search_node(self.root, key)
+        if node is None:
+            return False
+        stats = self.stats
+        if stats is not None:
+            stats.start("remove")
+            stats.comparisons += descent_length(self.root, key)
+        self.remove_node(node)
+        if self.anagram_index is not None:
+            remaining = search_node(self.root, key)
+            self.anagram_index.removed(word, None if remaining is None else remaining.word)
+        if stats is not None:
+            stats.finish()
+        return True
+
+    # Counts recolored nodes when stats are enabled
+    def recolored(self, count):
+        if self.stats is not None:
+            self.stats.recolorings += count
+
+    def remove_node(self, node):
+        self.version += 1
+
+        # A node with two children takes its predecessor's key and word, and the
+        # predecessor, which has at most one child, is removed instead
+        if node.left is not None and node.right is not None:
+            predecessor = node.get_predecessor()
+            node.key = predecessor.key
+            node.word = predecessor.word
+            node = predecessor
+
+        child = node.left
+        if child is None:
+            child = node.right
+
+        # A black node with one child must have a red child, which keeps the
+        # black height once it is recolored black. Only a black leaf needs the
+        # tree to be prepared before it can be removed.
+        if child is not None:
+            if not node.red:
+                self.recolored(1)
+            child.red = False
+        elif not node.red:
+            self.prepare_for_removal(node)
+        self.bst_remove_node(node)
+
+        # One special case if the root was changed to red
+        if self.root is not None and self.root.red:
+            self.root.red = False
+            self.recolored(1)
+
+    # Removes a node with at most one child from the tree, shrinking the sizes
+    # of all its ancestors
+    def bst_remove_node(self, node):
+        child = node.left
+        if child is None:
+            child = node.right
+        ancestor = node.parent
+        while ancestor is not None:
+            ancestor.size -= 1
+            ancestor = ancestor.parent
+        if node.parent is None:
+            self.root = child
+            if child is not None:
+                child.parent = None
+        else:
+            node.parent.replace_child(node, child)
+
+    # Returns True if node is not None and red
+    def is_non_null_and_red(self, node):
+        return node is not None and node.red
+
+    # Returns True if node is None or black
+    def is_null_or_black(self, node):
+        return node is None or not node.red
+
+    # Restructures the tree around the black leaf node so that removing it keeps
+    # every path's black height equal
+    def prepare_for_removal(self, node):
+        if self.stats is not None:
+            self.stats.path += 1
+        if self.try_case1(node):
+            return
+
+        sibling = node.get_sibling()
+        if self.try_case2(node, sibling):
+            sibling = node.get_sibling()
+        if self.try_case3(node, sibling):
+            return
+        if self.try_case4(node, sibling):
+            return
+        if self.try_case5(node, sibling):
+            sibling = node.get_sibling()
+        if self.try_case6(node, sibling):
+            sibling = node.get_sibling()
+
+        sibling.red = node.parent.red
+        node.parent.red = False
+        self.recolored(3)
+        if node is node.parent.left:
+            sibling.right.red = False
+            self.rotate_left(node.parent)
+        else:
+            sibling.left.red = False
+            self.rotate_right(node.parent)
+
+    # Case 1: node is red or is the root, so nothing has to change
+    def try_case1(self, node):
+        return node.red or node.parent is None
+
+    # Case 2: the sibling is red. Rotate it up so node gets a black sibling.
+    def try_case2(self, node, sibling):
+        if sibling.red:
+            node.parent.red = True
+            sibling.red = False
+            self.recolored(2)
+            if node is node.parent.left:
+                self.rotate_left(node.parent)
+            else:
+                self.rotate_right(node.parent)
+            return True
+        return False
+
+    # Case 3: parent, sibling and the sibling's children are all black. Color the
+    # sibling red and continue the preparation at the parent.
+    def try_case3(self, node, sibling):
+        if not node.parent.red and sibling.are_both_children_black():
+            sibling.red = True
+            self.recolored(1)
+            self.prepare_for_removal(node.parent)
+            return True
+        return False
+
+    # Case 4: the parent is red and the sibling and its children are black. Swap
+    # the colors of parent and sibling.
+    def try_case4(self, node, sibling):
+        if node.parent.red and sibling.are_both_children_black():
+            node.parent.red = False
+            sibling.red = True
+            self.recolored(2)
+            return True
+        return False
+
+    # Case 5: node is a left child and only the sibling's left child is red.
+    # Rotate the sibling right so the red child is on the outside.
+    def try_case5(self, node, sibling):
+        if self.is_non_null_and_red(sibling.left) and self.is_null_or_black(sibling.right) and \
+                node is node.parent.left:
+            sibling.red = True
+            sibling.left.red = False
+            self.recolored(2)
+            self.rotate_right(sibling)
+            return True
+        return False
+
+    # Case 6: node is a right child and only the sibling's right child is red.
+    # Rotate the sibling left so the red child is on the outside.
+    def try_case6(self, node, sibling):
+        if self.is_null_or_black(sibling.left) and self.is_non_null_and_red(sibling.right) and \
+                node is node.parent.right:
+            sibling.red = True
+            sibling.right.red = False
+            self.recolored(2)
+            self.rotate_left(sibling)
+            return True
+        return False
+
+    def insertion_balance(self, node):
+        if self.stats is not None:
+            self.stats.path += 1
+
+        # If node is the tree's root, then color node black and return
+        if node.parent is None:
+            if node.red:
+                self.recolored(1)
+            node.red = False
+            return
+
+        # If parent is black, then return without any alterations
+        if not node.parent.red:
+            return
+
+        # References to parent, grandparent, and uncle are needed for remaining operations
+        parent = node.parent
+        grandparent = node.get_grandparent()
+        uncle = node.get_uncle()
+
+        # If parent and uncle are both red, then color parent and uncle black, color grandparent
+        # red, recursively balance  grandparent, then return
+        if uncle is not None and uncle.red:
+            parent.red = uncle.red = False
+            grandparent.red = True
+            self.recolored(3)
+            self.insertion_balance(grandparent)
+            return
+
+        # If node is parent's right child and parent is grandparent's left child, then rotate left
+        # at parent, update node and parent to point to parent and grandparent, respectively
+        if node is parent.right and parent is grandparent.left:
+            if self.stats is not None:
+                self.stats.double_rotations += 1
+            self.rotate_left(parent)
+            node = parent
+            parent = node.parent
+        # Else if node is parent's left child and parent is grandparent's right child, then rotate
+        # right at parent, update node and parent to point to parent and grandparent, respectively
+        elif node is parent.left and parent is grandparent.right:
+            if self.stats is not None:
+                self.stats.double_rotations += 1
+            self.rotate_right(parent)
+            node = parent
+            parent = node.parent
+
+        # Color parent black and grandparent red
+        parent.red = False
+        grandparent.red = True
+        self.recolored(2)
+
+        # If node is parent's left child, then rotate right at grandparent, otherwise rotate left
+        # at grandparent
+        if node is parent.left:
+            self.rotate_right(grandparent)
+        else:
+            self.rotate_left(grandparent)
+
+    # The new subtree root takes over the size node had, and node's size is
+    # recomputed from its new children.
+    def rotate_left(self, node):
+        if self.stats is not None:
+            self.stats.rotations += 1
+        right_left_child = node.right.left
+        node.right.size = node.size
+        if node.parent is not None:
+            node.parent.replace_child(node, node.right)
+        else:  # node is root
+            self.root = node.right
+            self.root.parent = None
+        node.right.set_child("left", node)
+        node.set_child("right", right_left_child)
+        node.update_size()
+
+    def rotate_right(self, node):
+        if self.stats is not None:
+            self.stats.rotations += 1
+        left_right_child = node.left.right
+        node.left.size = node.size
+        if node.parent is not None:
+            node.parent.replace_child(node, node.left)
+        else:  # node is root
+            self.root = node.left
+            self.root.parent = None
+        node.left.set_child("right", node)
+        node.set_child("left", left_right_child)
+        node.update_size()
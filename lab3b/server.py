@@ -0,0 +1,304 @@
+# Resident query server: builds a data structure once and answers the line
+# protocol of the batch command line over a TCP or Unix socket
+
+import asyncio
+import sys
+import time
+import argparse
+import contextlib
+import collections
+import json
+import random
+import signal
+from concurrent.futures import ThreadPoolExecutor
+
+from .dictionary import anagram_signature, read_words
+from .anagrams import search_anagrams, query_view
+from .subanagrams import spellable_words
+from .protocol import BATCH_STRUCTURES, parse_query
+from .benchmark import summarize
+from . import metrics
+from .metrics import enable_metrics, serve_metrics
+
+
+# Responses one connection may have waiting to be sent before the server stops
+# reading more of its requests
+PIPELINE_DEPTH = 128
+
+# Length of the listen queue, so a burst of connecting clients is not refused
+SERVER_BACKLOG = 4096
+
+
+# Encodes one response object as a protocol line
+def encode_response(result):
+    return (json.dumps(result) + "\n").encode()
+
+
+# QueryServer class - answers queries against one data structure for any number
+# of connections. Membership tests and anagram queries the index or cache can
+# answer run inline on the event loop. Anagram searches run in a thread pool so
+# the loop keeps serving other clients, and concurrent searches for the same
+# letters in the same version of the tree share one search, so a query that
+# arrives after a write never gets a result from before it. Only the search
+# itself leaves the loop, so the anagram cache is only ever used from the
+# loop's thread.
+class QueryServer:
+    def __init__(self, tree, workers=None):
+        self.tree = tree
+        self.executor = ThreadPoolExecutor(workers)
+        self.searches = {}
+        self.connections = 0
+        self.requests = 0
+
+    # Returns the anagrams of word, or an awaitable of them when they have to
+    # be searched for
+    def anagrams(self, word):
+        tree = query_view(self.tree)
+        word = word.strip()
+        signature = anagram_signature(tree.make_key(word))
+        version = tree.version
+        cache = tree.anagram_cache
+        if cache is not None:
+            anagrams = cache.get(signature, version)
+            if anagrams is not None:
+                return list(anagrams)
+        if tree.anagram_index is not None:
+            anagrams = tree.anagram_index.lookup(word)
+            if cache is not None:
+                cache.put(signature, anagrams, version)
+            return anagrams
+
+        future = self.searches.get((signature, version))
+        if future is None:
+            future = asyncio.get_running_loop().run_in_executor(self.executor, search_anagrams, tree, word)
+            future.add_done_callback(lambda done: self.searched(signature, version, done))
+            self.searches[signature, version] = future
+        # Shielded so a client that disconnects does not cancel a search
+        # other clients are waiting on
+        return asyncio.shield(future)
+
+    # Called on the loop when the search for signature in version finishes
+    def searched(self, signature, version, future):
+        del self.searches[signature, version]
+        cache = self.tree.anagram_cache
+        if cache is not None and not future.cancelled() and future.exception() is None:
+            cache.put(signature, future.result(), version)
+
+    # Answers one request line. Returns the encoded response, None for a blank
+    # line, or a coroutine producing the response when it waits on a search.
+    # The latency of each known op is recorded as "serve <op>" when metrics are
+    # on, up to the response being ready to write.
+    def answer(self, line):
+        start = time.perf_counter_ns()
+        self.requests += 1
+        try:
+            query = parse_query(line)
+        except ValueError as error:
+            return encode_response({"error": str(error), "line": line.rstrip("\r\n")})
+        if query is None:
+            return None
+        op = query["op"]
+        result = {"op": op, "word": query["word"]}
+        if "id" in query:
+            result["id"] = query["id"]
+        if op == "contains":
+            result["result"] = query["word"] in self.tree
+        elif op == "count" or op == "anagrams":
+            anagrams = self.anagrams(query["word"])
+            if not isinstance(anagrams, list):
+                return self.finish(result, anagrams, start)
+            result["result"] = len(anagrams) if op == "count" else anagrams
+        elif op == "spellable":
+            # One vectorized pass over the letter counts, fast enough to run inline
+            try:
+                result["result"] = spellable_words(self.tree, query["word"])
+            except ValueError as error:
+                result["error"] = str(error)
+        else:
+            result["error"] = "unknown op %r" % op
+            return encode_response(result)
+        metrics.record_since("serve " + op, start)
+        return encode_response(result)
+
+    # Completes a response once its anagram search is done. start is when the
+    # request was read.
+    async def finish(self, result, search, start):
+        try:
+            anagrams = list(await search)
+        except Exception as error:
+            result["error"] = str(error)
+        else:
+            result["result"] = len(anagrams) if result["op"] == "count" else anagrams
+        metrics.record_since("serve " + result["op"], start)
+        return encode_response(result)
+
+    # Serves one connection. Requests are read as fast as the client pipelines
+    # them, and their responses are written back in request order.
+    async def handle(self, reader, writer):
+        self.connections += 1
+        responses = asyncio.Queue(PIPELINE_DEPTH)
+        sender = asyncio.ensure_future(self.send(responses, writer))
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                response = self.answer(line.decode("utf-8", "replace"))
+                if response is None:
+                    continue
+                if not isinstance(response, bytes):
+                    response = asyncio.ensure_future(response)
+                await responses.put(response)
+        except (ConnectionError, ValueError):
+            # ValueError is a request line longer than the stream limit
+            pass
+        finally:
+            await responses.put(None)
+            await sender
+            self.connections -= 1
+            writer.close()
+            with contextlib.suppress(ConnectionError):
+                await writer.wait_closed()
+
+    # Writes the responses of one connection in order until it gets None. The
+    # socket is only drained once no response is ready, so pipelined responses
+    # go out together.
+    async def send(self, responses, writer):
+        while True:
+            response = await responses.get()
+            if response is None:
+                return
+            if writer is None:
+                continue
+            if not isinstance(response, bytes):
+                response = await response
+            try:
+                writer.write(response)
+                if responses.empty():
+                    await writer.drain()
+            except ConnectionError:
+                # The client went away; keep emptying the queue so the reader
+                # is never blocked on it
+                writer = None
+
+    # Listens on path (a Unix socket) or on host and port until stop is set, or
+    # until SIGINT or SIGTERM where the platform supports signal handlers
+    async def serve(self, host="127.0.0.1", port=7000, path=None, stop=None):
+        if path is not None:
+            server = await asyncio.start_unix_server(self.handle, path, backlog=SERVER_BACKLOG)
+        else:
+            server = await asyncio.start_server(self.handle, host, port, backlog=SERVER_BACKLOG)
+        if stop is None:
+            stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            with contextlib.suppress(NotImplementedError):
+                loop.add_signal_handler(signum, stop.set)
+        addresses = ", ".join(str(sock.getsockname()) for sock in server.sockets)
+        print("Serving queries on %s" % addresses, file=sys.stderr)
+        async with server:
+            await stop.wait()
+        self.executor.shutdown(wait=False)
+
+
+# Opens clients concurrent connections that each pipeline requests queries for
+# words chosen from words, and waits for every response. Returns the latency of
+# each request in seconds, measured from sending it to reading its response.
+async def load_test(words, clients, requests, host="127.0.0.1", port=7000, path=None, op="count", seed=0):
+    latencies = []
+
+    async def client(rng):
+        if path is not None:
+            reader, writer = await asyncio.open_unix_connection(path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        sent = collections.deque()
+        for i in range(requests):
+            sent.append(time.perf_counter())
+            writer.write(("%s %s\n" % (op, rng.choice(words))).encode())
+        await writer.drain()
+        for i in range(requests):
+            if not await reader.readline():
+                raise ConnectionError("server closed the connection")
+            latencies.append(time.perf_counter() - sent.popleft())
+        writer.close()
+        await writer.wait_closed()
+
+    await asyncio.gather(*[client(random.Random(seed + i)) for i in range(clients)])
+    return latencies
+
+
+# Adds the socket address options shared by serve and loadtest
+def add_address_arguments(parser):
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7000)
+    parser.add_argument("--unix", metavar="PATH", help="use a Unix socket at PATH instead of TCP")
+
+
+# Entry point of python Lab3.B.py serve
+def serve_main(argv):
+    parser = argparse.ArgumentParser(prog="Lab3.B.py serve",
+                                     description="Build a data structure once and answer queries over a socket")
+    add_address_arguments(parser)
+    parser.add_argument("--structure", choices=list(BATCH_STRUCTURES), default="avl")
+    parser.add_argument("--words", default="words.txt", help="dictionary words file")
+    parser.add_argument("--workers", type=int, default=None, help="threads for anagram searches")
+    parser.add_argument("--no-snapshot", action="store_true", help="always build from the words file")
+    parser.add_argument("--metrics", metavar="PATH",
+                        help="write latency metrics to PATH on exit, as JSON for a .json path and Prometheus text otherwise")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="serve latency metrics over HTTP at /metrics and /metrics.json on this port")
+    args = parser.parse_args(argv)
+
+    recorder = None
+    if args.metrics is not None or args.metrics_port is not None:
+        recorder = enable_metrics()
+    endpoint = None
+    if args.metrics_port is not None:
+        endpoint = serve_metrics(recorder, args.host, args.metrics_port)
+        print("Serving metrics on http://%s:%d/metrics" % (args.host, args.metrics_port), file=sys.stderr)
+
+    with contextlib.redirect_stdout(sys.stderr):
+        tree = BATCH_STRUCTURES[args.structure](args.words, use_snapshot=not args.no_snapshot)
+    server = QueryServer(tree, args.workers)
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if endpoint is not None:
+            endpoint.shutdown()
+        if args.metrics is not None:
+            recorder.dump(args.metrics)
+    print("Answered %d requests" % server.requests, file=sys.stderr)
+    return 0
+
+
+# Entry point of python Lab3.B.py loadtest. Exits with status 1 when the 99th
+# percentile latency is above --p99-target.
+def load_test_main(argv):
+    parser = argparse.ArgumentParser(prog="Lab3.B.py loadtest",
+                                     description="Measure the latency of a running query server")
+    add_address_arguments(parser)
+    parser.add_argument("--words", default="words.txt", help="file of words to query")
+    parser.add_argument("--clients", type=int, default=1000, help="concurrent connections")
+    parser.add_argument("--requests", type=int, default=20, help="pipelined requests per connection")
+    parser.add_argument("--op", choices=["contains", "count", "anagrams", "spellable"], default="count")
+    parser.add_argument("--p99-target", type=float, default=None, metavar="SECONDS")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    words = [word for word in read_words(args.words) if word]
+    start_time = time.perf_counter()
+    latencies = asyncio.run(load_test(words, args.clients, args.requests, args.host, args.port,
+                                      args.unix, args.op, args.seed))
+    elapsed = time.perf_counter() - start_time
+    summary = summarize(latencies)
+    print("%d requests from %d clients in %s seconds (%d requests per second)"
+          % (len(latencies), args.clients, elapsed, len(latencies) / elapsed))
+    print("latency p50 %.6fs  p95 %.6fs  p99 %.6fs  max %.6fs"
+          % (summary["p50"], summary["p95"], summary["p99"], summary["max"]))
+    if args.p99_target is not None and summary["p99"] > args.p99_target:
+        print("p99 latency is above the %ss target" % args.p99_target)
+        return 1
+    return 0
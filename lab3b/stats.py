@@ -0,0 +1,107 @@
+# Opt-in instrumentation of the node-based trees and their shape statistics
+
+
+# TreeStats class - opt-in counters of the work a tree does. A tree only counts
+# while its stats attribute holds a TreeStats, and with stats set to None the
+# cost is a single attribute check per operation, rotation or rebalance step.
+class TreeStats:
+    def __init__(self):
+        self.operations = {"insert": 0, "remove": 0, "search": 0}
+        self.comparisons = 0
+        # Every rotation, with each double rotation counted as its two halves,
+        # and the number of double rotations
+        self.rotations = 0
+        self.double_rotations = 0
+        self.recolorings = 0
+        # Rebalance steps of the current insert or remove, and a histogram of
+        # the steps taken by every finished one
+        self.path = 0
+        self.path_lengths = {}
+
+    # Starts counting an insert or remove
+    def start(self, operation):
+        self.operations[operation] += 1
+        self.path = 0
+
+    # Records the rebalance path length of the operation that just finished
+    def finish(self):
+        self.path_lengths[self.path] = self.path_lengths.get(self.path, 0) + 1
+
+    # Records a search that compared against comparisons nodes
+    def searched(self, comparisons):
+        self.operations["search"] += 1
+        self.comparisons += comparisons
+
+    # Returns the counters, with per-operation averages
+    def report(self):
+        operations = sum(self.operations.values())
+        updates = self.operations["insert"] + self.operations["remove"]
+        steps = sum(length * count for length, count in self.path_lengths.items())
+        return {
+            "operations": dict(self.operations),
+            "comparisons": self.comparisons,
+            "comparisons_per_operation": self.comparisons / operations if operations else 0.0,
+            "rotations": self.rotations,
+            "single_rotations": self.rotations - 2 * self.double_rotations,
+            "double_rotations": self.double_rotations,
+            "recolorings": self.recolorings,
+            "rotations_per_update": self.rotations / updates if updates else 0.0,
+            "rebalance_path_mean": steps / updates if updates else 0.0,
+            "rebalance_path_max": max(self.path_lengths) if self.path_lengths else 0,
+            "rebalance_path_lengths": dict(sorted(self.path_lengths.items())),
+        }
+
+
+# Returns shape statistics of a node-based tree: its size and height, the height
+# a perfectly balanced tree of that size would have, the average node depth, a
+# histogram of balance factors, and the black height for red-black trees. The
+# walk is iterative, so it works on any tree shape.
+def tree_shape(tree):
+    heights = {}
+    balances = {}
+    total_depth = 0
+    stack = []
+    if tree.root is not None:
+        stack.append((tree.root, 0, False))
+    while stack:
+        node, depth, children_done = stack.pop()
+        if not children_done:
+            total_depth += depth
+            stack.append((node, depth, True))
+            for child in (node.left, node.right):
+                if child is not None:
+                    stack.append((child, depth + 1, False))
+            continue
+        left_height = heights.pop(id(node.left), -1) if node.left is not None else -1
+        right_height = heights.pop(id(node.right), -1) if node.right is not None else -1
+        heights[id(node)] = max(left_height, right_height) + 1
+        balance = left_height - right_height
+        balances[balance] = balances.get(balance, 0) + 1
+
+    size = len(tree)
+    shape = {
+        "size": size,
+        "height": heights.get(id(tree.root), -1),
+        "optimal_height": size.bit_length() - 1,
+        "average_depth": total_depth / size if size else 0.0,
+        "balance_factors": dict(sorted(balances.items())),
+    }
+    # Imported here because the trees import TreeStats from this module
+    from .redblack import RedBlackTree
+    if isinstance(tree, RedBlackTree):
+        black_height = 0
+        node = tree.root
+        while node is not None:
+            if not node.red:
+                black_height += 1
+            node = node.left
+        shape["black_height"] = black_height
+    return shape
+
+
+# Returns the tree's counters together with its shape statistics
+def instrumentation_report(tree):
+    report = {"shape": tree_shape(tree)}
+    if tree.stats is not None:
+        report.update(tree.stats.report())
+    return report
@@ -0,0 +1,153 @@
+# Sub-anagram queries: the dictionary words that can be spelled from a set of
+# letters, answered with a NumPy matrix of per-word letter counts. NumPy is
+# optional. Without it the data structures are built without letter counts and
+# these queries raise ValueError.
+
+import collections
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from .keys import normalize_key
+
+
+# True when NumPy is installed and letter counts can be built
+HAVE_NUMPY = numpy is not None
+
+# Keys are turned into letter counts this many at a time, which bounds the size
+# of the temporary code point matrix
+LETTER_COUNTS_CHUNK_SIZE = 65536
+
+# Letters that get a bit in each word's letter set mask; see LetterCounts
+LETTER_MASK_BITS = 64
+
+
+# LetterCounts class - the letter counts of every dictionary word as a matrix H
+# with one row per word and one column per distinct character of the keys. A
+# word can be spelled from the query letters q exactly when (H <= q).all(axis=1)
+# holds for its row. That test is run in two vectorized steps:
+#   - Each row also has a bit mask of the letters it uses. One pass over the
+#     masks drops every word that needs a letter the query does not have, which
+#     is almost all of them.
+#   - The counts of the query's own letters are compared only for the words
+#     that are left.
+# Rows are sorted by key length, so a query of n letters only looks at words of
+# at most n letters. The matrix is stored one letter per row (transposed) so
+# each letter's counts are contiguous. version is the version of the tree the
+# counts were built for.
+class LetterCounts:
+    def __init__(self, words, normalize=None, version=0):
+        self.normalize = normalize
+        self.version = version
+        self.words = words
+        keys = [normalize_key(normalize, word) for word in words]
+        lengths = numpy.fromiter(map(len, keys), dtype=numpy.int64, count=len(keys))
+        self.positions = numpy.argsort(lengths, kind="stable")
+        lengths = lengths[self.positions]
+        keys = [keys[i] for i in self.positions]
+
+        # ends[n] is the number of rows whose key has at most n letters
+        self.max_length = int(lengths[-1]) if len(keys) else 0
+        self.ends = numpy.searchsorted(lengths, numpy.arange(self.max_length + 1), side="right")
+
+        self.alphabet = sorted(set("".join(keys)))
+        self.columns = {letter: i for i, letter in enumerate(self.alphabet)}
+
+        # lookup maps a code point to its column, and the padding code point 0
+        # to -1
+        self.lookup = numpy.full(ord(self.alphabet[-1]) + 1 if self.alphabet else 1, -1, dtype=numpy.int64)
+        self.lookup[[ord(letter) for letter in self.alphabet]] = numpy.arange(len(self.alphabet))
+        self.lookup[0] = -1
+        self.counts = numpy.zeros((len(self.alphabet), len(keys)), dtype=numpy.uint8)
+        for start in range(0, len(keys), LETTER_COUNTS_CHUNK_SIZE):
+            self.count_letters(keys[start:start + LETTER_COUNTS_CHUNK_SIZE], start)
+        self.max_counts = self.counts.max(axis=1) if len(keys) else numpy.zeros(len(self.alphabet), numpy.uint8)
+
+        # The first LETTER_MASK_BITS letters get a bit in the masks; any other
+        # letters are always checked through their counts
+        self.masks = numpy.zeros(len(keys), dtype=numpy.uint64)
+        for column in range(min(len(self.alphabet), LETTER_MASK_BITS)):
+            self.masks |= (self.counts[column] > 0).astype(numpy.uint64) << numpy.uint64(column)
+
+    # Fills in the counts of the rows from start for keys, all at once: the keys
+    # become a zero-padded matrix of code points, each code point becomes its
+    # column, and bincount counts every (column, row) pair. Counts stop at 255.
+    def count_letters(self, keys, start):
+        code_points = numpy.array(keys)
+        width = code_points.dtype.itemsize // 4
+        if width == 0:
+            return
+        code_points = code_points.view(numpy.uint32).reshape(len(keys), width)
+        columns = self.lookup[code_points]
+        rows = numpy.broadcast_to(numpy.arange(len(keys))[:, None], columns.shape)
+        used = columns >= 0
+        cells = columns[used] * len(keys) + rows[used]
+        counts = numpy.bincount(cells, minlength=len(self.alphabet) * len(keys))
+        self.counts[:, start:start + len(keys)] = numpy.minimum(counts, 255).reshape(len(self.alphabet), len(keys))
+
+    # Returns the words that can be spelled from letters, using each letter at
+    # most as many times as it appears there, in the order the words were given
+    def spellable(self, letters):
+        key = normalize_key(self.normalize, letters)
+        end = self.ends[min(len(key), self.max_length)] if self.max_length else 0
+        start = self.ends[0]
+        if end <= start:
+            return []
+
+        available = numpy.zeros(len(self.alphabet), dtype=numpy.int64)
+        for letter, count in collections.Counter(key).items():
+            column = self.columns.get(letter)
+            if column is not None:
+                available[column] = min(count, 255)
+
+        allowed = 0
+        for column in range(min(len(self.alphabet), LETTER_MASK_BITS)):
+            if available[column]:
+                allowed |= 1 << column
+        forbidden = numpy.uint64(~allowed & ((1 << LETTER_MASK_BITS) - 1))
+        rows = numpy.flatnonzero((self.masks[start:end] & forbidden) == 0) + start
+
+        # Only letters some candidate could use too often need their counts
+        # checked. Letters the query lacks were already ruled out by the masks,
+        # except for letters past the masked ones.
+        check = self.max_counts > available
+        check[:LETTER_MASK_BITS] &= available[:LETTER_MASK_BITS] > 0
+        for column in numpy.flatnonzero(check):
+            if len(rows) == 0:
+                break
+            rows = rows[self.counts[column, rows] <= available[column]]
+        return [self.words[i] for i in numpy.sort(self.positions[rows]).tolist()]
+
+
+# Returns the letter counts of words for sub-anagram queries, or None when NumPy
+# is not installed
+def build_letter_counts(words, normalize=None, version=0):
+    if numpy is None:
+        return None
+    return LetterCounts(words, normalize, version)
+
+
+# Returns the tree's letter counts, or None when NumPy is not installed. They
+# are built from the tree's words the first time a sub-anagram query needs
+# them and again once the tree has changed, so building or loading a
+# dictionary does not pay for them. A persistent tree's counts are built from
+# one snapshot, so they match the version they are stored under.
+def current_letter_counts(tree):
+    counts = tree.letter_counts
+    source = tree.snapshot() if hasattr(tree, "snapshot") else tree
+    if counts is None or counts.version != source.version:
+        counts = build_letter_counts(list(source), tree.normalize, source.version)
+        tree.letter_counts = counts
+    return counts
+
+
+# Returns the dictionary words that can be spelled from letters, using each
+# letter at most as often as it appears in letters, in sorted key order. Needs
+# NumPy for the letter counts.
+def spellable_words(tree, letters):
+    counts = current_letter_counts(tree)
+    if counts is None:
+        raise ValueError("sub-anagram queries need letter counts, which need NumPy")
+    return counts.spellable(letters)
@@ -0,0 +1,179 @@
+# Prefix trie of dictionary words
+
+from .keys import normalize_key
+
+
+# TrieNode class - one node of a Trie. children maps the next letter to the
+# child node, and word is the dictionary word ending here, or None. Bit n of
+# lengths is set when some word ends exactly n letters below this node, bit 0
+# for a word ending here.
+class TrieNode:
+    __slots__ = ("children", "word", "lengths")
+
+    def __init__(self):
+        self.children = {}
+        self.word = None
+        self.lengths = 0
+
+    # Recomputes lengths from the node's word and children
+    def update_lengths(self):
+        lengths = 1 if self.word is not None else 0
+        for child in self.children.values():
+            lengths |= child.lengths << 1
+        self.lengths = lengths
+
+
+# Trie class - a prefix tree of the dictionary words. Anagrams are enumerated by
+# walking it letter by letter, so a branch is abandoned as soon as its prefix
+# does not start any word, instead of building every full permutation first.
+class Trie:
+    def __init__(self, normalize=None):
+        self.root = TrieNode()
+        self.size = 0
+        self.normalize = normalize
+        self.version = 0
+        self.anagram_index = None
+        self.letter_counts = None
+        self.anagram_classes = None
+        self.anagram_cache = None
+
+    def __len__(self):
+        return self.size
+
+    # Iterating yields the words in sorted key order, lazily: a node's word
+    # comes before the words below it, and children are visited by letter. The
+    # trie must not be changed while an iterator over it is in use.
+    def __iter__(self):
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if node.word is not None:
+                yield node.word
+            stack.extend(node.children[letter] for letter in sorted(node.children, reverse=True))
+
+    # Returns the comparison key the trie uses for word
+    def make_key(self, word):
+        return normalize_key(self.normalize, word)
+
+    # Builds a trie from an iterable of words. There is no balancing to do, so
+    # the order of the words does not matter; this matches the trees' API.
+    @classmethod
+    def from_sorted(cls, words, normalize=None):
+        trie = cls(normalize)
+        for word in words:
+            trie.insert(word)
+        return trie
+
+    # Inserts a word. A word that is already present keeps its first spelling.
+    # An attached anagram index is kept up to date, here and in remove.
+    def insert(self, word):
+        key = self.make_key(word)
+        node = self.root
+        for depth in range(len(key)):
+            node.lengths |= 1 << (len(key) - depth)
+            child = node.children.get(key[depth])
+            if child is None:
+                child = TrieNode()
+                node.children[key[depth]] = child
+            node = child
+        node.lengths |= 1
+        if node.word is None:
+            node.word = word
+            self.size += 1
+            self.version += 1
+            if self.anagram_index is not None:
+                self.anagram_index.add(word)
+
+    # Removes word from the trie, pruning the nodes that no longer lead to any
+    # word and updating the word lengths along its path. Returns True if it
+    # was found and removed, False otherwise.
+    def remove(self, word):
+        key = self.make_key(word)
+        path = [self.root]
+        for letter in key:
+            node = path[-1].children.get(letter)
+            if node is None:
+                return False
+            path.append(node)
+        if path[-1].word is None:
+            return False
+        path[-1].word = None
+        self.size -= 1
+        self.version += 1
+        if self.anagram_index is not None:
+            self.anagram_index.remove(word)
+        for i in range(len(key), 0, -1):
+            if path[i].word is None and not path[i].children:
+                del path[i - 1].children[key[i - 1]]
+        for node in reversed(path):
+            node.update_lengths()
+        return True
+
+    # Returns the node for the already normalized key, or None if no word
+    # starts with it
+    def search_prefix(self, key):
+        node = self.root
+        for letter in key:
+            node = node.children.get(letter)
+            if node is None:
+                return None
+        return node
+
+    # Returns the stored spelling of word, or None if it is not in the trie
+    def search(self, word):
+        node = self.search_prefix(self.make_key(word))
+        return None if node is None else node.word
+
+    # Returns the node holding word, or None if it is not in the trie
+    def search_handle(self, word):
+        node = self.search_prefix(self.make_key(word))
+        if node is None or node.word is None:
+            return None
+        return node
+
+    def __contains__(self, word):
+        return self.search(word) is not None
+
+    # Returns the stored word for each of the words, or None for missing words
+    def search_many(self, words):
+        return self.words_for_keys([self.make_key(word) for word in words])
+
+    # Returns a list of booleans telling which of the words are in the trie
+    def contains_many(self, words):
+        return [word is not None for word in self.search_many(words)]
+
+    # Returns the stored word for each of the already normalized keys, or None
+    def words_for_keys(self, keys):
+        words = []
+        for key in keys:
+            node = self.search_prefix(key)
+            words.append(None if node is None else node.word)
+        return words
+
+    # Returns the dictionary words that are anagrams of word
+    def anagrams(self, word):
+        key = self.make_key(word)
+        counts = {}
+        for letter in key:
+            counts[letter] = counts.get(letter, 0) + 1
+        found = []
+        self.collect_anagrams(self.root, counts, len(key), found)
+        return found
+
+    # Walks down from node using only the letters left in counts. A letter with
+    # no child here means no word starts with the current prefix plus that
+    # letter, and a child with no word exactly remaining - 1 letters below it
+    # cannot finish an anagram either, so either way that whole branch of
+    # permutations is skipped.
+    def collect_anagrams(self, node, counts, remaining, found):
+        if remaining == 0:
+            if node.word is not None:
+                found.append(node.word)
+            return
+        for letter in counts:
+            if counts[letter] > 0:
+                child = node.children.get(letter)
+                if child is not None and child.lengths >> (remaining - 1) & 1:
+                    counts[letter] -= 1
+                    self.collect_anagrams(child, counts, remaining - 1, found)
+                    counts[letter] += 1
@@ -0,0 +1,42 @@
+import random
+
+import pytest
+
+
+# Letters the generated words are made of. A small alphabet makes short words
+# collide often, so the dictionaries have large anagram classes.
+ALPHABET = "aeilnrst"
+
+
+# Returns count distinct random words of 1 to 7 letters from ALPHABET
+def random_words(rng, count):
+    words = set()
+    while len(words) < count:
+        words.add("".join(rng.choice(ALPHABET) for i in range(rng.randint(1, 7))))
+    return sorted(words)
+
+
+@pytest.fixture
+def rng():
+    return random.Random(1234)
+
+
+# A words file of 2000 distinct lowercase words, and the words themselves
+@pytest.fixture
+def words_file(tmp_path, rng):
+    words = random_words(rng, 2000)
+    rng.shuffle(words)
+    path = tmp_path / "words.txt"
+    path.write_text("\n".join(words) + "\n")
+    return str(path), words
+
+
+# A candidates file for the most_anagrams queries, with repeats and blank lines
+@pytest.fixture
+def candidates_file(tmp_path, rng):
+    lines = random_words(rng, 300) + ["", "  ", "zzz"]
+    lines += lines[:40]
+    rng.shuffle(lines)
+    path = tmp_path / "candidates.txt"
+    path.write_text("\n".join(lines) + "\n")
+    return str(path)
@@ -0,0 +1,169 @@
+# Anagram queries against every data structure, and keeping them right through
+# inserts, removes, reloads and merges
+
+import pytest
+
+from lab3b import (AnagramCache, count_anagrams, list_anagrams, top_anagrams, top_anagrams_parallel, most_anagrams,
+                   reload_dictionary, merge_word_list, anagram_signature, spellable_words, HAVE_NUMPY,
+                   build_anagram_classes)
+from lab3b.anagrams import count_anagrams_tree
+from lab3b.protocol import BATCH_STRUCTURES
+
+
+# Returns the anagrams of word among words, the slow way
+def brute_force_anagrams(words, word):
+    signature = anagram_signature(word.lower())
+    return sorted(other for other in words if anagram_signature(other.lower()) == signature)
+
+
+@pytest.fixture(params=sorted(BATCH_STRUCTURES))
+def creator(request):
+    return BATCH_STRUCTURES[request.param]
+
+
+def test_anagram_queries_match_brute_force(creator, words_file, rng):
+    file, words = words_file
+    tree = creator(file, use_snapshot=False)
+    for word in rng.sample(words, 100) + ["zzz", "LISTEN"]:
+        expected = brute_force_anagrams(words, word)
+        assert sorted(list_anagrams(tree, word)) == expected
+        assert count_anagrams(tree, word) == len(expected)
+
+
+def test_permutation_search_matches_the_index(words_file, rng):
+    file, words = words_file
+    tree = BATCH_STRUCTURES["avl"](file, use_snapshot=False)
+    for word in rng.sample(words, 50):
+        assert count_anagrams_tree(tree, word) == count_anagrams(tree, word)
+
+
+def test_serial_and_parallel_top_anagrams_agree(words_file, candidates_file):
+    file, words = words_file
+    tree = BATCH_STRUCTURES["avl"](file, use_snapshot=False)
+    serial = top_anagrams(candidates_file, tree, 10)
+    assert top_anagrams_parallel(candidates_file, tree, 10, workers=2, chunk_size=17) == serial
+    assert top_anagrams(candidates_file, tree, 10, workers=3) == serial
+    assert most_anagrams(candidates_file, tree, workers=2) == serial[0][0]
+
+
+# The top words ranked by a full sort: most anagrams first, then file order,
+# each word once, without words that have no anagrams
+def sorted_top_anagrams(file, words, k):
+    ranked = {}
+    with open(file) as file_:
+        for position, line in enumerate(file_):
+            word = line.strip()
+            count = len(brute_force_anagrams(words, word)) if word else 0
+            if count and word not in ranked:
+                ranked[word] = (-count, position)
+    return [(word, -count) for word, (count, position) in sorted(ranked.items(), key=lambda item: item[1])[:k]]
+
+
+@pytest.mark.parametrize("k", [1, 10, 1000])
+def test_top_anagrams_ranks_like_a_full_sort(words_file, candidates_file, k):
+    file, words = words_file
+    tree = BATCH_STRUCTURES["avl"](file, use_snapshot=False)
+    expected = sorted_top_anagrams(candidates_file, words, k)
+    assert top_anagrams(candidates_file, tree, k) == expected
+    tree.anagram_classes = None
+    assert top_anagrams(candidates_file, tree, k) == expected
+    assert most_anagrams(candidates_file, tree) == expected[0][0]
+
+
+@pytest.mark.parametrize("name", ["avl", "red-black", "btree", "persistent-avl", "persistent-red-black", "trie"])
+def test_anagrams_follow_inserts_and_removes(name, words_file, rng):
+    file, words = words_file
+    tree = BATCH_STRUCTURES[name](file, use_snapshot=False)
+    current = set(words)
+    for step in range(200):
+        word = rng.choice(words)
+        # Query first so the cache holds the answer the change makes stale
+        list_anagrams(tree, word)
+        if word in current:
+            assert tree.remove(word)
+            current.discard(word)
+        else:
+            tree.insert(word)
+            current.add(word)
+        expected = brute_force_anagrams(current, word)
+        assert sorted(list_anagrams(tree, word)) == expected
+        assert count_anagrams(tree, word) == len(expected)
+
+
+def test_array_trees_add_inserted_words_to_the_index(words_file):
+    file, words = words_file
+    for name in ("array-avl", "array-red-black"):
+        tree = BATCH_STRUCTURES[name](file, use_snapshot=False)
+        before = list_anagrams(tree, "tsrqp")
+        tree.insert("pqrst")
+        assert sorted(list_anagrams(tree, "tsrqp")) == sorted(before + ["pqrst"])
+
+
+@pytest.mark.parametrize("name", ["avl", "red-black", "btree", "persistent-avl", "persistent-red-black", "trie"])
+def test_reload_matches_a_fresh_build(name, tmp_path):
+    old = tmp_path / "old.txt"
+    new = tmp_path / "new.txt"
+    old.write_text("apple\nbanana\ncherry\nelppa\n")
+    new.write_text("apple\nBanana\nbanana\n\ncherry\ndate\nBANANA\n")
+    tree = BATCH_STRUCTURES[name](str(old), use_snapshot=False)
+    fresh = BATCH_STRUCTURES[name](str(new), use_snapshot=False)
+    assert reload_dictionary(tree, str(old), str(new)) == (2, 2)
+    assert len(tree) == len(fresh) == 4
+    for word in ("apple", "banana", "cherry", "date", "elppa", ""):
+        assert (word in tree) == (word in fresh)
+        assert sorted(list_anagrams(tree, word)) == sorted(list_anagrams(fresh, word))
+    assert tree.anagram_classes.version == tree.version
+    assert tree.anagram_classes.sizes == fresh.anagram_classes.sizes
+
+
+@pytest.mark.parametrize("name", ["avl", "red-black"])
+def test_merge_word_list_drops_blanks_and_repeated_keys(name, tmp_path):
+    base = tmp_path / "base.txt"
+    extra = tmp_path / "extra.txt"
+    base.write_text("apple\ncherry\n")
+    extra.write_text("Zed\nzed\nzed\n\nbanana\napple\n")
+    tree = BATCH_STRUCTURES[name](str(base), use_snapshot=False)
+    assert merge_word_list(tree, str(extra)) == 2
+    assert list(tree) == ["apple", "banana", "cherry", "Zed"]
+    assert list_anagrams(tree, "dez") == ["Zed"]
+    assert tree.anagram_classes.version == tree.version
+    assert tree.anagram_classes.sizes == build_anagram_classes(list(tree), tree.normalize).sizes
+
+
+def test_anagram_cache_passes_over_older_versions():
+    cache = AnagramCache(maxsize=2)
+    cache.put("abc", ["cab"], 2)
+    assert cache.get("abc", 1) is None
+    cache.put("abc", ["bac"], 1)
+    assert cache.get("abc", 2) == ("cab",)
+    assert cache.get("abc", 3) is None
+    assert len(cache) == 0
+    for signature in ("a", "b", "c"):
+        cache.put(signature, [signature], 3)
+    assert cache.stats()["evictions"] == 1
+
+
+@pytest.mark.parametrize("name", ["avl", "trie", "persistent-red-black"])
+def test_anagram_classes_from_the_index_match_a_pass_over_the_words(name, words_file):
+    file, words = words_file
+    tree = BATCH_STRUCTURES[name](file, use_snapshot=False)
+    classes = build_anagram_classes(words + ["", words[0].upper()], tree.normalize)
+    assert tree.anagram_classes.sizes == classes.sizes
+    assert tree.anagram_classes.report() == classes.report()
+
+
+# Returns the words that can be spelled from letters, the slow way
+def brute_force_spellable(words, letters):
+    return sorted(word for word in words if all(word.count(letter) <= letters.count(letter) for letter in word))
+
+
+@pytest.mark.skipif(not HAVE_NUMPY, reason="needs NumPy")
+def test_spellable_words_match_brute_force(words_file):
+    file, words = words_file
+    tree = BATCH_STRUCTURES["avl"](file, use_snapshot=False)
+    for letters in ("aeilnrst", "aabb", "tseliran", "e", ""):
+        assert sorted(spellable_words(tree, letters)) == brute_force_spellable(words, letters)
+    # The letter counts are rebuilt once the tree has changed
+    tree.insert("retinals")
+    words.append("retinals")
+    assert sorted(spellable_words(tree, "aeilnrst")) == brute_force_spellable(words, "aeilnrst")
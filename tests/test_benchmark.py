@@ -0,0 +1,31 @@
+# A small run of the benchmark suite, its JSON output and the --compare check
+
+import json
+
+from lab3b.benchmark import BENCHMARK_BACKENDS, BENCHMARK_WORKLOADS, benchmark_main
+
+
+SMOKE_ARGS = ["--sizes", "200", "--corpora", "shuffled", "--probes", "20", "--repeat", "1", "--warmup", "0"]
+
+
+def test_benchmark_writes_results_and_compares_them(tmp_path, capsys):
+    results = tmp_path / "results.json"
+    assert benchmark_main(SMOKE_ARGS + ["--output", str(results)]) == 0
+    runs = json.loads(results.read_text())["results"]
+    assert sorted((run["backend"], run["workload"]) for run in runs) == \
+        sorted((name, workload) for name, tree_class in BENCHMARK_BACKENDS for workload in BENCHMARK_WORKLOADS)
+    assert all(run["ops"] > 0 and run["seconds"]["p50"] > 0 for run in runs)
+
+    # A generous threshold finds no regressions against the same run
+    assert benchmark_main(SMOKE_ARGS + ["--compare", str(results), "--threshold", "1000"]) == 0
+
+    # An earlier run that was much faster at one workload is reported
+    earlier = json.loads(results.read_text())
+    slowed = earlier["results"][0]
+    slowed["seconds"]["p50"] = 1e-12
+    results.write_text(json.dumps(earlier))
+    capsys.readouterr()
+    assert benchmark_main(SMOKE_ARGS + ["--compare", str(results), "--threshold", "1000"]) == 1
+    regressions = [line for line in capsys.readouterr().out.splitlines() if line.startswith("REGRESSION")]
+    assert len(regressions) == 1
+    assert regressions[0].startswith("REGRESSION %s shuffled 200 %s:" % (slowed["backend"], slowed["workload"]))
@@ -0,0 +1,72 @@
+# The batch query command line against golden JSON-lines output
+
+import io
+import json
+
+import pytest
+
+from lab3b.cli import batch_main, run_batch
+from lab3b.protocol import BATCH_STRUCTURES
+
+
+WORDS = "listen\nsilent\nEnlist\ntinsel\ngoogle\napple\n"
+
+# A JSON query with an id, a malformed JSON line, an unknown op, the plain text
+# forms, JSON queries with a bad op and a bad word, a blank line and a bare word
+QUERIES = """{"op": "count", "word": "listen", "id": 1}
+{"op": "count", "word":
+frobnicate listen
+anagrams google
+contains Silent
+{"op": 5, "word": "x"}
+{"word": 7}
+
+listen
+{"op": "anagrams", "word": "inlets", "id": "last"}
+"""
+
+GOLDEN = [
+    {"op": "count", "word": "listen", "id": 1, "result": 4},
+    {"error": "Expecting value: line 1 column 24 (char 23)", "line": '{"op": "count", "word":'},
+    {"op": "frobnicate", "word": "listen", "error": "unknown op 'frobnicate'"},
+    {"op": "anagrams", "word": "google", "result": ["google"]},
+    {"op": "contains", "word": "Silent", "result": True},
+    {"error": "query op is not a string", "line": '{"op": 5, "word": "x"}'},
+    {"error": "query has no word", "line": '{"word": 7}'},
+    {"op": "count", "word": "listen", "result": 4},
+    {"op": "anagrams", "word": "inlets", "id": "last", "result": ["Enlist", "listen", "silent", "tinsel"]},
+]
+
+
+@pytest.fixture
+def batch_files(tmp_path):
+    words = tmp_path / "words.txt"
+    queries = tmp_path / "queries.txt"
+    words.write_text(WORDS)
+    queries.write_text(QUERIES)
+    return str(words), str(queries)
+
+
+def test_batch_main_writes_the_golden_results(batch_files, tmp_path, capsys):
+    words, queries = batch_files
+    output = tmp_path / "results.txt"
+    assert batch_main([queries, "--words", words, "--no-snapshot", "--output", str(output)]) == 0
+    assert [json.loads(line) for line in output.read_text().splitlines()] == GOLDEN
+    # Progress goes to stderr, so stdout stays clean for results
+    captured = capsys.readouterr()
+    assert captured.out == ""
+    assert "Answered 9 queries" in captured.err
+
+
+@pytest.mark.parametrize("name", sorted(BATCH_STRUCTURES))
+def test_every_structure_answers_the_batch_alike(name, batch_files):
+    words, queries = batch_files
+    tree = BATCH_STRUCTURES[name](words, use_snapshot=False)
+    output = io.StringIO()
+    assert run_batch(tree, QUERIES.splitlines(True), output) == len(GOLDEN)
+    results = [json.loads(line) for line in output.getvalue().splitlines()]
+    # The trie lists anagrams in its own order
+    for result in results:
+        if result.get("op") == "anagrams" and "result" in result:
+            result["result"].sort()
+    assert results == GOLDEN
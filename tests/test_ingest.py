@@ -0,0 +1,33 @@
+# Reading words files in blocks, plain and compressed, with blank lines and
+# repeated keys dropped
+
+import bz2
+import gzip
+import lzma
+
+import pytest
+
+from lab3b import CASE_FOLD, ingest_words, read_lines
+
+
+def test_ingest_words_drops_blanks_and_repeated_keys(tmp_path):
+    path = tmp_path / "words.txt"
+    path.write_text("b\n\nB\n  a  \nb\n")
+    words, keys, stats = ingest_words(str(path), CASE_FOLD)
+    assert words == ["b", "a"]
+    assert keys == ["b", "a"]
+    assert (stats.lines, stats.blank, stats.duplicates) == (5, 1, 2)
+
+
+@pytest.mark.parametrize("opener", [open, gzip.open, lzma.open, bz2.open])
+@pytest.mark.parametrize("block_size", [1, 7, 1 << 22])
+def test_every_format_reads_the_same_lines(opener, block_size, words_file, tmp_path):
+    words = words_file[1]
+    text = "\n".join(words) + "\n\n  padded  \nlast"
+    path = tmp_path / "words.data"
+    with opener(str(path), "wb") as file_:
+        file_.write(text.encode("utf-8"))
+    assert read_lines(str(path), block_size=block_size) == words + ["", "padded", "last"]
+    ingested, keys, stats = ingest_words(str(path), block_size=block_size)
+    assert ingested == keys == words + ["padded", "last"]
+    assert (stats.lines, stats.blank, stats.duplicates) == (len(words) + 3, 1, 0)
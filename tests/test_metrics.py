@@ -0,0 +1,69 @@
+# The latency histograms and the JSON and Prometheus metrics output
+
+import json
+
+from lab3b import CASE_FOLD, LatencyHistogram, Metrics, enable_metrics, disable_metrics, count_anagrams
+from lab3b.protocol import BATCH_STRUCTURES
+
+
+def test_bucket_limits_bound_their_values(rng):
+    values = list(range(1024)) + [rng.randrange(1 << 40) for i in range(5000)]
+    for value in values:
+        bucket = LatencyHistogram.bucket(value)
+        assert value <= LatencyHistogram.bucket_limit(bucket)
+        if bucket > 0:
+            assert LatencyHistogram.bucket_limit(bucket - 1) < value
+
+
+def test_quantiles_are_within_the_histogram_precision(rng):
+    histogram = LatencyHistogram()
+    values = [int(rng.lognormvariate(12, 2)) for i in range(20000)]
+    for value in values:
+        histogram.record(value)
+    values.sort()
+    for fraction in (0.5, 0.9, 0.99, 0.999):
+        exact = values[max(1, int(fraction * len(values) + 0.5)) - 1]
+        assert exact <= histogram.quantile(fraction) <= exact + exact / 128 + 1
+    assert histogram.quantile(1) == values[-1]
+    assert (histogram.count, histogram.min, histogram.max) == (len(values), values[0], values[-1])
+
+
+def test_values_past_the_last_bucket_are_counted_in_it():
+    histogram = LatencyHistogram()
+    histogram.record(1 << 60)
+    assert histogram.counts[histogram.last] == 1
+    assert histogram.quantile(0.5) == 1 << 60
+
+
+def test_prometheus_output_escapes_labels():
+    metrics = Metrics()
+    metrics.record('say "hi"\\', 2000)
+    metrics.record('say "hi"\\', 4000)
+    text = metrics.to_prometheus()
+    assert 'operation="say \\"hi\\"\\\\"' in text
+    assert 'lab3b_operation_latency_seconds_sum{operation="say \\"hi\\"\\\\"} 0.000006000' in text
+    assert 'lab3b_operation_latency_seconds_count{operation="say \\"hi\\"\\\\"} 2' in text
+    assert text.endswith("\n")
+
+
+def test_dump_picks_the_format_from_the_suffix(tmp_path):
+    metrics = Metrics()
+    metrics.record("search", 1500)
+    metrics.dump(str(tmp_path / "metrics.json"))
+    metrics.dump(str(tmp_path / "metrics.prom"))
+    document = json.loads((tmp_path / "metrics.json").read_text())
+    assert document["operations"]["search"]["count"] == 1
+    assert (tmp_path / "metrics.prom").read_text() == metrics.to_prometheus()
+    assert not (tmp_path / "metrics.json.tmp").exists()
+
+
+def test_queries_record_while_metrics_are_on(words_file):
+    file, words = words_file
+    tree = BATCH_STRUCTURES["avl"](file, CASE_FOLD, use_snapshot=False)
+    metrics = enable_metrics()
+    try:
+        count_anagrams(tree, words[0])
+    finally:
+        disable_metrics()
+    count_anagrams(tree, words[1])
+    assert metrics.summaries()["count_anagrams"]["count"] == 1
@@ -0,0 +1,121 @@
+# Snapshots of the persistent trees answering anagram queries for their own
+# version while a writer changes the tree
+
+import random
+import threading
+
+import pytest
+
+from lab3b import (PersistentAnagramIndex, build_anagram_index, anagram_signature, count_anagrams, list_anagrams,
+                   spellable_words, HAVE_NUMPY)
+from lab3b import dictionary
+from lab3b.protocol import BATCH_STRUCTURES
+
+
+# Returns the anagrams of word among the words of a snapshot, the slow way
+def brute_force_anagrams(snapshot, word):
+    signature = anagram_signature(word.casefold())
+    return sorted(other for other in snapshot if anagram_signature(other.casefold()) == signature)
+
+
+# Returns a random word of 1 to 5 letters from the letters of the words file
+def random_word(rng):
+    return "".join(rng.choice("aeilnrst") for i in range(rng.randint(1, 5)))
+
+
+@pytest.mark.parametrize("name", ["persistent-avl", "persistent-red-black"])
+def test_snapshots_answer_anagram_queries_for_their_version(name, words_file):
+    file, words = words_file
+    tree = BATCH_STRUCTURES[name](file, use_snapshot=False)
+    before = tree.snapshot()
+    word = words[0]
+    expected = brute_force_anagrams(before, word)
+    added = "".join(sorted(word)).upper()
+    if added not in tree:
+        tree.insert(added)
+    tree.remove(words[1])
+    after = tree.snapshot()
+    assert sorted(list_anagrams(before, word)) == expected
+    assert count_anagrams(before, word) == len(expected)
+    assert sorted(list_anagrams(after, word)) == brute_force_anagrams(after, word)
+    assert sorted(list_anagrams(tree, word)) == brute_force_anagrams(after, word)
+    assert before.make_key("ABC") == "abc"
+    if HAVE_NUMPY:
+        assert words[1] in spellable_words(before, words[1])
+        assert words[1] not in spellable_words(after, words[1])
+
+
+@pytest.mark.parametrize("name", ["persistent-avl", "persistent-red-black"])
+def test_readers_see_consistent_snapshots_while_one_thread_writes(name, words_file):
+    file, words = words_file
+    tree = BATCH_STRUCTURES[name](file, use_snapshot=False)
+    writing = threading.Event()
+    writing.set()
+    errors = []
+
+    def writer():
+        rng = random.Random(1)
+        try:
+            for step in range(600):
+                word = random_word(rng)
+                if word not in tree:
+                    tree.insert(word.upper() if rng.random() < 0.3 else word)
+                else:
+                    tree.remove(word)
+        except Exception as error:
+            errors.append(error)
+        finally:
+            writing.clear()
+
+    def reader(seed):
+        rng = random.Random(seed)
+        reads = 0
+        try:
+            while writing.is_set() or reads < 20:
+                snapshot = tree.snapshot()
+                word = random_word(rng)
+                anagrams = sorted(list_anagrams(snapshot, word))
+                assert anagrams == brute_force_anagrams(snapshot, word)
+                assert count_anagrams(snapshot, word) == len(anagrams)
+                reads += 1
+        except Exception as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=writer)] + [threading.Thread(target=reader, args=(seed,))
+                                                   for seed in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert tree.version > 0
+
+
+# Returns the groups of an anagram index with each group sorted
+def sorted_groups(index):
+    return {signature: sorted(group) for signature, group in index.groups.items()}
+
+
+def test_persistent_index_copies_keep_their_groups(monkeypatch, rng):
+    monkeypatch.setattr(dictionary, "PERSISTENT_INDEX_CHANGES", 8)
+    words = ["listen", "silent", "google"]
+    versions = [PersistentAnagramIndex.from_index(build_anagram_index(words))]
+    models = [set(words)]
+    for step in range(100):
+        index = versions[-1].copy()
+        model = set(models[-1])
+        word = random_word(rng)
+        if rng.random() < 0.6:
+            index.add(word)
+            model.add(word)
+        else:
+            index.remove(word)
+            model.discard(word)
+        versions.append(index)
+        models.append(model)
+    for index, model in zip(versions, models):
+        expected = build_anagram_index(model)
+        assert sorted_groups(index) == sorted_groups(expected)
+        assert len(index) == len(expected)
+        for word in ("inlets", "elgoog", "tea"):
+            assert sorted(index.lookup(word)) == sorted(expected.lookup(word))
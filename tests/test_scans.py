@@ -0,0 +1,72 @@
+# Ordered scans (lower-bound seeks, ranges and prefixes) on every backend that
+# has them, checked against sorted()
+
+import pytest
+
+from lab3b import CASE_FOLD, AVLTree, RedBlackTree, BTree, PersistentAVLTree, PersistentRedBlackTree
+
+
+SCAN_TREES = [AVLTree, RedBlackTree, PersistentAVLTree, PersistentRedBlackTree, BTree]
+
+
+# Returns the keyword arguments that build a tree_class with many nodes even
+# from a few words, so the scans cross B-tree leaves
+def small_nodes(tree_class):
+    return {"fanout": 3} if tree_class is BTree else {}
+
+
+# Returns up to count random words with distinct case-folded keys, some of
+# them capitalized
+def distinct_words(rng, count):
+    words = {}
+    for i in range(count):
+        word = "".join(rng.choice("abcd") for i in range(rng.randint(1, 4)))
+        words.setdefault(word, word.capitalize() if rng.random() < 0.3 else word)
+    return sorted(words.values(), key=str.casefold)
+
+
+# Bounds and prefixes to scan with: words in the tree, words between them,
+# bounds past either end, mixed case and the empty string
+PROBES = ["", "a", "A", "ab", "aBc", "b", "bb", "Cd", "d", "dddd", "ddddd", "e", "0"]
+
+
+@pytest.fixture(params=[0, 1, 40], ids=["empty", "one", "many"])
+def scanned(request, rng):
+    return distinct_words(rng, request.param)
+
+
+@pytest.mark.parametrize("tree_class", SCAN_TREES)
+def test_scans_match_sorted(tree_class, scanned):
+    words = scanned
+    keys = [CASE_FOLD(word) for word in words]
+    tree = tree_class.from_sorted(words, CASE_FOLD, **small_nodes(tree_class))
+    assert list(tree) == words
+    assert list(tree.iter_from()) == words
+    assert list(tree.range()) == words
+    for probe in PROBES:
+        low = CASE_FOLD(probe)
+        assert list(tree.iter_from(probe)) == [word for word, key in zip(words, keys) if key >= low]
+        assert list(tree.range(probe)) == [word for word, key in zip(words, keys) if key >= low]
+        assert list(tree.range(None, probe)) == [word for word, key in zip(words, keys) if key < low]
+        assert list(tree.prefix(probe)) == [word for word, key in zip(words, keys) if key.startswith(low)]
+        for high in PROBES:
+            assert list(tree.range(probe, high)) == \
+                [word for word, key in zip(words, keys) if low <= key < CASE_FOLD(high)]
+
+
+@pytest.mark.parametrize("tree_class", SCAN_TREES)
+def test_scans_follow_inserts_and_removes(tree_class, rng):
+    tree = tree_class(CASE_FOLD, **small_nodes(tree_class))
+    model = {}
+    for step in range(400):
+        word = "".join(rng.choice("abc") for i in range(rng.randint(1, 3)))
+        if rng.random() < 0.6 and CASE_FOLD(word) not in model:
+            tree.insert(word)
+            model[CASE_FOLD(word)] = word
+        elif CASE_FOLD(word) in model:
+            tree.remove(word)
+            del model[CASE_FOLD(word)]
+    expected = [model[key] for key in sorted(model)]
+    assert list(tree) == expected
+    assert list(tree.prefix("B")) == [model[key] for key in sorted(model) if key.startswith("b")]
+    assert list(tree.range("ab", "c")) == [model[key] for key in sorted(model) if "ab" <= key < "c"]
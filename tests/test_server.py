@@ -0,0 +1,94 @@
+# The query server answering over a real socket in the test's own event loop
+
+import asyncio
+import json
+import threading
+
+from lab3b import server as server_module
+from lab3b.server import QueryServer
+from lab3b.protocol import BATCH_STRUCTURES
+
+
+# Starts a QueryServer for tree on a free local port, runs talk(reader,
+# writer, server) against it and returns what talk returns
+def round_trip(tree, talk):
+    async def main():
+        query_server = QueryServer(tree, workers=2)
+        listener = await asyncio.start_server(query_server.handle, "127.0.0.1", 0)
+        port = listener.sockets[0].getsockname()[1]
+        async with listener:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            try:
+                return await asyncio.wait_for(talk(reader, writer, query_server), 10)
+            finally:
+                writer.close()
+                await writer.wait_closed()
+                query_server.executor.shutdown()
+
+    return asyncio.run(main())
+
+
+# Sends request lines and returns the decoded responses, one per request that
+# is not blank
+async def exchange(reader, writer, *requests):
+    writer.write("".join(request + "\n" for request in requests).encode())
+    await writer.drain()
+    return [json.loads(await reader.readline()) for request in requests if request.strip()]
+
+
+def build_tree(tmp_path, attach_index=True):
+    words = tmp_path / "words.txt"
+    words.write_text("listen\nsilent\ntinsel\ngoogle\n")
+    tree = BATCH_STRUCTURES["avl"](str(words), use_snapshot=False)
+    if not attach_index:
+        tree.anagram_index = None
+    return tree
+
+
+def test_queries_round_trip(tmp_path):
+    async def talk(reader, writer, query_server):
+        return await exchange(reader, writer, '{"op": "count", "word": "listen", "id": 7}', "contains google",
+                              "", "anagrams elgoog", "{", "shout listen")
+
+    assert round_trip(build_tree(tmp_path), talk) == [
+        {"op": "count", "word": "listen", "id": 7, "result": 3},
+        {"op": "contains", "word": "google", "result": True},
+        {"op": "anagrams", "word": "elgoog", "result": ["google"]},
+        {"error": "Expecting property name enclosed in double quotes: line 1 column 2 (char 1)", "line": "{"},
+        {"op": "shout", "word": "listen", "error": "unknown op 'shout'"},
+    ]
+
+
+def test_query_after_a_write_does_not_share_an_older_search(tmp_path, monkeypatch):
+    # Each search finds its anagrams at once but only returns them when
+    # released, so the first one is still running when the tree changes
+    release = threading.Event()
+    search_anagrams = server_module.search_anagrams
+
+    def held_search(tree, word):
+        anagrams = search_anagrams(tree, word)
+        release.wait(10)
+        return anagrams
+    monkeypatch.setattr(server_module, "search_anagrams", held_search)
+
+    async def talk(reader, writer, query_server):
+        writer.write(b"count listen\n")
+        await writer.drain()
+        while not query_server.searches:
+            await asyncio.sleep(0.001)
+        query_server.tree.insert("inlets")
+        writer.write(b"anagrams silent\n")
+        await writer.drain()
+        while query_server.requests < 2:
+            await asyncio.sleep(0.001)
+        searches = len(query_server.searches)
+        release.set()
+        responses = [json.loads(await reader.readline()) for i in range(2)]
+        return searches, responses + await exchange(reader, writer, "count tinsel")
+
+    searches, responses = round_trip(build_tree(tmp_path, attach_index=False), talk)
+    assert searches == 2
+    assert responses[0] == {"op": "count", "word": "listen", "result": 3}
+    assert sorted(responses[1]["result"]) == ["inlets", "listen", "silent", "tinsel"]
+    # The older search's result is not cached for the newer version
+    assert responses[2] == {"op": "count", "word": "tinsel", "result": 4}
@@ -0,0 +1,89 @@
+# The dictionary snapshot: round trips, truncated, corrupt or unwritable
+# snapshots falling back to a rebuild, and what a start from it builds
+
+import os
+
+import pytest
+
+from lab3b import (CASE_FOLD, HAVE_NUMPY, build_anagram_index, save_snapshot, load_snapshot, load_dictionary,
+                   avl_tree_creator, spellable_words)
+from lab3b.dictionary import file_checksum, snapshot_path
+
+
+def test_snapshot_round_trip(words_file, capsys):
+    file, words = words_file
+    built = load_dictionary(file)
+    assert "Read 2000 words" in capsys.readouterr().out
+    assert os.path.exists(snapshot_path(file))
+
+    loaded = load_dictionary(file)
+    assert "Loaded the dictionary from snapshot" in capsys.readouterr().out
+    assert loaded[0] == built[0]
+    assert loaded[1].groups == built[1].groups
+
+
+def test_snapshot_of_another_words_file_is_not_used(words_file):
+    file, words = words_file
+    load_dictionary(file)
+    with open(file, "a") as file_:
+        file_.write("extra\n")
+    assert load_snapshot(snapshot_path(file), file_checksum(file), CASE_FOLD) is None
+    assert load_snapshot(snapshot_path(file), file_checksum(file), None) is None
+
+
+@pytest.mark.parametrize("damage", ["half", "header", "flipped byte", "empty"])
+def test_damaged_snapshot_is_rebuilt(words_file, damage, capsys):
+    file, words = words_file
+    built = load_dictionary(file)
+    path = snapshot_path(file)
+    with open(path, "rb") as file_:
+        data = file_.read()
+    if damage == "half":
+        damaged = data[:len(data) // 2]
+    elif damage == "header":
+        damaged = data[:40]
+    elif damage == "flipped byte":
+        damaged = data[:-5] + bytes([data[-5] ^ 0x20]) + data[-4:]
+    else:
+        damaged = b""
+    with open(path, "wb") as file_:
+        file_.write(damaged)
+    capsys.readouterr()
+
+    assert load_snapshot(path, file_checksum(file), CASE_FOLD) is None
+    rebuilt = load_dictionary(file)
+    assert "Read 2000 words" in capsys.readouterr().out
+    assert rebuilt[0] == built[0]
+    # The bad snapshot was replaced by a good one
+    with open(path, "rb") as file_:
+        assert file_.read() == data
+
+
+def test_unwritable_snapshot_is_skipped(words_file, tmp_path):
+    file, words = words_file
+    index = build_anagram_index(words)
+    path = str(tmp_path / "missing" / "words.txt.snap")
+    assert not save_snapshot(path, file_checksum(file), sorted(words), index, CASE_FOLD)
+    assert not os.path.exists(path + ".tmp")
+
+
+def test_policy_without_a_snapshot_number_is_not_saved(words_file, tmp_path):
+    file, words = words_file
+    path = str(tmp_path / "words.txt.snap")
+    assert not save_snapshot(path, file_checksum(file), sorted(words), build_anagram_index(words), str.upper)
+    assert not os.path.exists(path)
+
+
+@pytest.mark.skipif(not HAVE_NUMPY, reason="needs NumPy")
+def test_letter_counts_are_built_by_the_first_sub_anagram_query(words_file):
+    file, words = words_file
+    avl_tree_creator(file)
+    tree = avl_tree_creator(file)
+    assert tree.letter_counts is None
+    before = spellable_words(tree, "aelnrst")
+    counts = tree.letter_counts
+    assert counts is not None and counts.version == tree.version
+    assert spellable_words(tree, "aelnrst") == before
+    assert tree.letter_counts is counts
+    tree.insert("Trans")
+    assert sorted(spellable_words(tree, "aelnrst")) == sorted(before + ["Trans"])
@@ -0,0 +1,74 @@
+# The instrumentation counters on small insert sequences whose rotations,
+# recolorings and comparisons are known
+
+import pytest
+
+from lab3b import AVLTree, RedBlackTree, tree_shape
+
+
+# Inserts words into a new tree of tree_class with stats on, then searches for
+# each of searches, and returns the stats report
+def counted(tree_class, words, searches=()):
+    tree = tree_class()
+    stats = tree.enable_stats()
+    for word in words:
+        tree.insert(word)
+    for word in searches:
+        tree.search(word)
+    return tree, stats.report()
+
+
+@pytest.mark.parametrize("tree_class", [AVLTree, RedBlackTree])
+@pytest.mark.parametrize("words, single, double", [
+    (["1", "2", "3"], 1, 0),
+    (["3", "2", "1"], 1, 0),
+    (["1", "3", "2"], 0, 1),
+    (["3", "1", "2"], 0, 1),
+    (["2", "1", "3"], 0, 0),
+])
+def test_three_inserts_rotate_as_expected(tree_class, words, single, double):
+    tree, report = counted(tree_class, words)
+    assert report["operations"] == {"insert": 3, "remove": 0, "search": 0}
+    assert report["single_rotations"] == single
+    assert report["double_rotations"] == double
+    assert report["rotations"] == single + 2 * double
+    # Each insert compares against every node on the path to its leaf
+    assert report["comparisons"] == (3 if single + double else 2)
+    assert tree_shape(tree)["height"] == 1
+
+
+def test_ascending_avl_inserts_rotate_once_per_imbalance():
+    tree, report = counted(AVLTree, "abcdefg")
+    assert report["single_rotations"] == 4
+    assert report["double_rotations"] == 0
+    assert tree_shape(tree) == {"size": 7, "height": 2, "optimal_height": 2, "average_depth": 10 / 7,
+                                "balance_factors": {0: 7}}
+
+
+def test_red_black_recolorings():
+    # The root is colored black, then a rotation recolors the new root and
+    # the old one
+    assert counted(RedBlackTree, "abc")[1]["recolorings"] == 3
+    # The root, then a red uncle: parent, uncle and grandparent, the root
+    # again, which the root rule colors black
+    assert counted(RedBlackTree, "bacd")[1]["recolorings"] == 1 + 3 + 1
+    assert counted(RedBlackTree, "bac")[1]["recolorings"] == 1
+
+
+def test_searches_count_the_nodes_they_compare_against():
+    tree, report = counted(AVLTree, "abc", searches=["b", "a", "z"])
+    assert report["operations"]["search"] == 3
+    # 0 + 1 + 2 for the inserts, then the root alone and root and leaf twice
+    assert report["comparisons"] == 3 + 1 + 2 + 2
+
+
+def test_disabled_stats_stop_counting():
+    tree = AVLTree()
+    stats = tree.enable_stats()
+    tree.insert("a")
+    tree.disable_stats()
+    tree.insert("b")
+    tree.insert("c")
+    assert stats.report()["operations"]["insert"] == 1
+    assert stats.rotations == 0
+    assert tree.stats is None
@@ -0,0 +1,299 @@
+# Randomized checks of the tree invariants through inserts, removes, bulk builds
+# and the join, split and set operations
+
+import pytest
+
+from lab3b import (CASE_FOLD, NIL, AVLTree, RedBlackTree, ArrayAVLTree, ArrayRedBlackTree, BTree, Trie,
+                   PersistentAVLTree, PersistentRedBlackTree, build_anagram_index)
+
+
+NODE_TREES = [AVLTree, RedBlackTree, PersistentAVLTree, PersistentRedBlackTree]
+
+
+# Returns a random word of 1 to 3 letters, in mixed case so CASE_FOLD matters
+def random_word(rng):
+    word = "".join(rng.choice("abcde") for i in range(rng.randint(1, 3)))
+    return word.upper() if rng.random() < 0.3 else word
+
+
+# Checks the subtree at node and returns its (height, black height, size). AVL
+# nodes have a height and red-black nodes a color; parent pointers are checked
+# where the nodes have them.
+def check_node(node, parent):
+    if node is None:
+        return -1, 1, 0
+    if hasattr(node, "parent"):
+        assert node.parent is parent
+    left_height, left_black, left_size = check_node(node.left, node)
+    right_height, right_black, right_size = check_node(node.right, node)
+    if node.left is not None:
+        assert not node.key < node.left.key
+    if node.right is not None:
+        assert not node.right.key < node.key
+    height = max(left_height, right_height) + 1
+    assert node.size == left_size + right_size + 1
+    if hasattr(node, "height"):
+        assert node.height == height
+        assert abs(left_height - right_height) <= 1
+    black = left_black
+    if hasattr(node, "red"):
+        assert left_black == right_black
+        if node.red:
+            assert not (node.left is not None and node.left.red)
+            assert not (node.right is not None and node.right.red)
+        else:
+            black += 1
+    return height, black, node.size
+
+
+# Checks a node tree's invariants and that it holds exactly the keys in model
+def check_node_tree(tree, model):
+    root = tree.root
+    if root is not None and hasattr(root, "red"):
+        assert not root.red
+    check_node(root, None)
+    keys = [tree.make_key(word) for word in tree]
+    assert keys == sorted(keys)
+    assert keys == sorted(model)
+    assert len(tree) == len(model)
+
+
+# Checks an array-backed tree's invariants and that it holds the keys in model
+def check_array_tree(tree, model):
+    def walk(node, parent):
+        if node == NIL:
+            return -1, 1, []
+        assert tree.parent[node] == parent
+        left_height, left_black, left_keys = walk(tree.left[node], node)
+        right_height, right_black, right_keys = walk(tree.right[node], node)
+        height = max(left_height, right_height) + 1
+        black = left_black
+        if isinstance(tree, ArrayAVLTree):
+            assert tree.heights[node] == height
+            assert abs(left_height - right_height) <= 1
+        else:
+            assert left_black == right_black
+            if tree.colors[node]:
+                assert tree.left[node] == NIL or not tree.colors[tree.left[node]]
+                assert tree.right[node] == NIL or not tree.colors[tree.right[node]]
+            else:
+                black += 1
+        return height, black, left_keys + [tree.keys[node]] + right_keys
+
+    if isinstance(tree, ArrayRedBlackTree) and tree.root != NIL:
+        assert not tree.colors[tree.root]
+    keys = walk(tree.root, NIL)[2]
+    assert keys == sorted(model)
+    assert len(tree) == len(model)
+
+
+# Checks a B-tree's node occupancy, separators, leaf links and keys
+def check_btree(tree, model):
+    leaves = []
+
+    def walk(node, low, high, depth):
+        assert node.keys == sorted(set(node.keys))
+        assert all((low is None or not key < low) and (high is None or key < high) for key in node.keys)
+        if not hasattr(node, "children"):
+            assert len(node.keys) == len(node.words) <= tree.fanout
+            if node is not tree.root:
+                assert len(node.keys) >= tree.fanout // 2
+            leaves.append((node, depth))
+            return
+        assert len(node.keys) == len(node.children) - 1
+        assert len(node.children) <= tree.fanout
+        if node is not tree.root:
+            assert len(node.children) >= (tree.fanout + 1) // 2
+        bounds = [low] + node.keys + [high]
+        for i in range(len(node.children)):
+            walk(node.children[i], bounds[i], bounds[i + 1], depth + 1)
+
+    walk(tree.root, None, None, 0)
+    assert len(set(depth for leaf, depth in leaves)) == 1
+    for i in range(len(leaves) - 1):
+        assert leaves[i][0].next is leaves[i + 1][0]
+    assert leaves[-1][0].next is None
+    keys = [key for leaf, depth in leaves for key in leaf.keys]
+    assert keys == sorted(model)
+    assert len(tree) == len(model)
+
+
+@pytest.mark.parametrize("tree_class", NODE_TREES)
+def test_random_inserts_and_removes_keep_node_tree_invariants(tree_class, rng):
+    tree = tree_class(CASE_FOLD)
+    model = []
+    for step in range(3000):
+        word = random_word(rng)
+        key = tree.make_key(word)
+        if rng.random() < 0.55:
+            tree.insert(word)
+            model.append(key)
+        else:
+            assert tree.remove(word) == (key in model)
+            if key in model:
+                model.remove(key)
+        if step % 250 == 0:
+            check_node_tree(tree, model)
+    check_node_tree(tree, model)
+    # Remove everything that is left
+    for word in list(tree):
+        assert tree.remove(word)
+    check_node_tree(tree, [])
+
+
+@pytest.mark.parametrize("tree_class", NODE_TREES)
+@pytest.mark.parametrize("count", [0, 1, 2, 3, 7, 100, 1023, 1024])
+def test_from_sorted_builds_valid_node_trees(tree_class, count, rng):
+    words = [random_word(rng) + str(i) for i in range(count)]
+    tree = tree_class.from_sorted(words, CASE_FOLD)
+    check_node_tree(tree, [tree.make_key(word) for word in words])
+
+
+@pytest.mark.parametrize("tree_class", [ArrayAVLTree, ArrayRedBlackTree])
+def test_random_inserts_keep_array_tree_invariants(tree_class, rng):
+    tree = tree_class(normalize=CASE_FOLD)
+    model = []
+    for step in range(2000):
+        word = random_word(rng)
+        tree.insert(word)
+        model.append(tree.make_key(word))
+        if step % 250 == 0:
+            check_array_tree(tree, model)
+    check_array_tree(tree, model)
+    built = tree_class.from_sorted(model, CASE_FOLD)
+    check_array_tree(built, model)
+
+
+# Every backend's search returns the stored spelling or None, and node access
+# goes through search_handle
+@pytest.mark.parametrize("tree_class", [AVLTree, RedBlackTree, ArrayAVLTree, ArrayRedBlackTree, BTree, Trie,
+                                        PersistentAVLTree, PersistentRedBlackTree])
+def test_search_returns_the_stored_word(tree_class):
+    tree = tree_class.from_sorted(["b", "Apple", "c"], CASE_FOLD)
+    assert tree.search("APPLE") == "Apple"
+    assert tree.search("b") == "b"
+    assert tree.search("zz") is None
+    assert tree.search("") is None
+    assert tree.search_many(["c", "zz", "apple"]) == ["c", None, "Apple"]
+    assert tree.contains_many(["apple", "zz"]) == [True, False]
+    assert "APPLE" in tree and "zz" not in tree
+    if hasattr(tree, "search_handle"):
+        assert tree.search_handle("zz") in (None, NIL)
+        assert tree.search_handle("apple") not in (None, NIL)
+
+
+@pytest.mark.parametrize("tree_class", NODE_TREES)
+def test_rank_and_select_agree_with_sorted_order(tree_class, rng):
+    words = sorted(set(random_word(rng).lower() + str(i) for i in range(300)))
+    tree = tree_class.from_sorted(words)
+    for i in range(len(words)):
+        assert tree.select(i) == words[i]
+        assert tree.rank(words[i]) == i
+    assert tree.select(-1) == words[-1]
+    with pytest.raises(IndexError):
+        tree.select(len(words))
+
+
+@pytest.mark.parametrize("fanout", [3, 4, 5, 8, 64])
+def test_random_inserts_and_removes_keep_btree_invariants(fanout, rng):
+    tree = BTree(CASE_FOLD, fanout)
+    model = set()
+    for step in range(3000):
+        word = random_word(rng) + random_word(rng)
+        key = tree.make_key(word)
+        if rng.random() < 0.6:
+            tree.insert(word)
+            model.add(key)
+        else:
+            assert tree.remove(word) == (key in model)
+            model.discard(key)
+        if step % 250 == 0:
+            check_btree(tree, model)
+    check_btree(tree, model)
+    built = BTree.from_sorted(list(model), CASE_FOLD, fanout)
+    check_btree(built, model)
+    assert list(built) == [tree.make_key(word) for word in tree]
+
+
+# Checks every trie node's word lengths and returns the number of words below it
+def check_trie_node(node):
+    count = 0 if node.word is None else 1
+    lengths = 0 if node.word is None else 1
+    for child in node.children.values():
+        count += check_trie_node(child)
+        lengths |= child.lengths << 1
+    assert node.lengths == lengths
+    assert count > 0 or node.lengths == 0
+    return count
+
+
+def test_trie_inserts_and_removes(rng):
+    trie = Trie(CASE_FOLD)
+    model = set()
+    for step in range(2000):
+        word = random_word(rng) + random_word(rng)
+        key = trie.make_key(word)
+        if rng.random() < 0.6:
+            trie.insert(word)
+            model.add(key)
+        else:
+            assert trie.remove(word) == (key in model)
+            model.discard(key)
+        if step % 250 == 0:
+            assert check_trie_node(trie.root) == len(model)
+    assert check_trie_node(trie.root) == len(trie) == len(model)
+    for key in model:
+        assert key in trie
+    for word in rng.sample(sorted(model), 50) + ["abcde", "edcbaedcba"]:
+        expected = sorted(key for key in model if sorted(key) == sorted(word))
+        assert sorted(map(trie.make_key, trie.anagrams(word))) == expected
+
+
+# The letter counts are built from a tree's words, so every backend iterates
+@pytest.mark.parametrize("tree_class", [AVLTree, RedBlackTree, ArrayAVLTree, ArrayRedBlackTree, BTree, Trie,
+                                        PersistentAVLTree, PersistentRedBlackTree])
+def test_every_backend_iterates_in_sorted_order(tree_class, rng):
+    words = list({word.casefold(): word for word in (random_word(rng) + random_word(rng) for i in range(500))}.values())
+    tree = tree_class(normalize=CASE_FOLD)
+    for word in words:
+        tree.insert(word)
+    assert list(tree) == sorted(words, key=str.casefold)
+
+
+@pytest.mark.parametrize("tree_class", [AVLTree, RedBlackTree])
+def test_set_operations_match_python_sets(tree_class, rng):
+    for trial in range(30):
+        a = set(random_word(rng).lower() + random_word(rng).lower() for i in range(rng.randint(0, 300)))
+        b = set(random_word(rng).lower() + random_word(rng).lower() for i in range(rng.randint(0, 300)))
+        for operation, expected in (("union", a | b), ("intersection", a & b), ("difference", a - b)):
+            tree = tree_class.from_sorted(a)
+            other = tree_class.from_sorted(b)
+            tree.anagram_index = build_anagram_index(a, None)
+            getattr(tree, operation)(other)
+            check_node_tree(tree, expected)
+            check_node_tree(other, [])
+            assert sorted(word for group in tree.anagram_index.groups.values() for word in group) == \
+                sorted(expected)
+
+
+@pytest.mark.parametrize("tree_class", [AVLTree, RedBlackTree])
+def test_split_and_join_round_trip(tree_class, rng):
+    words = sorted(set(random_word(rng).lower() + random_word(rng).lower() for i in range(500)))
+    for trial in range(30):
+        tree = tree_class.from_sorted(words)
+        pivot = random_word(rng).lower()
+        left, right = tree.split(pivot)
+        check_node_tree(tree, [])
+        check_node_tree(left, [word for word in words if word < pivot])
+        check_node_tree(right, [word for word in words if not word < pivot])
+        left.join(right)
+        check_node_tree(left, words)
+        check_node_tree(right, [])
+
+
+def test_join_rejects_overlapping_trees():
+    tree = AVLTree.from_sorted(["b", "d"])
+    with pytest.raises(ValueError):
+        tree.join(AVLTree.from_sorted(["c"]))
+    with pytest.raises(TypeError):
+        tree.union(RedBlackTree.from_sorted(["c"]))